@@ -0,0 +1,136 @@
+"""AtlasPackerで小さなキャプチャをまとめた場合の充填率とAPI呼び出しあたりのジョブ数を評価するベンチマーク
+
+ランダムなスニペットサイズ分布ごとにジョブ列を生成し、take_next_jobs と同じ規則
+（先頭が小さければ待機中の小さなジョブを到着順にパック、2件未満なら単独）で待機キューを処理する。
+待機キューには最大 --queue-depth 件が溜まっている状態を想定し、1ジョブ1呼び出しの場合と比較する。
+
+充填率 = APIキャンバス面積のうち元画像の画素（拡大前）が占める割合。
+1ジョブ1呼び出しの場合はアスペクト比が最も近いAPIサイズのキャンバスに対して計算する。
+
+使い方: python scripts/bench_atlas_packing.py [--jobs 2000] [--queue-depth 2 4 8 16] [--seed 0]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'source'))
+
+import main  # noqa: E402
+
+
+def tooltips(rng):
+    """ツールチップ・ボタン程度の横長の小片"""
+    return rng.randint(80, 360), rng.randint(20, 90)
+
+
+def dialogs(rng):
+    """ダイアログ・吹き出し程度の中サイズ"""
+    return rng.randint(240, 700), rng.randint(140, 520)
+
+
+def lognormal(rng):
+    """辺の長さが対数正規分布（大半は小さく、一部はアトラス対象外の大きさ）"""
+    return (max(16, min(2400, int(rng.lognormvariate(5.6, 0.6)))),
+            max(16, min(1600, int(rng.lognormvariate(5.2, 0.7)))))
+
+
+def mixed(rng):
+    """小片・中サイズ・全画面キャプチャの混在"""
+    kind = rng.random()
+    if kind < 0.5:
+        return tooltips(rng)
+    if kind < 0.85:
+        return dialogs(rng)
+    return rng.randint(1200, 2560), rng.randint(700, 1440)
+
+
+DISTRIBUTIONS = {'tooltip': tooltips, 'dialog': dialogs, 'lognormal': lognormal, 'mixed': mixed}
+
+
+def single_canvas(size):
+    """1ジョブ1呼び出しで使われるAPIキャンバス（アスペクト比が最も近いサイズ）"""
+    ratio = size[0] / size[1]
+    return min(main.API_IMAGE_SIZES, key=lambda canvas: abs(canvas[0] / canvas[1] - ratio))
+
+
+def single_fill(size):
+    canvas = single_canvas(size)
+    scale = min(1.0, canvas[0] / size[0], canvas[1] / size[1])
+    return (size[0] * scale) * (size[1] * scale) / (canvas[0] * canvas[1])
+
+
+def simulate(packer, sizes, queue_depth):
+    """待機キューを take_next_jobs と同じ規則で処理し、API呼び出しごとの (ジョブ数, 充填率) を返す"""
+    arrivals = list(sizes)
+    pending = []
+    calls = []
+    pack_seconds = []
+    while arrivals or pending:
+        while arrivals and len(pending) < queue_depth:
+            pending.append(arrivals.pop(0))
+
+        head = pending[0]
+        if packer.is_small(head):
+            candidates = [size for size in pending if packer.is_small(size)]
+            if len(candidates) >= 2:
+                start = time.perf_counter()
+                layout = packer.pack(candidates)
+                pack_seconds.append(time.perf_counter() - start)
+                if layout:
+                    packed = candidates[:len(layout['placements'])]
+                    for size in packed:
+                        pending.remove(size)
+                    calls.append((len(packed), layout['efficiency']))
+                    continue
+        calls.append((1, single_fill(pending.pop(0))))
+    return calls, pack_seconds
+
+
+def summarize(calls):
+    jobs = sum(count for count, _ in calls)
+    return {
+        'calls': len(calls),
+        'jobs_per_call': jobs / len(calls),
+        'fill': statistics.mean(fill for _, fill in calls),
+        'atlas_share': sum(count for count, _ in calls if count > 1) / jobs,
+    }
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--queue-depth', type=int, nargs='+', default=[2, 4, 8, 16])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    packing = main.app_config['atlas_packing']
+    packer = main.AtlasPacker(packing['gutter_px'], packing['max_item_side'], packing['max_items'])
+    print(f"{args.jobs}ジョブ/分布 (gutter={packing['gutter_px']}px, max_item_side={packing['max_item_side']}px, "
+          f"max_items={packing['max_items']})")
+    print(f"{'分布':<11}{'キュー':>6}{'API呼び出し':>12}{'ジョブ/呼び出し':>16}{'充填率':>9}"
+          f"{'アトラス率':>11}{'呼び出し削減':>13}{'pack中央値':>12}")
+
+    for name, generate in DISTRIBUTIONS.items():
+        rng = random.Random(args.seed)
+        sizes = [generate(rng) for _ in range(args.jobs)]
+
+        baseline = summarize([(1, single_fill(size)) for size in sizes])
+        print(f"{name:<11}{'-':>6}{baseline['calls']:>12}{baseline['jobs_per_call']:>16.2f}"
+              f"{baseline['fill']:>9.1%}{'-':>11}{'-':>13}{'-':>12}  (1ジョブ1呼び出し)")
+
+        for depth in args.queue_depth:
+            calls, pack_seconds = simulate(packer, sizes, depth)
+            result = summarize(calls)
+            saved = 1 - result['calls'] / baseline['calls']
+            pack_us = statistics.median(pack_seconds) * 1e6 if pack_seconds else 0.0
+            print(f"{name:<11}{depth:>6}{result['calls']:>12}{result['jobs_per_call']:>16.2f}"
+                  f"{result['fill']:>9.1%}{result['atlas_share']:>11.1%}{saved:>13.1%}{pack_us:>10.1f}us")
+
+
+if __name__ == '__main__':
+    run()
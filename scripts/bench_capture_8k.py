@@ -0,0 +1,89 @@
+"""8K（7680x2160）のクリップボード画像で取り込み処理の時間を比較するベンチマーク
+
+旧経路: QImage → PNGエンコード → PILでデコード → 全画素のMD5（すべてGUIスレッド）
+新経路: 縮小フィンガープリント（変化検出）→ 作業用サイズへの縮小 → PIL変換（GUIスレッド）
+        ＋ 全画素の厳密なハッシュ（履歴照合、バックグラウンドスレッド）
+
+使い方: python scripts/bench_capture_8k.py [--repeat 5]
+"""
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'source'))
+
+from PIL import Image, ImageDraw  # noqa: E402
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt  # noqa: E402
+
+import main  # noqa: E402
+
+
+def make_capture(size=(7680, 2160), seed=0):
+    """文字列の行を模した合成スクリーンショット"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for top in range(40, size[1] - 40, 36):
+        left = 60
+        while left < size[0] - 200:
+            width = rng.randint(20, 160)
+            draw.rectangle((left, top, left + width, top + 18), fill=(rng.randint(0, 60),) * 3)
+            left += width + rng.randint(8, 24)
+    return main.pil_to_qimage(image)
+
+
+def old_path(qimage):
+    byte_array = QByteArray()
+    buffer = QBuffer(byte_array)
+    buffer.open(QIODevice.WriteOnly)
+    qimage.save(buffer, "PNG")
+    pil_image = Image.open(BytesIO(byte_array.data()))
+    return hashlib.md5(pil_image.tobytes()).hexdigest()
+
+
+def new_gui_path(qimage):
+    limits = main.app_config['image_size_limits']
+    main.compute_image_fingerprint(qimage, limits['fingerprint_size'])
+    width, height = main.fit_within_pixels(qimage.width(), qimage.height(), limits['max_working_pixels'])
+    if (width, height) != (qimage.width(), qimage.height()):
+        qimage = qimage.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return main.qimage_to_pil(qimage)
+
+
+def measure(func, *args, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    qimage = make_capture()
+    print(f"入力: {qimage.width()}x{qimage.height()} (中央値 / {args.repeat}回)")
+
+    old_ms, _ = measure(old_path, qimage, repeat=args.repeat)
+    gui_ms, working = measure(new_gui_path, qimage, repeat=args.repeat)
+    digest_ms, _ = measure(main.compute_source_digest, working, repeat=args.repeat)
+
+    print(f"旧経路（GUIスレッド）: {old_ms:8.1f}ms")
+    print(f"新経路（GUIスレッド）: {gui_ms:8.1f}ms  作業用画像 {working.size[0]}x{working.size[1]}")
+    print(f"新経路（厳密なハッシュ、バックグラウンド）: {digest_ms:8.1f}ms")
+    print(f"GUIスレッドの削減: {old_ms - gui_ms:.1f}ms ({old_ms / gui_ms:.1f}倍)")
+
+
+if __name__ == '__main__':
+    run()
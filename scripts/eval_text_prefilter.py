@@ -0,0 +1,316 @@
+"""TextPresenceClassifier（テキスト事前判定）の精度とCPU時間を合成画像で評価するスクリプト
+
+文字あり画像（日本語・英語のUI/ダークテーマ/写真上の字幕/短いラベル）と
+文字なし画像（グラデーション・写真風ノイズ・図形のみのUI・グラフ・テクスチャ）を乱数シードから生成し、
+config.json の text_prefilter.threshold で「文字あり」と判定した結果の適合率・再現率と
+1枚あたりのCPU時間を表示する。閾値を変えた場合の値も併せて表示する。
+
+CJKフォントが見つからない環境では、正方形のセルにストロークを組み合わせた擬似CJKグリフで代用する
+（分類器が見るのはエッジと連結成分の形状のみのため）。
+
+使い方: python scripts/eval_text_prefilter.py [--per-category 20] [--seed 0] [--cjk-font PATH] [--latin-font PATH]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'source'))
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont  # noqa: E402
+
+import main  # noqa: E402
+
+JAPANESE_LINES = [
+    'ファイルを保存しています', '設定を変更しました', 'この操作は元に戻せません', '新しいメッセージがあります',
+    '接続がタイムアウトしました', '次へ進む', 'キャンセル', '今日の天気は晴れのち曇り',
+    'アカウント情報を確認してください', '読み込み中です。しばらくお待ちください',
+]
+LATIN_LINES = [
+    'Saving your file', 'Settings have been updated', 'This action cannot be undone', 'You have new messages',
+    'The connection timed out', 'Next', 'Cancel', 'Sunny, then cloudy later today',
+    'Please check your account details', 'Loading, please wait a moment',
+]
+SCREEN_SIZES = [(1280, 720), (1600, 900), (900, 600), (640, 480)]
+THRESHOLD_SWEEP = [0.1, 0.15, 0.2, 0.25, 0.3, 0.4]
+
+
+class GlyphRenderer:
+    """文字列の描画（TrueTypeフォントが無い場合のフォールバック付き）"""
+
+    def __init__(self, font_file, cjk):
+        self.font_file = font_file
+        self.cjk = cjk
+
+    @staticmethod
+    def find_font(explicit, candidates):
+        for font_file in ([explicit] if explicit else []) + candidates:
+            try:
+                ImageFont.truetype(font_file, 12)
+                return font_file
+            except OSError:
+                continue
+        return None
+
+    def text_width(self, text, size):
+        if self.font_file:
+            return int(ImageFont.truetype(self.font_file, size).getlength(text))
+        return int(len(text) * size * (1.0 if self.cjk else 0.55))
+
+    def draw(self, image, xy, text, size, color, rng):
+        if self.font_file:
+            ImageDraw.Draw(image).text(xy, text, font=ImageFont.truetype(self.font_file, size), fill=color)
+        elif self.cjk:
+            self.draw_pseudo_cjk(image, xy, text, size, color, rng)
+        else:
+            self.draw_scaled_bitmap(image, xy, text, size, color)
+
+    @staticmethod
+    def draw_pseudo_cjk(image, xy, text, size, color, rng):
+        """1文字を正方形セル内の縦横ストロークで近似"""
+        draw = ImageDraw.Draw(image)
+        stroke = max(1, size // 12)
+        x, y = xy
+        for char in text:
+            if char in '。、':
+                draw.ellipse((x + size * 0.1, y + size * 0.7, x + size * 0.3, y + size * 0.9), outline=color,
+                             width=stroke)
+                x += size
+                continue
+            inset = size * 0.1
+            for _ in range(rng.randint(3, 7)):
+                if rng.random() < 0.5:
+                    yy = y + inset + rng.random() * (size - 2 * inset)
+                    x0 = x + inset + rng.random() * size * 0.3
+                    x1 = x + size - inset - rng.random() * size * 0.3
+                    draw.line((x0, yy, x1, yy), fill=color, width=stroke)
+                else:
+                    xx = x + inset + rng.random() * (size - 2 * inset)
+                    y0 = y + inset + rng.random() * size * 0.3
+                    y1 = y + size - inset - rng.random() * size * 0.3
+                    draw.line((xx, y0, xx, y1), fill=color, width=stroke)
+            x += size
+
+    @staticmethod
+    def draw_scaled_bitmap(image, xy, text, size, color):
+        """PIL標準のビットマップフォントで描画して指定サイズに拡大"""
+        font = ImageFont.load_default()
+        left, top, right, bottom = font.getbbox(text)
+        mask = Image.new('L', (right + 1, bottom + 1), 0)
+        ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255)
+        scale = size / max(1, bottom)
+        mask = mask.resize((max(1, int(mask.width * scale)), max(1, int(mask.height * scale))),
+                           Image.Resampling.BILINEAR)
+        image.paste(Image.new('RGB', mask.size, color), xy, mask)
+
+
+def random_background(rng, size, dark=False):
+    base = rng.randint(20, 50) if dark else rng.randint(225, 252)
+    return Image.new('RGB', size, (base, base, base + rng.randint(0, 3)))
+
+
+def photo_like(rng, size):
+    """平滑化したノイズに大きめの色ブロブを重ねた写真風の画像"""
+    small = Image.effect_noise((max(8, size[0] // 32), max(8, size[1] // 32)), rng.randint(30, 70))
+    image = Image.merge('RGB', [small.point(lambda v, o=rng.randint(-60, 60): v + o) for _ in range(3)])
+    image = image.resize(size, Image.Resampling.BICUBIC).filter(ImageFilter.GaussianBlur(rng.randint(2, 6)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(2, 6)):
+        cx, cy = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randint(size[1] // 10, size[1] // 3)
+        draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius),
+                     fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return image.filter(ImageFilter.GaussianBlur(rng.randint(3, 10)))
+
+
+def draw_lines(image, renderer, lines, rng, size_range, color, left=None, top=None, count=None):
+    count = count or rng.randint(3, 8)
+    size = rng.randint(*size_range)
+    x = left if left is not None else rng.randint(20, image.width // 6)
+    y = top if top is not None else rng.randint(20, image.height // 6)
+    for _ in range(count):
+        if y + size > image.height - 10:
+            break
+        text = rng.choice(lines)
+        while renderer.text_width(text, size) > image.width - x - 20 and len(text) > 2:
+            text = text[:-1]
+        renderer.draw(image, (x, y), text, size, color, rng)
+        y += int(size * rng.uniform(1.5, 2.2))
+
+
+def text_ui(rng, renderer, lines):
+    size = rng.choice(SCREEN_SIZES)
+    image = random_background(rng, size)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, size[0], 32), fill=(rng.randint(200, 230),) * 3)
+    draw_lines(image, renderer, lines, rng, (14, 22), (rng.randint(0, 60),) * 3, top=60)
+    return image
+
+
+def text_dark(rng, renderer, lines):
+    image = random_background(rng, rng.choice(SCREEN_SIZES), dark=True)
+    draw_lines(image, renderer, lines, rng, (14, 24), (rng.randint(200, 240),) * 3)
+    return image
+
+
+def text_caption(rng, renderer, lines):
+    """写真の下部に縁取りなしの字幕"""
+    image = photo_like(rng, rng.choice(SCREEN_SIZES))
+    size = rng.randint(22, 34)
+    draw_lines(image, renderer, lines, rng, (size, size), (255, 255, 255),
+               top=image.height - size * 4, count=2)
+    return image
+
+
+def text_label(rng, renderer, lines):
+    """大きな余白に短いラベルが1〜2行だけある画像（見逃しやすいケース）"""
+    image = random_background(rng, rng.choice(SCREEN_SIZES))
+    draw_lines(image, renderer, lines[5:7], rng, (16, 28), (rng.randint(0, 60),) * 3, count=rng.randint(1, 2))
+    return image
+
+
+def blank_gradient(rng):
+    size = rng.choice(SCREEN_SIZES)
+    start = [rng.randint(0, 255) for _ in range(3)]
+    end = [rng.randint(0, 255) for _ in range(3)]
+    gradient = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', [gradient.point(lambda v, s=s, e=e: s + (e - s) * v // 255)
+                               for s, e in zip(start, end)])
+
+
+def blank_photo(rng):
+    return photo_like(rng, rng.choice(SCREEN_SIZES))
+
+
+def blank_ui(rng):
+    """ボタン・パネル・アイコンだけの文字なしUI"""
+    size = rng.choice(SCREEN_SIZES)
+    image = random_background(rng, size)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, size[0], 32), fill=(rng.randint(200, 230),) * 3)
+    for _ in range(rng.randint(3, 8)):
+        x, y = rng.randrange(size[0] - 160), rng.randrange(40, size[1] - 60)
+        draw.rounded_rectangle((x, y, x + rng.randint(60, 160), y + rng.randint(24, 48)), radius=6,
+                               fill=tuple(rng.randint(120, 230) for _ in range(3)), outline=(120, 120, 120))
+    for i in range(rng.randint(2, 6)):
+        x, y = 20 + i * 56, size[1] - 60
+        draw.ellipse((x, y, x + 40, y + 40), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return image
+
+
+def blank_chart(rng):
+    """軸と折れ線・棒だけのグラフ"""
+    size = rng.choice(SCREEN_SIZES)
+    image = random_background(rng, size)
+    draw = ImageDraw.Draw(image)
+    draw.line((60, 40, 60, size[1] - 60, size[0] - 40, size[1] - 60), fill=(80, 80, 80), width=2)
+    points = [(60 + i * (size[0] - 100) // 20, rng.randint(60, size[1] - 80)) for i in range(21)]
+    draw.line(points, fill=(30, 100, 200), width=3)
+    for i in range(8):
+        x = 90 + i * (size[0] - 140) // 8
+        draw.rectangle((x, rng.randint(size[1] // 2, size[1] - 80), x + 30, size[1] - 62), fill=(200, 120, 40))
+    return image
+
+
+def blank_texture(rng):
+    """細かい周期模様（布目・タイル）でエッジが多い画像"""
+    size = rng.choice(SCREEN_SIZES)
+    image = random_background(rng, size)
+    draw = ImageDraw.Draw(image)
+    step = rng.randint(6, 16)
+    color = (rng.randint(100, 180),) * 3
+    for x in range(0, size[0], step):
+        draw.line((x, 0, x, size[1]), fill=color)
+    for y in range(0, size[1], step * rng.randint(1, 3)):
+        draw.line((0, y, size[0], y), fill=color)
+    return image
+
+
+TEXT_CATEGORIES = {'ui': text_ui, 'dark': text_dark, 'caption': text_caption, 'label': text_label}
+BLANK_CATEGORIES = {'gradient': blank_gradient, 'photo': blank_photo, 'ui': blank_ui,
+                    'chart': blank_chart, 'texture': blank_texture}
+
+
+def build_dataset(per_category, seed, renderers):
+    """(カテゴリ名, 言語, 文字ありか, 画像) のリスト"""
+    rng = random.Random(seed)
+    samples = []
+    for language, (renderer, lines) in renderers.items():
+        for name, generate in TEXT_CATEGORIES.items():
+            for _ in range(per_category):
+                samples.append((f"text/{name}", language, True, generate(rng, renderer, lines)))
+        for name, generate in BLANK_CATEGORIES.items():
+            for _ in range(per_category):
+                samples.append((f"blank/{name}", language, False, generate(rng)))
+    return samples
+
+
+def precision_recall(results, threshold):
+    true_positive = sum(1 for _, _, has_text, score, _ in results if has_text and score >= threshold)
+    false_positive = sum(1 for _, _, has_text, score, _ in results if not has_text and score >= threshold)
+    positives = sum(1 for _, _, has_text, _, _ in results if has_text)
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 1.0
+    recall = true_positive / positives if positives else 1.0
+    return precision, recall
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--per-category', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cjk-font', help='日本語の描画に使うフォントファイル')
+    parser.add_argument('--latin-font', help='英語の描画に使うフォントファイル')
+    args = parser.parse_args()
+
+    prefilter = main.app_config['text_prefilter']
+    classifier = main.TextPresenceClassifier(prefilter['analysis_max_side'], prefilter['edge_threshold'])
+
+    candidates = main.TextLayerTranslator.FONT_CANDIDATES
+    cjk_font = GlyphRenderer.find_font(args.cjk_font, candidates['japanese'])
+    latin_font = GlyphRenderer.find_font(args.latin_font, main.TextLayerTranslator.DEFAULT_FONTS)
+    print(f"日本語フォント: {cjk_font or '擬似CJKグリフ'}  英語フォント: {latin_font or 'PIL標準（拡大）'}")
+    renderers = {
+        'japanese': (GlyphRenderer(cjk_font, cjk=True), JAPANESE_LINES),
+        'english': (GlyphRenderer(latin_font, cjk=False), LATIN_LINES),
+    }
+
+    samples = build_dataset(args.per_category, args.seed, renderers)
+    results = []
+    for category, language, has_text, image in samples:
+        features = classifier.analyze(image, language)
+        results.append((category, language, has_text, features['score'], features['cpu_ms']))
+
+    threshold = prefilter['threshold']
+    print(f"\n{len(results)}枚 / 閾値 {threshold} (analysis_max_side={prefilter['analysis_max_side']}, "
+          f"edge_threshold={prefilter['edge_threshold']})")
+    print(f"{'カテゴリ':<16}{'言語':<10}{'枚数':>5}{'スコア平均':>10}{'最小':>7}{'最大':>7}{'判定:文字あり':>14}"
+          f"{'CPU平均ms':>11}")
+    for category, language in sorted({(r[0], r[1]) for r in results}):
+        rows = [r for r in results if r[0] == category and r[1] == language]
+        scores = [r[3] for r in rows]
+        detected = sum(1 for score in scores if score >= threshold)
+        print(f"{category:<16}{language:<10}{len(rows):>5}{statistics.mean(scores):>10.3f}{min(scores):>7.3f}"
+              f"{max(scores):>7.3f}{detected:>10}/{len(rows):<3}{statistics.mean(r[4] for r in rows):>11.1f}")
+
+    cpu = sorted(r[4] for r in results)
+    print(f"\nCPU時間/枚: 平均 {statistics.mean(cpu):.1f}ms, 中央値 {statistics.median(cpu):.1f}ms, "
+          f"p95 {cpu[int(len(cpu) * 0.95) - 1]:.1f}ms")
+
+    for language in renderers:
+        precision, recall = precision_recall([r for r in results if r[1] == language], threshold)
+        print(f"{language}: 適合率 {precision:.3f}  再現率 {recall:.3f}")
+    precision, recall = precision_recall(results, threshold)
+    print(f"全体: 適合率 {precision:.3f}  再現率 {recall:.3f}")
+
+    print("\n閾値ごとの比較:")
+    for value in THRESHOLD_SWEEP:
+        precision, recall = precision_recall(results, value)
+        marker = '  ← 現在の設定' if value == threshold else ''
+        print(f"  {value:.2f}: 適合率 {precision:.3f}  再現率 {recall:.3f}{marker}")
+
+
+if __name__ == '__main__':
+    run()
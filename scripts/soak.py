@@ -0,0 +1,125 @@
+"""取り込み→翻訳のサイクルを繰り返し、メモリ（RSS・tracemalloc）が増え続けないことを確認するソークテスト
+
+APIは呼ばず、入力画像をそのまま返すStubBackendで翻訳スレッドを駆動する。
+アプリと同様に結果を受け取った後は画像を解放し、QThread.finishedを受けてからスレッドを破棄する。
+
+使い方: python scripts/soak.py [--cycles 1000] [--max-rss-growth-mb 30] [--max-traced-growth-mb 5]
+増加量が上限を超えた場合は終了コード1で終了する。
+"""
+import argparse
+import copy
+import gc
+import logging
+import os
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'source'))
+
+from PIL import Image, ImageDraw  # noqa: E402
+from PyQt5.QtCore import QCoreApplication, QEvent, QEventLoop  # noqa: E402
+
+import main  # noqa: E402
+
+WARMUP_CYCLES = 50
+
+
+def soak_config():
+    """スタブバックエンドのみを使い、ディスクに書き込まない設定"""
+    config = copy.deepcopy(main.app_config)
+    config['backends']['endpoints'] = [{'name': 'stub', 'type': 'stub', 'latency_ms': 0}]
+    config['cassettes']['mode'] = 'off'
+    config['adaptive_timeouts']['enabled'] = False
+    return config
+
+
+def capture(rng):
+    """クリップボードの取り込みを模して合成画像をQImage → PIL Imageに変換"""
+    width, height = rng.choice([(1280, 720), (900, 600), (1536, 1024), (640, 960)])
+    image = Image.new('RGB', (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for top in range(20, height - 20, 30):
+        draw.rectangle((20, top, rng.randint(100, width - 20), top + 14), fill=(30, 30, 30))
+    qimage = main.pil_to_qimage(image)
+    main.compute_image_fingerprint(qimage, main.app_config['image_size_limits']['fingerprint_size'])
+    return main.qimage_to_pil(qimage)
+
+
+def run_cycle(config, router, prompts, rng):
+    job = main.TranslationJob(capture(rng), 'japanese', 'english', mode='image_edit')
+    thread = main.TranslationThread(job, config, router=router, prompts=prompts)
+    outcome = {}
+    loop = QEventLoop()
+    thread.translated.connect(lambda image: outcome.setdefault('size', image.size))
+    thread.skipped.connect(lambda message: outcome.setdefault('skipped', message))
+    thread.error.connect(lambda message: outcome.setdefault('error', message))
+    thread.finished.connect(loop.quit)
+    thread.start()
+    loop.exec_()
+
+    # アプリのrelease_translation_threadと同じ解放手順
+    thread.image = None
+    job.release()
+    thread.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    if 'error' in outcome:
+        raise RuntimeError(outcome['error'])
+    return outcome
+
+
+def sample():
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    return main.get_process_memory_mb(), traced / (1024 * 1024)
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=1000)
+    parser.add_argument('--max-rss-growth-mb', type=float, default=30.0)
+    parser.add_argument('--max-traced-growth-mb', type=float, default=5.0)
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)  # noqa: F841
+    # サイクルごとの処理ログは出さない
+    logging.getLogger('ImageTranslator').setLevel(logging.WARNING)
+    config = soak_config()
+    router = main.BackendRouter.from_config(config)
+    prompts = main.PromptTemplateLibrary.from_config(config)
+    rng = random.Random(0)
+
+    for _ in range(WARMUP_CYCLES):
+        run_cycle(config, router, prompts, rng)
+    tracemalloc.start()
+    base_rss, base_traced = sample()
+    print(f"ウォームアップ後: RSS {base_rss:.1f}MB, tracemalloc {base_traced:.2f}MB")
+
+    outcomes = {'translated': 0, 'skipped': 0}
+    interval = max(1, args.cycles // 10)
+    for cycle in range(1, args.cycles + 1):
+        outcome = run_cycle(config, router, prompts, rng)
+        outcomes['skipped' if 'skipped' in outcome else 'translated'] += 1
+        if cycle % interval == 0:
+            rss, traced = sample()
+            print(f"{cycle:>6}回: RSS {rss:.1f}MB ({rss - base_rss:+.1f}), "
+                  f"tracemalloc {traced:.2f}MB ({traced - base_traced:+.2f})")
+
+    rss, traced = sample()
+    print(f"翻訳 {outcomes['translated']}件, スキップ {outcomes['skipped']}件")
+    failures = []
+    if rss - base_rss > args.max_rss_growth_mb:
+        failures.append(f"RSSが{rss - base_rss:.1f}MB増加（上限 {args.max_rss_growth_mb}MB）")
+    if traced - base_traced > args.max_traced_growth_mb:
+        failures.append(f"tracemallocが{traced - base_traced:.2f}MB増加（上限 {args.max_traced_growth_mb}MB）")
+    for failure in failures:
+        print(f"NG: {failure}")
+    if not failures:
+        print("OK: メモリ使用量は一定です")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(run())
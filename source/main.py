@@ -3,12 +3,34 @@ import os
 import base64
 import requests
 import json
+import re
+import itertools
+import random
+import hashlib
+import socket
+import weakref
+import struct
+import gzip
+import math
+import sqlite3
+import threading
+import multiprocessing
+import time
 from io import BytesIO
 from datetime import datetime
-from PIL import Image
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory, resource_tracker
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from PIL import (Image, ImageFilter, ImageStat, ImageOps, ImageDraw, ImageFont, ImageColor, ImageSequence,
+                 ImageChops)
 import logging
 from pathlib import Path
 import warnings
+import argparse
+import traceback
 
 # DeprecationWarning対策（警告を無視）
 warnings.filterwarnings('ignore', category=DeprecationWarning)
@@ -21,9 +43,10 @@ os.environ['QT_QPA_PLATFORM_PLUGIN_PATH'] = plugin_path
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                            QLabel, QPushButton, QSystemTrayIcon, QMenu,
-                           QAction, QMessageBox, QScrollArea, QFileDialog)
-from PyQt5.QtCore import QTimer, Qt, pyqtSignal, QThread
-from PyQt5.QtGui import QPixmap, QIcon
+                           QAction, QMessageBox, QScrollArea, QFileDialog,
+                           QListWidget, QListWidgetItem)
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal, QThread, QSize, QObject, QRect, QPoint
+from PyQt5.QtGui import QPixmap, QIcon, QImage, QPainter, QColor, QPen
 from dotenv import load_dotenv
 
 # .envファイルから環境変数を読み込み（プロジェクトルートから）
@@ -50,6 +73,22 @@ LANGUAGE_MAP = {
     'vietnamese': {'display': 'ベトナム語', 'api': 'Vietnamese'}
 }
 
+# 翻訳方式
+TRANSLATION_MODES = {
+    'image_edit': '画像編集（gpt-image-1）',
+    'text_layer': 'テキストレイヤー（文字抽出＋ローカル描画）'
+}
+
+# 漢字・ハングルなど正方形に近い字形を持つ言語
+CJK_LANGUAGES = {'japanese', 'chinese_simplified', 'chinese_traditional', 'korean'}
+
+# 品質ごとの概算コスト（USD/画像）
+COST_PER_IMAGE = {
+    'low': 0.01,
+    'medium': 0.04,
+    'high': 0.17
+}
+
 
 def setup_logger():
     """ログ設定"""
@@ -88,6 +127,323 @@ def setup_logger():
     return logger
 
 
+def get_process_memory_mb():
+    """プロセスの常駐メモリ（RSS, MB）を取得（取得できない場合はNone）"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize / (1024 * 1024)
+            return None
+
+        # Linux: /proc/self/statm の2列目が常駐ページ数
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def pixmap_bytes(pixmap):
+    """QPixmapの概算メモリ使用量（32bit/pixel換算）"""
+    return pixmap.width() * pixmap.height() * 4
+
+
+def qimage_to_pil(qimage):
+    """QImageをPNGエンコード・デコードを経由せずにPIL Imageへ変換"""
+    has_alpha = qimage.hasAlphaChannel()
+    mode = 'RGBA' if has_alpha else 'RGB'
+    converted = qimage.convertToFormat(QImage.Format_RGBA8888 if has_alpha else QImage.Format_RGB888)
+
+    # 行末パディングを含むピクセルバッファをそのままPILに渡す
+    bytes_per_line = converted.bytesPerLine()
+    pointer = converted.constBits()
+    pointer.setsize(bytes_per_line * converted.height())
+    return Image.frombuffer(mode, (converted.width(), converted.height()), bytes(pointer),
+                            'raw', mode, bytes_per_line, 1)
+
+
+def pil_to_qimage(image):
+    """PIL ImageをPNGエンコード・デコードを経由せずにQImageへ変換"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    channels = len(image.mode)
+    qformat = QImage.Format_RGBA8888 if channels == 4 else QImage.Format_RGB888
+    data = image.tobytes()
+    # QImageはバッファを参照するだけのため、copy()でQt側にピクセルを持たせる
+    return QImage(data, image.width, image.height, image.width * channels, qformat).copy()
+
+
+# 画像編集APIの送信サイズ
+API_IMAGE_SIZES = ((1024, 1024), (1536, 1024), (1024, 1536))
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def read_png_header(data):
+    """PNGのIHDRチャンクを読む（デコードしない、PNGでなければNone）"""
+    if len(data) < 33 or not data.startswith(PNG_SIGNATURE) or data[12:16] != b'IHDR':
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data[16:29])
+    return {
+        'size': (width, height),
+        'bit_depth': bit_depth,
+        'color_type': color_type,
+        'interlace': interlace,
+    }
+
+
+def passthrough_png_size(data):
+    """再エンコードせずにAPIへ送れるPNGならサイズを返す（なければNone）
+
+    送信サイズと一致する8bit RGB（アルファなし）のみ対象。画像編集APIは透明部分を
+    編集範囲として扱うため、アルファ付きのPNGは従来どおりRGBに変換して送る。
+    """
+    header = read_png_header(data)
+    if header is None or header['size'] not in API_IMAGE_SIZES:
+        return None
+    if header['bit_depth'] != 8 or header['color_type'] != 2:
+        return None
+    return header['size']
+
+
+def compute_source_digest(image):
+    """ソース画像の全画素の厳密なハッシュ（翻訳履歴のキー、GUIスレッド外で計算する）"""
+    return hashlib.md5(image.tobytes()).hexdigest()
+
+
+def decode_png_capture(png_bytes):
+    """そのまま送信するクリップボードのPNGをデコードし、(画像, 厳密なハッシュ)を返す（GUIスレッド外で呼び出し）
+
+    QImage経由で取り込んだ場合と同じ画素のハッシュになるため、取り込み経路によらず履歴・キャッシュのキーが一致する。
+    """
+    image = Image.open(BytesIO(png_bytes))
+    image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image, compute_source_digest(image)
+
+
+def compute_image_fingerprint(qimage, fingerprint_size=256):
+    """縮小表現から画像のフィンガープリントを計算（全解像度のピクセルを走査しない）
+
+    クリップボードの変化検出用。縮小で潰れる小さな差分は区別できないため、
+    翻訳履歴のキーにはcompute_source_digestを使う。
+    """
+    reduced = qimage.scaled(fingerprint_size, fingerprint_size,
+                            Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    reduced = reduced.convertToFormat(QImage.Format_RGB888)
+    pointer = reduced.constBits()
+    pointer.setsize(reduced.bytesPerLine() * reduced.height())
+
+    # 縮小で潰れる差分を区別するため元の解像度もハッシュに含める
+    digest = hashlib.md5(f"{qimage.width()}x{qimage.height()}:".encode('ascii'))
+    digest.update(bytes(pointer))
+    return digest.hexdigest()
+
+
+def fit_within_pixels(width, height, max_pixels):
+    """アスペクト比を保ったまま総ピクセル数がmax_pixels以下になるサイズを計算"""
+    if width * height <= max_pixels:
+        return width, height
+    scale = (max_pixels / (width * height)) ** 0.5
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+# 共有メモリで受け渡す画像モードと1画素あたりのバイト数
+SHARED_IMAGE_MODES = {'L': 1, 'RGB': 3, 'RGBA': 4}
+
+
+def pad_to_canvas(source, canvas_size, scaled_size, offset, bg_color):
+    """画像を縮小してキャンバスに配置（パディング）"""
+    canvas = Image.new('RGB', canvas_size, bg_color)
+    # reducing_gapで整数倍縮小してからLANCZOSを1回適用
+    resized = source.resize(scaled_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    canvas.paste(resized, offset)
+    return canvas
+
+
+def crop_and_resize(source, crop_box, size):
+    """指定範囲を切り出して指定サイズにリサイズ"""
+    return source.crop(crop_box).resize(size, Image.LANCZOS)
+
+
+def encode_png(image):
+    """PNGバイト列にエンコード"""
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def encode_output_image(image, image_format):
+    """出力ストア用にエンコード（最適化PNGまたは可逆WebP）"""
+    buffer = BytesIO()
+    if image_format == 'webp':
+        image.save(buffer, format="WEBP", lossless=True, quality=100, method=4)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def attach_shared_memory(name):
+    """既存の共有メモリに接続（ワーカープロセス側、解放は作成元の親プロセスが行う）"""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix':
+        # 接続側でもresource_trackerに登録され終了時に削除・警告されるため登録を外す
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def run_shared_image_task(func, source_spec, output_spec, args):
+    """ワーカープロセスで実行: 共有メモリ上の画像にfuncを適用し、画像結果は共有メモリに書き戻す"""
+    name, mode, size = source_spec
+    source_shm = attach_shared_memory(name)
+    output_shm = attach_shared_memory(output_spec[0]) if output_spec else None
+    try:
+        length = size[0] * size[1] * SHARED_IMAGE_MODES[mode]
+        with source_shm.buf[:length] as view:
+            source = Image.frombytes(mode, size, bytes(view))
+        result = func(source, *args)
+        if output_shm is None:
+            return result
+
+        data = result.tobytes()
+        output_shm.buf[:len(data)] = data
+        return None
+    finally:
+        source_shm.close()
+        if output_shm is not None:
+            output_shm.close()
+
+
+class SharedImageBuffer:
+    """画素データをpickleせずにワーカープロセスと受け渡す共有メモリバッファ"""
+
+    def __init__(self, mode, size):
+        self.mode = mode
+        self.size = tuple(size)
+        self.length = self.size[0] * self.size[1] * SHARED_IMAGE_MODES[mode]
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, self.length))
+
+    @classmethod
+    def from_image(cls, image):
+        buffer = cls(image.mode, image.size)
+        buffer.shm.buf[:buffer.length] = image.tobytes()
+        return buffer
+
+    def spec(self):
+        """ワーカーに渡す (共有メモリ名, モード, サイズ)"""
+        return self.shm.name, self.mode, self.size
+
+    def to_image(self):
+        with self.shm.buf[:self.length] as view:
+            return Image.frombytes(self.mode, self.size, bytes(view))
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ImageWorkerPool:
+    """CPU負荷の高い画像処理（リサイズ・合成・PNGエンコード）を実行するプロセスプール
+
+    GUIスレッド・翻訳スレッドとGILを共有しないよう別プロセスで処理し、画素データは
+    共有メモリで受け渡す。小さい画像や無効時・プール異常時は呼び出し元のスレッドで処理する。
+    """
+
+    def __init__(self, enabled, max_workers, min_pixels):
+        self.enabled = enabled
+        self.max_workers = max_workers
+        self.min_pixels = min_pixels
+        self.logger = logging.getLogger('ImageTranslator.WorkerPool')
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Windowsと同じspawn方式に統一（fork時のQt・スレッド状態の複製を避ける）
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                self.logger.info(f"画像処理プロセスプール起動: {self.max_workers}プロセス")
+            return self._executor
+
+    def warm_up(self):
+        """ワーカープロセスを先に起動しておく（初回処理時の起動待ちを避ける）"""
+        if not self.enabled:
+            return
+        executor = self.executor()
+        for _ in range(self.max_workers):
+            executor.submit(os.getpid)
+
+    def should_offload(self, size):
+        return self.enabled and size[0] * size[1] >= self.min_pixels
+
+    def run(self, func, image, args=(), output_size=None, output_mode=None, wait=None):
+        """func(image, *args)を実行
+
+        output_sizeを指定した場合は結果を画像として共有メモリで受け取る（output_modeの既定は入力と同じ）。
+        waitはFutureの完了を待つ関数（キャンセル対応のため呼び出し側が渡す）。
+        """
+        if not self.should_offload(image.size):
+            return func(image, *args)
+
+        if image.mode not in SHARED_IMAGE_MODES:
+            image = image.convert('RGB')
+        task_start = time.perf_counter()
+        source = SharedImageBuffer.from_image(image)
+        output = SharedImageBuffer(output_mode or image.mode, output_size) if output_size else None
+        try:
+            future = self.executor().submit(run_shared_image_task, func, source.spec(),
+                                            output.spec() if output else None, args)
+            result = wait(future) if wait else future.result()
+            if output is not None:
+                result = output.to_image()
+            self.logger.debug(f"{func.__name__}: {image.size} をワーカーで処理 "
+                              f"({(time.perf_counter() - task_start) * 1000:.1f}ms)")
+            return result
+        except BrokenProcessPool as e:
+            self.logger.error(f"プロセスプール異常のためスレッド内処理に切り替え: {str(e)}")
+            with self._lock:
+                self._executor = None
+            return func(image, *args)
+        finally:
+            source.release()
+            if output is not None:
+                output.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
 class ZoomableImageLabel(QLabel):
     """Ctrl+マウスホイールで拡大縮小可能な画像ラベル"""
 
@@ -100,10 +456,26 @@ class ZoomableImageLabel(QLabel):
 
     def setPixmap(self, pixmap):
         """元の画像を保存し、表示"""
+        # 保持する画像はメモリ上限に収まるよう縮小してから保存
+        max_bytes = app_config['memory_settings']['max_retained_image_mb'] * 1024 * 1024
+        if pixmap_bytes(pixmap) > max_bytes:
+            shrink = (max_bytes / pixmap_bytes(pixmap)) ** 0.5
+            pixmap = pixmap.scaled(
+                max(1, int(pixmap.width() * shrink)),
+                max(1, int(pixmap.height() * shrink)),
+                Qt.KeepAspectRatio,
+                Qt.SmoothTransformation
+            )
         self.original_pixmap = pixmap
         self.scale_factor = 1.0
         super().setPixmap(pixmap)
 
+    def release(self):
+        """保持している画像を解放"""
+        self.original_pixmap = None
+        self.scale_factor = 1.0
+        self.clear()
+
     def wheelEvent(self, event):
         """マウスホイールイベント処理（Ctrl+ホイールで拡大縮小）"""
         if event.modifiers() == Qt.ControlModifier and self.original_pixmap:
@@ -114,8 +486,10 @@ class ZoomableImageLabel(QLabel):
             else:
                 self.scale_factor /= 1.15  # 縮小
 
-            # スケール制限（0.1倍～5倍）
-            self.scale_factor = max(0.1, min(5.0, self.scale_factor))
+            # スケール制限（0.1倍～5倍、かつ表示中の画像がメモリ上限を超えない倍率まで）
+            max_bytes = app_config['memory_settings']['max_retained_image_mb'] * 1024 * 1024
+            max_scale = min(5.0, (max_bytes / max(1, pixmap_bytes(self.original_pixmap))) ** 0.5)
+            self.scale_factor = max(0.1, min(max_scale, self.scale_factor))
 
             # 画像をスケール
             scaled_size = self.original_pixmap.size() * self.scale_factor
@@ -138,7 +512,11 @@ class ZoomableImageLabel(QLabel):
 
 
 # ロガー初期化
-logger = setup_logger()
+# 画像処理ワーカープロセス（spawnでこのモジュールを読み込む）ではログファイルを作らない
+if multiprocessing.parent_process() is None:
+    logger = setup_logger()
+else:
+    logger = logging.getLogger('ImageTranslator')
 
 
 def load_config():
@@ -155,7 +533,8 @@ def load_config():
         "api_settings": {
             "quality": "medium",
             "input_fidelity": "high",
-            "timeout": 120
+            "timeout": 120,
+            "translation_mode": "image_edit"
         },
         "image_processing": {
             "auto_padding": True,
@@ -172,7 +551,8 @@ def load_config():
         "output_settings": {
             "auto_save": True,
             "save_directory": "images",
-            "filename_format": "translated_{timestamp}.png"
+            "filename_format": "translated_{timestamp}.png",
+            "copy_to_clipboard": False
         },
         "prompt_settings": {
             "use_emoji_markers": True,
@@ -183,6 +563,193 @@ def load_config():
             "log_level": "INFO",
             "detailed_logging": True,
             "save_padded_images": False
+        },
+        "image_size_limits": {
+            "max_input_pixels": 50000000,
+            "max_working_pixels": 4194304,
+            "fingerprint_size": 256
+        },
+        "text_prefilter": {
+            "enabled": True,
+            "threshold": 0.2,
+            "analysis_max_side": 1024,
+            "edge_threshold": 48
+        },
+        "text_region_mask": {
+            "enabled": True,
+            "merge_px": 9,
+            "margin_px": 6,
+            "feather_px": 2,
+            "min_coverage": 0.002,
+            "max_coverage": 0.6,
+            "quality": "medium"
+        },
+        "quality_policy": {
+            "enabled": True,
+            "small_glyph_px": 10,
+            "high_fidelity_glyph_px": 16,
+            "dense_text_ratio": 0.12,
+            "dense_glyph_count": 150,
+            "sparse_glyph_count": 12,
+            "small_image_megapixels": 0.3,
+            "min_history_attempts": 5,
+            "max_failure_rate": 0.3
+        },
+        "clipboard_debounce": {
+            "settle_ms": 600,
+            "max_wait_ms": 3000
+        },
+        "backends": {
+            "routing": {
+                "ewma_alpha": 0.3,
+                "error_penalty": 4.0,
+                "failure_threshold": 2,
+                "cooldown_sec": 60,
+                "initial_latency_ms": 30000,
+                "max_attempts": 2,
+                "health_check_interval_sec": 300,
+                "decision_log_size": 200
+            },
+            "endpoints": [
+                {"name": "openai", "type": "openai", "base_url": "https://api.openai.com/v1",
+                 "api_key_env": "OPENAI_API_KEY", "enabled": True}
+            ]
+        },
+        "ipc_server": {
+            "enabled": False,
+            "host": "127.0.0.1",
+            "port": 8765,
+            "auth_token": "",
+            "max_request_mb": 50,
+            "sync_timeout_sec": 300,
+            "result_ttl_sec": 600
+        },
+        "process_pool": {
+            "enabled": True,
+            "max_workers": 2,
+            "min_pixels": 2000000,
+            "lag_probe_interval_ms": 50,
+            "lag_report_interval_sec": 60
+        },
+        "responsiveness_watchdog": {
+            "enabled": True,
+            "stall_threshold_ms": 250,
+            "stack_depth": 15,
+            "top_stacks": 10,
+            "report_file": "logs/responsiveness_report.json",
+            "report_write_interval_sec": 300
+        },
+        "cassettes": {
+            "mode": "off",
+            "directory": "data/cassettes"
+        },
+        "shared_cache": {
+            "enabled": False,
+            "url": "http://127.0.0.1:8766",
+            "auth_token": "",
+            "lookup_timeout_ms": 300,
+            "store_timeout_sec": 10,
+            "backoff_sec": 60,
+            "server_directory": "data/shared_cache"
+        },
+        "clipboard_png_passthrough": {
+            "enabled": True
+        },
+        "durable_queue": {
+            "enabled": True,
+            "database_file": "data/jobs.db",
+            "image_directory": "data/pending",
+            "sources": ["clipboard", "file"],
+            "max_loaded_jobs": 8,
+            "max_retries": 8,
+            "retry_base_sec": 15,
+            "retry_max_sec": 900,
+            "resume_delay_ms": 3000,
+            "compaction_interval_minutes": 30,
+            "failed_retention_days": 7
+        },
+        "prompt_templates": {
+            "directory": "assets/prompts",
+            "variants": {
+                "optimized": {"1": 1.0, "2": 0.0}
+            }
+        },
+        "adaptive_timeouts": {
+            "enabled": True,
+            "state_file": "data/latency_sketches.json",
+            "quantile": 0.99,
+            "factor": 1.5,
+            "min_read_sec": 20,
+            "max_read_sec": 180,
+            "connect_sec": 5,
+            "min_samples": 20,
+            "max_samples": 2000,
+            "fallback_timeout_sec": 120,
+            "download_timeout_sec": 30
+        },
+        "performance_stats": {
+            "window_size": 200,
+            "refresh_interval_ms": 1000
+        },
+        "output_store": {
+            "enabled": True,
+            "format": "png",
+            "gc_interval_minutes": 60,
+            "gc_grace_minutes": 60
+        },
+        "multi_frame": {
+            "enabled": True,
+            "near_duplicate_distance": 3,
+            "max_frames": 500,
+            "max_concurrent_frames": 4
+        },
+        "region_watch": {
+            "frame_source": "screen",
+            "interval_ms": 500,
+            "max_interval_ms": 4000,
+            "diff_width": 160,
+            "pixel_threshold": 24,
+            "change_threshold": 0.02,
+            "stable_grabs": 2,
+            "synthetic": {
+                "size": [640, 360],
+                "change_every": 20,
+                "settle_grabs": 2
+            }
+        },
+        "job_settings": {
+            "max_concurrent_jobs": 1,
+            "supersede_policy": "latest_wins"
+        },
+        "atlas_packing": {
+            "enabled": True,
+            "max_item_side": 700,
+            "max_items": 6,
+            "gutter_px": 24
+        },
+        "text_layer_settings": {
+            "endpoint": "https://api.openai.com/v1/chat/completions",
+            "model": "gpt-4o-mini",
+            "timeout": 60,
+            "max_image_side": 2048,
+            "input_cost_per_1m_tokens": 0.15,
+            "output_cost_per_1m_tokens": 0.6,
+            "font_files": []
+        },
+        "history_settings": {
+            "enabled": True,
+            "database_file": "data/history.db",
+            "thumbnail_size": 128,
+            "page_size": 50,
+            "reuse_cached_results": True,
+            "retention_days": 30,
+            "max_entries": 100000,
+            "compaction_interval_minutes": 60
+        },
+        "memory_settings": {
+            "max_retained_image_mb": 64,
+            "memory_log_interval_sec": 300,
+            "tracemalloc_enabled": False
         }
     }
 
@@ -217,46 +784,2786 @@ def load_config():
 app_config = load_config()
 
 
+class TextPresenceClassifier:
+    """画像内のテキスト有無を推定する軽量分類器
+
+    エッジ密度・行方向の投影プロファイル・連結成分の統計から0〜1のスコアを算出する。
+    ピクセル単位の処理はPillowの組み込みフィルタ（C実装）で行い、
+    Pythonで扱うのはランレングス単位の連結成分ラベリングのみ。
+    """
+
+    RUN_PATTERN = re.compile(rb'[^\x00]+')
+
+    def __init__(self, analysis_max_side=1024, edge_threshold=48):
+        self.analysis_max_side = analysis_max_side
+        self.edge_threshold = edge_threshold
+        self.logger = logging.getLogger('ImageTranslator.TextPresenceClassifier')
+
+    def prepare(self, image):
+        """解析用のグレースケール縮小画像を作成"""
+        width, height = image.size
+        scale = min(1.0, self.analysis_max_side / max(width, height))
+        if scale < 1.0:
+            image = image.resize((max(1, int(width * scale)), max(1, int(height * scale))),
+                                 Image.Resampling.BILINEAR, reducing_gap=2.0)
+        return image.convert('L')
+
+    def edge_map(self, gray):
+        """二値エッジマップ（255=エッジ）"""
+        edges = gray.filter(ImageFilter.FIND_EDGES)
+        threshold = self.edge_threshold
+        return edges.point(lambda v: 255 if v >= threshold else 0)
+
+    def count_text_lines(self, binary):
+        """行方向の投影プロファイルから文字行らしい帯の数を数える"""
+        height = binary.height
+        row_density = list(binary.resize((1, height), Image.Resampling.BOX).getdata())
+
+        lines = 0
+        band_height = 0
+        max_band = max(4, int(height * 0.15))
+        for value in row_density + [0]:
+            if value > 8:
+                band_height += 1
+            else:
+                if 3 <= band_height <= max_band:
+                    lines += 1
+                band_height = 0
+        return lines
+
+    def label_components(self, binary):
+        """ランレングス＋Union-Findで連結成分を抽出し、外接矩形と画素数を返す"""
+        width, height = binary.size
+        data = binary.tobytes()
+        parent = []
+
+        def find(label):
+            while parent[label] != label:
+                parent[label] = parent[parent[label]]
+                label = parent[label]
+            return label
+
+        all_runs = []
+        previous_runs = []
+        for y in range(height):
+            row = data[y * width:(y + 1) * width]
+            current_runs = []
+            j = 0
+            for match in self.RUN_PATTERN.finditer(row):
+                start, end = match.span()
+                # 前の行で重なるランと結合（4近傍）
+                while j < len(previous_runs) and previous_runs[j][1] <= start:
+                    j += 1
+                label = None
+                k = j
+                while k < len(previous_runs) and previous_runs[k][0] < end:
+                    other = find(previous_runs[k][2])
+                    if label is None:
+                        label = other
+                    elif other != label:
+                        parent[other] = label
+                    k += 1
+                if label is None:
+                    label = len(parent)
+                    parent.append(label)
+                current_runs.append((start, end, label))
+                all_runs.append((label, start, end, y))
+            previous_runs = current_runs
+
+        components = {}
+        for label, start, end, y in all_runs:
+            root = find(label)
+            box = components.get(root)
+            if box is None:
+                components[root] = [start, y, end, y + 1, end - start]
+            else:
+                box[0] = min(box[0], start)
+                box[1] = min(box[1], y)
+                box[2] = max(box[2], end)
+                box[3] = y + 1
+                box[4] += end - start
+        return list(components.values())
+
+    def analyze(self, image, language):
+        """テキスト存在スコアと特徴量を返す"""
+        cpu_start = time.thread_time()
+
+        gray = self.prepare(image)
+        binary = self.edge_map(gray)
+        edge_density = ImageStat.Stat(binary).mean[0] / 255
+        line_count = self.count_text_lines(binary)
+
+        # ストロークを文字単位にまとめるため軽く膨張させてから連結成分を抽出
+        glyph_map = binary.filter(ImageFilter.MaxFilter(3))
+        components = self.label_components(glyph_map)
+
+        width, height = glyph_map.size
+        glyphs = []
+        for x0, y0, x1, y1, pixels in components:
+            box_width, box_height = x1 - x0, y1 - y0
+            if not (4 <= box_height <= height * 0.25 and 2 <= box_width <= width * 0.5):
+                continue
+            fill = pixels / (box_width * box_height)
+            if 0.1 <= fill <= 0.9:
+                glyphs.append((box_width, box_height))
+
+        # 文字種ヒューリスティック: CJKは1文字ずつ正方形に近い塊、ラテン文字は単語単位の横長の塊
+        square_ratio = 0.0
+        if glyphs:
+            square = sum(1 for w, h in glyphs if 0.75 <= w / h <= 1.33)
+            square_ratio = square / len(glyphs)
+        script_match = square_ratio if language in CJK_LANGUAGES else 1.0 - square_ratio
+
+        density_score = min(1.0, edge_density / 0.08)
+        glyph_score = min(1.0, len(glyphs) / 20)
+        line_score = min(1.0, line_count / 3)
+        score = (0.3 * density_score + 0.4 * glyph_score + 0.3 * line_score) * (0.7 + 0.3 * script_match)
+
+        features = {
+            'score': score,
+            'edge_density': edge_density,
+            'text_lines': line_count,
+            'components': len(components),
+            'glyph_components': len(glyphs),
+            'square_glyph_ratio': square_ratio,
+            'min_glyph_height': min((h for _, h in glyphs), default=None),
+            'analysis_size': gray.size,
+            'cpu_ms': (time.thread_time() - cpu_start) * 1000
+        }
+        self.logger.debug(f"テキスト存在推定: {features}")
+        return features
+
+
+class TextRegionMasker:
+    """テキスト領域マスク生成（images/editsのmask用）
+
+    エッジマップをモルフォロジー演算（膨張・収縮）で文字行単位の領域にまとめ、
+    パディング済みのキャンバス座標でマスクを作る。
+    """
+
+    def __init__(self, classifier, merge_px=9, margin_px=6, feather_px=2):
+        self.classifier = classifier
+        self.merge_px = merge_px
+        self.margin_px = margin_px
+        self.feather_px = feather_px
+        self.logger = logging.getLogger('ImageTranslator.TextRegionMasker')
+
+    @staticmethod
+    def _odd(size):
+        """MaxFilter/MinFilterに渡すため奇数サイズに丸める"""
+        size = max(3, int(size))
+        return size if size % 2 == 1 else size + 1
+
+    def build_region(self, canvas, content_box):
+        """テキスト領域（255=テキスト）のL画像をキャンバスと同じサイズで返す"""
+        gray = self.classifier.prepare(canvas)
+        scale = gray.width / canvas.width
+        binary = self.classifier.edge_map(gray)
+
+        # クロージングで文字同士をつなげて行単位の塊にし、余白分だけ追加で膨張
+        merge = self._odd(self.merge_px * scale)
+        region = binary.filter(ImageFilter.MaxFilter(merge)).filter(ImageFilter.MinFilter(merge))
+        region = region.filter(ImageFilter.MaxFilter(self._odd(self.margin_px * scale)))
+
+        region = region.resize(canvas.size, Image.Resampling.NEAREST)
+
+        # パディング部分は編集対象外
+        cleared = Image.new('L', canvas.size, 0)
+        cleared.paste(region.crop(content_box), content_box[:2])
+        return cleared
+
+    def feather(self, region):
+        """合成時の境界を滑らかにしたマスク"""
+        if self.feather_px <= 0:
+            return region
+        return region.filter(ImageFilter.GaussianBlur(self.feather_px))
+
+    @staticmethod
+    def to_edit_mask_png(region):
+        """APIのmask形式（透明部分=編集対象）のPNGバイト列に変換"""
+        mask = Image.new('RGBA', region.size, (0, 0, 0, 255))
+        mask.putalpha(ImageOps.invert(region))
+        buffer = BytesIO()
+        mask.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+class TextLayerTranslator:
+    """テキストレイヤー方式の翻訳
+
+    画像を1回だけチャットモデルに送り、文字領域・原文・訳文・文字サイズ・文字色を
+    構造化出力（JSON）で受け取る。元画像の文字部分を周囲の色で塗りつぶしてから、
+    訳文をPILでローカル描画する。画像全体を再生成しないため、平坦なUIの
+    スクリーンショットでは画像編集方式より高速・低コスト。
+    """
+
+    # 座標・文字サイズは画像サイズに対する0〜1000の正規化値で受け取る
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "boxes": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "x": {"type": "number"},
+                        "y": {"type": "number"},
+                        "width": {"type": "number"},
+                        "height": {"type": "number"},
+                        "source_text": {"type": "string"},
+                        "translation": {"type": "string"},
+                        "font_size": {"type": "number"},
+                        "color": {"type": "string"},
+                        "bold": {"type": "boolean"}
+                    },
+                    "required": ["x", "y", "width", "height", "source_text", "translation",
+                                 "font_size", "color", "bold"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["boxes"],
+        "additionalProperties": False
+    }
+
+    # 翻訳先言語ごとのフォント候補（Windowsのフォントフォルダはファイル名だけで解決される）
+    FONT_CANDIDATES = {
+        'japanese': ['meiryo.ttc', 'YuGothM.ttc', 'msgothic.ttc', 'NotoSansCJK-Regular.ttc'],
+        'chinese_simplified': ['msyh.ttc', 'simsun.ttc', 'NotoSansCJK-Regular.ttc'],
+        'chinese_traditional': ['msjh.ttc', 'mingliu.ttc', 'NotoSansCJK-Regular.ttc'],
+        'korean': ['malgun.ttf', 'gulim.ttc', 'NotoSansCJK-Regular.ttc'],
+        'thai': ['tahoma.ttf', 'LeelawUI.ttf', 'NotoSansThai-Regular.ttf'],
+        'hindi': ['Nirmala.ttf', 'mangal.ttf', 'NotoSansDevanagari-Regular.ttf'],
+        'arabic': ['arial.ttf', 'tahoma.ttf', 'NotoSansArabic-Regular.ttf'],
+    }
+    DEFAULT_FONTS = ['segoeui.ttf', 'arial.ttf', 'DejaVuSans.ttf']
+
+    def __init__(self, config, api_key, from_language, to_language):
+        self.settings = config['text_layer_settings']
+        self.api_key = api_key
+        self.from_language = from_language
+        self.to_language = to_language
+        self.logger = logging.getLogger('ImageTranslator.TextLayerTranslator')
+        self.usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+        self._font_file = None
+
+    def build_request(self, image):
+        """チャットAPIのリクエストボディを作成"""
+        from_lang = LANGUAGE_MAP[self.from_language]['api']
+        to_lang = LANGUAGE_MAP[self.to_language]['api']
+
+        # 送信サイズを制限（座標は正規化値なので縮小しても影響しない）
+        max_side = self.settings['max_image_side']
+        if max(image.size) > max_side:
+            scale = max_side / max(image.size)
+            image = image.resize((int(image.width * scale), int(image.height * scale)),
+                                 Image.Resampling.LANCZOS, reducing_gap=3.0)
+        buffer = BytesIO()
+        image.convert('RGB').save(buffer, format="PNG")
+        image_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+        instructions = (
+            f"You extract every piece of {from_lang} text from the screenshot and translate it into {to_lang}. "
+            f"Return one box per line of text. Coordinates, width, height and font_size are normalized to "
+            f"0-1000 relative to the image width (x, width) and height (y, height, font_size). "
+            f"color is the text color as #RRGGBB. Translate meaning naturally, including language names. "
+            f"Skip text that is not {from_lang}."
+        )
+        return {
+            "model": self.settings['model'],
+            "messages": [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": [
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_b64}", "detail": "high"}}
+                ]}
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": "text_layer", "strict": True, "schema": self.RESPONSE_SCHEMA}
+            }
+        }
+
+    def parse_response(self, result):
+        """チャットAPIのレスポンスから文字領域のリストを取り出す"""
+        usage = result.get('usage') or {}
+        self.usage['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        self.usage['completion_tokens'] += usage.get('completion_tokens', 0)
+
+        content = result['choices'][0]['message']['content']
+        boxes = json.loads(content)['boxes']
+        self.logger.info(f"テキストレイヤー取得: {len(boxes)}領域")
+        return boxes
+
+    def estimate_cost(self):
+        """トークン使用量からの概算コスト（USD）"""
+        return (self.usage['prompt_tokens'] * self.settings['input_cost_per_1m_tokens']
+                + self.usage['completion_tokens'] * self.settings['output_cost_per_1m_tokens']) / 1_000_000
+
+    def load_font(self, size):
+        """翻訳先言語に合うフォントを読み込み（見つからない場合はPIL標準フォント）"""
+        if self._font_file:
+            return ImageFont.truetype(self._font_file, size)
+
+        candidates = list(self.settings['font_files'])
+        candidates += self.FONT_CANDIDATES.get(self.to_language, self.DEFAULT_FONTS)
+        for font_file in candidates:
+            try:
+                font = ImageFont.truetype(font_file, size)
+                self._font_file = font_file
+                return font
+            except OSError:
+                continue
+
+        self.logger.warning("フォントが見つからないためPIL標準フォントで描画します")
+        return ImageFont.load_default()
+
+    def wrap_text(self, draw, text, font, max_width):
+        """描画幅に収まるよう折り返し（CJKは文字単位、それ以外は単語単位）"""
+        units = list(text) if self.to_language in CJK_LANGUAGES else text.split(' ')
+        separator = '' if self.to_language in CJK_LANGUAGES else ' '
+        lines = []
+        current = ''
+        for unit in units:
+            candidate = f"{current}{separator}{unit}" if current else unit
+            if current and draw.textlength(candidate, font=font) > max_width:
+                lines.append(current)
+                current = unit
+            else:
+                current = candidate
+        if current:
+            lines.append(current)
+        return lines
+
+    def fill_background(self, image, box):
+        """文字領域を周囲1〜2pxの枠の中央値色で塗りつぶす（簡易インペインティング）"""
+        left, top, right, bottom = box
+        ring = (max(0, left - 2), max(0, top - 2), min(image.width, right + 2), min(image.height, bottom + 2))
+        border = image.crop(ring)
+        mask = Image.new('L', border.size, 255)
+        mask.paste(0, (left - ring[0], top - ring[1], right - ring[0], bottom - ring[1]))
+        background = tuple(int(v) for v in ImageStat.Stat(border, mask).median[:3])
+        ImageDraw.Draw(image).rectangle((left, top, right - 1, bottom - 1), fill=background)
+        return background
+
+    def render(self, image, boxes):
+        """元画像の文字部分を消して訳文を描画"""
+        canvas = image.convert('RGB')
+        draw = ImageDraw.Draw(canvas)
+        width, height = canvas.size
+
+        for box in boxes:
+            if not box.get('translation'):
+                continue
+
+            left = int(max(0, box['x']) * width / 1000)
+            top = int(max(0, box['y']) * height / 1000)
+            right = int(min(1000, box['x'] + box['width']) * width / 1000)
+            bottom = int(min(1000, box['y'] + box['height']) * height / 1000)
+            if right - left < 2 or bottom - top < 2:
+                continue
+
+            background = self.fill_background(canvas, (left, top, right, bottom))
+            try:
+                color = ImageColor.getrgb(box['color'])[:3]
+            except ValueError:
+                # 文字色が解釈できない場合は背景の明るさから黒/白を選択
+                color = (0, 0, 0) if sum(background) > 384 else (255, 255, 255)
+
+            # 領域に収まるまで文字サイズを下げる
+            font_size = max(8, int(box['font_size'] * height / 1000))
+            while True:
+                font = self.load_font(font_size)
+                lines = self.wrap_text(draw, box['translation'], font, right - left)
+                line_height = font_size * 1.15
+                fits = (len(lines) * line_height <= (bottom - top) * 1.1
+                        and all(draw.textlength(line, font=font) <= (right - left) * 1.05 for line in lines))
+                if fits or font_size <= 8:
+                    break
+                font_size = max(8, int(font_size * 0.9))
+
+            text_top = top + ((bottom - top) - len(lines) * line_height) / 2
+            stroke_width = 1 if box.get('bold') else 0
+            for index, line in enumerate(lines):
+                draw.text((left, text_top + index * line_height), line, fill=color, font=font,
+                          stroke_width=stroke_width, stroke_fill=color)
+
+        return canvas
+
+
+class PromptTemplateLibrary:
+    """バージョン付きの外部プロンプトテンプレート（assets/prompts/<名前>.v<版>.txt）
+
+    テンプレートは「--- セクション名 ---」で区切った本文（body）と差し込み部品
+    （padding.<種別>・aspect.<送信サイズ>・lang_example.<翻訳元>><翻訳先>）からなる。
+    (名前, 版, 翻訳元, 翻訳先, 送信サイズ, パディング種別) ごとに1回だけ組み立ててキャッシュし、
+    変種ごとのバイト数・推定トークン数を集計する。variantsの重みで版を振り分けてA/B比較できる。
+    """
+
+    SECTION_PATTERN = re.compile(r'^--- (\S+) ---$')
+
+    def __init__(self, directory, variants=None):
+        self.directory = Path(directory)
+        self.variants = variants or {}
+        self.logger = logging.getLogger('ImageTranslator.Prompts')
+        self._lock = threading.Lock()
+        self._compiled = {}
+        self.usage = {}
+        self.templates = {}
+        for path in sorted(self.directory.glob('*.v*.txt')):
+            name, _, version = path.stem.rpartition('.v')
+            if name and version.isdigit():
+                self.templates[(name, int(version))] = self.parse(path.read_text(encoding='utf-8'))
+        self.logger.info(f"プロンプトテンプレート読み込み: "
+                         f"{', '.join(f'{name}.v{version}' for name, version in sorted(self.templates))}")
+
+    @classmethod
+    def from_config(cls, config):
+        settings = config['prompt_templates']
+        return cls(Path(__file__).parent / settings['directory'], settings['variants'])
+
+    @classmethod
+    def parse(cls, text):
+        """セクション名 → 内容（先頭のセクション外の行はコメント）"""
+        sections = {}
+        current = None
+        for line in text.splitlines():
+            match = cls.SECTION_PATTERN.match(line)
+            if match:
+                current = match.group(1)
+                sections[current] = []
+            elif current is not None:
+                sections[current].append(line)
+        return {name: '\n'.join(lines).rstrip('\n') for name, lines in sections.items()}
+
+    @staticmethod
+    def estimate_tokens(text):
+        """トークン数の概算（ASCIIは4文字で1、それ以外は1文字で1、絵文字は2）"""
+        ascii_chars = 0
+        other_tokens = 0
+        for char in text:
+            code = ord(char)
+            if code < 128:
+                ascii_chars += 1
+            else:
+                other_tokens += 2 if code >= 0x1F000 else 1
+        return math.ceil(ascii_chars / 4) + other_tokens
+
+    def choose_version(self, name, job_id):
+        """重みに従って版を選ぶ（同じジョブは常に同じ版、重みの設定がなければ最新版）"""
+        weights = {int(version): weight for version, weight in self.variants.get(name, {}).items()
+                   if weight > 0 and (name, int(version)) in self.templates}
+        if not weights:
+            return max(version for template_name, version in self.templates if template_name == name)
+        roll = random.Random(f"{name}:{job_id}").random() * sum(weights.values())
+        for version, weight in sorted(weights.items()):
+            roll -= weight
+            if roll < 0:
+                break
+        return version
+
+    def compile(self, name, version, from_language, to_language, target_size, padding_type):
+        sections = self.templates[(name, version)]
+        values = {
+            'from_lang': LANGUAGE_MAP[from_language]['api'],
+            'to_lang': LANGUAGE_MAP[to_language]['api'],
+        }
+        parts = {
+            'padding': sections.get(f'padding.{padding_type}', ''),
+            'aspect': sections.get(f'aspect.{target_size}', ''),
+            'lang_example': sections.get(f'lang_example.{from_language}>{to_language}', ''),
+        }
+        values.update({part: text.format(**values) for part, text in parts.items()})
+        # 差し込み部品がない箇所の空行を詰める
+        text = re.sub(r'\n{3,}', '\n\n', sections['body'].format(**values)).strip()
+        return {
+            'text': text,
+            'variant': f"{name}.v{version}",
+            'bytes': len(text.encode('utf-8')),
+            'tokens': self.estimate_tokens(text),
+        }
+
+    def render(self, name, job_id, from_language, to_language, target_size=None, padding_type='none'):
+        """組み立て済みのプロンプト（{'text', 'variant', 'bytes', 'tokens'}）を返し、使用量を集計"""
+        version = self.choose_version(name, job_id)
+        key = (name, version, from_language, to_language, target_size, padding_type)
+        with self._lock:
+            prompt = self._compiled.get(key)
+            if prompt is None:
+                prompt = self._compiled[key] = self.compile(*key)
+            usage = self.usage.setdefault(prompt['variant'], {'requests': 0, 'bytes': 0, 'tokens': 0})
+            usage['requests'] += 1
+            usage['bytes'] += prompt['bytes']
+            usage['tokens'] += prompt['tokens']
+        return prompt
+
+
+class QualityPolicy:
+    """画像ごとに quality / input_fidelity を選ぶポリシー
+
+    ローカルで求めた特徴量（テキスト面積比・最小文字高さ・画像サイズ）と、
+    ティアごとのフォールバック・エラー履歴から、足りる範囲で最も安いティアを選ぶ。
+    """
+
+    TIERS = ['low', 'medium', 'high']
+
+    def __init__(self, settings, tier_outcomes=None):
+        self.settings = settings
+        self.tier_outcomes = tier_outcomes or {}
+        self.logger = logging.getLogger('ImageTranslator.QualityPolicy')
+
+    def choose(self, features, image_size, canvas_scale):
+        """(quality, input_fidelity, 理由) を返す"""
+        settings = self.settings
+        reasons = []
+
+        # 解析用縮小画像の文字高さをAPI送信キャンバス上の高さに換算
+        analysis_scale = features['analysis_size'][0] / image_size[0]
+        min_glyph = features['min_glyph_height']
+        glyph_on_canvas = min_glyph * canvas_scale / analysis_scale if min_glyph else None
+        megapixels = image_size[0] * image_size[1] / 1_000_000
+        text_ratio = features['edge_density']
+        glyphs = features['glyph_components']
+
+        if glyph_on_canvas is not None and glyph_on_canvas < settings['small_glyph_px']:
+            tier = 'high'
+            reasons.append(f"最小文字高さ{glyph_on_canvas:.1f}px < {settings['small_glyph_px']}px")
+        elif text_ratio >= settings['dense_text_ratio'] or glyphs >= settings['dense_glyph_count']:
+            tier = 'high'
+            reasons.append(f"テキスト密度が高い(比率{text_ratio:.3f}, 文字塊{glyphs})")
+        elif glyphs <= settings['sparse_glyph_count'] and megapixels <= settings['small_image_megapixels']:
+            tier = 'low'
+            reasons.append(f"小さな画像({megapixels:.2f}MP)で文字が少ない(文字塊{glyphs})")
+        else:
+            tier = 'medium'
+            reasons.append(f"標準(比率{text_ratio:.3f}, 文字塊{glyphs}, {megapixels:.2f}MP)")
+
+        # 過去にフォールバック・エラーが多いティアは1段階上げる
+        while tier != 'high':
+            stats = self.tier_outcomes.get(tier)
+            if not stats or stats['attempts'] < settings['min_history_attempts']:
+                break
+            failure_rate = (stats['fallbacks'] + stats['errors']) / stats['attempts']
+            if failure_rate <= settings['max_failure_rate']:
+                break
+            next_tier = self.TIERS[self.TIERS.index(tier) + 1]
+            reasons.append(f"{tier}の失敗率{failure_rate:.0%}のため{next_tier}に変更")
+            tier = next_tier
+
+        # 小さい文字や密なテキストは元画像への忠実度を上げる
+        if tier == 'high' or (glyph_on_canvas is not None and glyph_on_canvas < settings['high_fidelity_glyph_px']):
+            input_fidelity = 'high'
+        else:
+            input_fidelity = 'low'
+
+        reason = ", ".join(reasons)
+        self.logger.info(f"品質ポリシー: quality={tier}, input_fidelity={input_fidelity} ({reason})")
+        return tier, input_fidelity, reason
+
+
+class ClipboardDebouncer:
+    """クリップボードの連続更新をまとめ、落ち着いた最後の画像だけを取り出すデバウンサー
+
+    offer()で変化を通知し、poll()で確定した画像を取り出す。最後の変化から
+    settle_msの間変化がなければ確定し、更新が続く場合もmax_wait_msで打ち切る。
+    時刻はclockで与えるため、合成イベントを時刻付きで与えて動作を確認できる。
+    """
+
+    def __init__(self, settle_ms, max_wait_ms, clock=time.monotonic):
+        self.settle = settle_ms / 1000
+        self.max_wait = max_wait_ms / 1000
+        self.clock = clock
+        self.pending = None
+        self.burst_started = None
+        self.last_change = None
+        self.coalesced = 0
+
+    def offer(self, key, payload):
+        """新しいクリップボード内容を登録（それまでの未確定の内容は置き換え）"""
+        now = self.clock()
+        if self.pending is None:
+            self.burst_started = now
+        else:
+            self.coalesced += 1
+        self.pending = (key, payload)
+        self.last_change = now
+
+    def poll(self):
+        """確定した(key, payload)を返す（未確定・未登録ならNone）"""
+        if self.pending is None:
+            return None
+        now = self.clock()
+        if now - self.last_change < self.settle and now - self.burst_started < self.max_wait:
+            return None
+        ready = self.pending
+        self.reset()
+        return ready
+
+    def time_until_ready(self):
+        """確定までの残り秒数（未登録ならNone）"""
+        if self.pending is None:
+            return None
+        now = self.clock()
+        remaining = min(self.last_change + self.settle, self.burst_started + self.max_wait) - now
+        return max(0.0, remaining)
+
+    def reset(self):
+        """未確定の内容を破棄"""
+        self.pending = None
+        self.burst_started = None
+        self.last_change = None
+        self.coalesced = 0
+
+
+class ScreenFrameSource:
+    """画面の指定領域をキャプチャするフレームソース"""
+
+    def __init__(self, region):
+        self.region = tuple(region)  # (x, y, width, height) 仮想デスクトップ座標
+
+    def grab(self):
+        x, y, width, height = self.region
+        screen = QApplication.screenAt(QPoint(x + width // 2, y + height // 2)) or QApplication.primaryScreen()
+        # grabWindow(0, ...)の座標は各画面の左上を原点とする
+        origin = screen.geometry().topLeft()
+        pixmap = screen.grabWindow(0, x - origin.x(), y - origin.y(), width, height)
+        return qimage_to_pil(pixmap.toImage())
+
+
+class SyntheticFrameSource:
+    """合成フレームを生成するフレームソース（画面のない環境での動作確認用）
+
+    change_every回のキャプチャごとに画面が切り替わり、切り替え直後のsettle_grabs回は
+    描画途中を模して行が少しずつ現れる。
+    """
+
+    def __init__(self, size=(640, 360), change_every=20, settle_grabs=2, seed=0):
+        self.size = tuple(size)
+        self.change_every = change_every
+        self.settle_grabs = settle_grabs
+        self.seed = seed
+        self.grabs = 0
+
+    def grab(self):
+        scene, phase = divmod(self.grabs, self.change_every)
+        self.grabs += 1
+        rng = random.Random(self.seed * 100003 + scene)
+        width, height = self.size
+        image = Image.new('RGB', self.size, (245, 245, 245))
+        draw = ImageDraw.Draw(image)
+
+        # テキスト行を模した横棒（描画途中は上から一部の行のみ）
+        line_height = max(4, height // 12)
+        lines = list(range(line_height, height - line_height, line_height * 2))
+        if phase < self.settle_grabs:
+            lines = lines[:len(lines) * (phase + 1) // (self.settle_grabs + 1)]
+        for top in lines:
+            right = rng.randint(width // 4, width - line_height)
+            draw.rectangle((line_height, top, right, top + line_height), fill=(40, 40, 40))
+        return image
+
+
+class ScreenRegionWatcher:
+    """画面領域のキャプチャを前回翻訳したフレームと比較し、翻訳すべきフレームを判定する
+
+    比較は縮小したグレースケール画像の差分（ImageChops）で行う。前回翻訳したフレームから
+    pixel_thresholdを超えて変化した画素の割合がchange_threshold以上で、かつ直前の
+    キャプチャとの差がない状態がstable_grabs回続いた（描画・スクロールが落ち着いた）
+    場合にだけフレームを返す。翻訳済みの内容から変化がない間はキャプチャ間隔を
+    倍々に伸ばし（最大max_interval_ms）、静止した画面でのCPU使用を抑える。
+    """
+
+    def __init__(self, source, settings, clock=time.monotonic):
+        self.source = source
+        self.interval_ms = settings['interval_ms']
+        self.max_interval_ms = settings['max_interval_ms']
+        self.diff_width = settings['diff_width']
+        self.change_threshold = settings['change_threshold']
+        self.stable_grabs = settings['stable_grabs']
+        self.clock = clock
+        pixel_threshold = settings['pixel_threshold']
+        self.threshold_table = [0] * (pixel_threshold + 1) + [255] * (255 - pixel_threshold)
+        self.current_interval_ms = self.interval_ms
+        self.translated = None  # 前回翻訳したフレームの縮小表現
+        self.previous = None  # 直前のキャプチャの縮小表現
+        self.stable_count = 0
+        self.stats = {'grabs': 0, 'submitted': 0, 'grab_ms': 0.0}
+
+    def reduce(self, image):
+        """差分計算用の縮小グレースケール画像"""
+        width = min(self.diff_width, image.width)
+        height = max(1, round(image.height * width / image.width))
+        return image.resize((width, height), Image.BILINEAR, reducing_gap=2.0).convert('L')
+
+    def changed_fraction(self, before, after):
+        """変化した画素の割合（比較対象がない・サイズが異なる場合は1.0）"""
+        if before is None or before.size != after.size:
+            return 1.0
+        changed = ImageChops.difference(before, after).point(self.threshold_table)
+        return changed.histogram()[255] / (after.width * after.height)
+
+    def poll(self):
+        """1回キャプチャし、翻訳すべきならフル解像度のフレームを返す（それ以外はNone）"""
+        grab_start = self.clock()
+        frame = self.source.grab()
+        reduced = self.reduce(frame)
+        self.stats['grabs'] += 1
+        self.stats['grab_ms'] += (self.clock() - grab_start) * 1000
+
+        motion = self.changed_fraction(self.previous, reduced)
+        self.previous = reduced
+        if motion >= self.change_threshold:
+            # 変化中: 落ち着くまで初期間隔で監視
+            self.stable_count = 0
+            self.current_interval_ms = self.interval_ms
+            return None
+
+        self.stable_count += 1
+        if self.changed_fraction(self.translated, reduced) < self.change_threshold:
+            # 翻訳済みの内容から変化なし: 間隔を伸ばす
+            self.current_interval_ms = min(self.current_interval_ms * 2, self.max_interval_ms)
+            return None
+        if self.stable_count < self.stable_grabs:
+            self.current_interval_ms = self.interval_ms
+            return None
+
+        self.translated = reduced
+        self.stable_count = 0
+        self.current_interval_ms = self.interval_ms
+        self.stats['submitted'] += 1
+        return frame
+
+
+class BackendError(Exception):
+    """翻訳バックエンドがエラー応答を返した"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self):
+        """別のバックエンドで再試行すべきエラーか（混雑・サーバーエラー）"""
+        return self.status_code is None or self.status_code in (408, 409, 429) or self.status_code >= 500
+
+
+class TranslationBackend:
+    """画像編集・画像生成APIのバックエンド（エンドポイントと認証・ペイロード形式を担当）
+
+    送信はsend(method, url, **kwargs)で行い、翻訳スレッドのキャンセル可能な送信を使う。
+    """
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = settings
+        self.logger = logging.getLogger(f'ImageTranslator.Backend.{name}')
+
+    def is_available(self):
+        """設定上利用可能か（APIキーなど）"""
+        return True
+
+    def edit(self, send, files, data, timeout):
+        """画像編集APIを呼び出してレスポンスJSONを返す"""
+        raise NotImplementedError
+
+    def generate(self, send, data, timeout):
+        """画像生成APIを呼び出してレスポンスJSONを返す"""
+        raise NotImplementedError
+
+    def health_check(self, timeout):
+        """疎通確認（成功ならTrue）"""
+        raise NotImplementedError
+
+    def parse_response(self, response):
+        """レスポンスを検査してJSONを返す（200以外はBackendError）"""
+        self.logger.info(f"APIレスポンス: ステータスコード {response.status_code}")
+        if response.status_code != 200:
+            self.logger.error(f"APIエラー: {response.status_code}")
+            self.logger.error(f"レスポンスヘッダー: {dict(response.headers)}")
+            self.logger.error(f"レスポンス本文: {response.text}")
+            raise BackendError(f"APIエラー: {response.status_code}", response.status_code)
+        return response.json()
+
+
+class OpenAIBackend(TranslationBackend):
+    """OpenAI互換のImages API（base_urlでリージョンやプロキシを切り替え可能）"""
+
+    def __init__(self, name, settings):
+        super().__init__(name, settings)
+        self.base_url = settings.get('base_url', 'https://api.openai.com/v1').rstrip('/')
+        self.api_key = os.getenv(settings.get('api_key_env', 'OPENAI_API_KEY'))
+
+    def is_available(self):
+        return bool(self.api_key)
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def edit(self, send, files, data, timeout):
+        response = send('POST', f"{self.base_url}/images/edits",
+                        headers=self.headers(), files=files, data=data, timeout=timeout)
+        return self.parse_response(response)
+
+    def generate(self, send, data, timeout):
+        response = send('POST', f"{self.base_url}/images/generations",
+                        headers=self.headers(), json=data, timeout=timeout)
+        return self.parse_response(response)
+
+    def health_check(self, timeout):
+        response = requests.get(f"{self.base_url}/models", headers=self.headers(), timeout=timeout)
+        return response.status_code == 200
+
+
+class AzureOpenAIBackend(TranslationBackend):
+    """Azure OpenAIのデプロイメント（api-keyヘッダーとapi-versionクエリを使用）"""
+
+    def __init__(self, name, settings):
+        super().__init__(name, settings)
+        self.endpoint = settings.get('endpoint', '').rstrip('/')
+        self.deployment = settings.get('deployment', 'gpt-image-1')
+        self.api_version = settings.get('api_version', '2025-04-01-preview')
+        self.api_key = os.getenv(settings.get('api_key_env', 'AZURE_OPENAI_API_KEY'))
+
+    def is_available(self):
+        return bool(self.api_key and self.endpoint)
+
+    def url(self, operation):
+        return (f"{self.endpoint}/openai/deployments/{self.deployment}/images/{operation}"
+                f"?api-version={self.api_version}")
+
+    def edit(self, send, files, data, timeout):
+        response = send('POST', self.url('edits'),
+                        headers={"api-key": self.api_key}, files=files, data=data, timeout=timeout)
+        return self.parse_response(response)
+
+    def generate(self, send, data, timeout):
+        response = send('POST', self.url('generations'),
+                        headers={"api-key": self.api_key}, json=data, timeout=timeout)
+        return self.parse_response(response)
+
+    def health_check(self, timeout):
+        response = requests.get(f"{self.endpoint}/openai/models?api-version={self.api_version}",
+                                headers={"api-key": self.api_key}, timeout=timeout)
+        return response.status_code == 200
+
+
+class StubBackend(TranslationBackend):
+    """テスト用のローカルスタブ（APIを呼ばずに入力画像をそのまま返す）"""
+
+    def __init__(self, name, settings):
+        super().__init__(name, settings)
+        self.latency = settings.get('latency_ms', 0) / 1000
+        self.latency_per_token = settings.get('latency_per_prompt_token_ms', 0) / 1000
+        self.failure_rate = settings.get('failure_rate', 0.0)
+
+    def respond(self, image_bytes, prompt=''):
+        # プロンプトの長さに比例する遅延も模擬（プロンプト変種のA/B比較用）
+        latency = self.latency + self.latency_per_token * PromptTemplateLibrary.estimate_tokens(prompt)
+        # キャンセル監視を妨げないよう短い間隔で待機
+        deadline = time.monotonic() + latency
+        while time.monotonic() < deadline:
+            time.sleep(min(0.05, deadline - time.monotonic()))
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise BackendError("スタブの擬似エラー", 503)
+        return {"data": [{"b64_json": base64.b64encode(image_bytes).decode('ascii')}]}
+
+    def edit(self, send, files, data, timeout):
+        image_bytes = next(content for field, (_, content, _) in files if field == 'image[]')
+        return self.respond(image_bytes, data.get('prompt', ''))
+
+    def generate(self, send, data, timeout):
+        blank = BytesIO()
+        Image.new('RGB', (1024, 1024), 'white').save(blank, format="PNG")
+        return self.respond(blank.getvalue(), data.get('prompt', ''))
+
+    def health_check(self, timeout):
+        return True
+
+
+class CassetteStore:
+    """APIのリクエストとレスポンスを記録するカセット（gzip圧縮JSON、1リクエスト1ファイル）
+
+    キーは操作名・送信パラメータ・送信画像（マスク含む）のSHA-256から作る。
+    同じ前処理・プロンプトで同じ画像を送った場合に同じキーになる。
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger('ImageTranslator.Cassette')
+
+    @staticmethod
+    def request_key(operation, files=None, data=None):
+        """リクエスト内容からキーと記録用の要約を作る"""
+        summary = {
+            'operation': operation,
+            'data': data or {},
+            'files': [
+                {'field': field, 'sha256': hashlib.sha256(content).hexdigest(), 'bytes': len(content)}
+                for field, (_, content, _) in (files or [])
+            ],
+        }
+        canonical = json.dumps(summary, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest(), summary
+
+    def path_for(self, key):
+        return self.directory / key[:2] / f"{key}.json.gz"
+
+    def load(self, key):
+        """記録済みのエントリ（なければNone）"""
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, key, request_summary, response, latency_ms, backend_name):
+        """エントリを書き込み（同じキーは上書き）"""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            'key': key,
+            'request': request_summary,
+            'response': response,
+            'latency_ms': round(latency_ms, 1),
+            'backend': backend_name,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        temp_path = path.with_name(path.name + '.tmp')
+        with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self.logger.info(f"カセット記録: {key[:12]} ({request_summary['operation']}, {latency_ms:.0f}ms, "
+                         f"{path.stat().st_size / 1024:.0f}KB)")
+
+
+class CassetteBackend(TranslationBackend):
+    """バックエンドを包んでAPI通信を記録・再生するラッパー
+
+    record: 実際に呼び出してレスポンスと応答時間をカセットに記録
+    replay: 記録した応答時間だけ待ってから記録済みレスポンスを返す
+    replay_fast: 待たずに記録済みレスポンスを返す
+    再生時に未記録のリクエストはエラー（再試行しない）になる。
+    """
+
+    def __init__(self, inner, store, mode):
+        super().__init__(inner.name, inner.settings)
+        self.inner = inner
+        self.store = store
+        self.mode = mode
+
+    def is_available(self):
+        # 再生時はAPIキーがなくても利用可能
+        return self.mode != 'record' or self.inner.is_available()
+
+    def edit(self, send, files, data, timeout):
+        return self.exchange('edit', send, files=files, data=data, timeout=timeout)
+
+    def generate(self, send, data, timeout):
+        return self.exchange('generate', send, data=data, timeout=timeout)
+
+    def health_check(self, timeout):
+        return True if self.mode != 'record' else self.inner.health_check(timeout)
+
+    def exchange(self, operation, send, files=None, data=None, timeout=None):
+        key, summary = CassetteStore.request_key(operation, files, data)
+
+        if self.mode == 'record':
+            call_start = time.perf_counter()
+            if operation == 'edit':
+                result = self.inner.edit(send, files, data, timeout)
+            else:
+                result = self.inner.generate(send, data, timeout)
+            result = self.inline_image_urls(send, result, timeout)
+            latency_ms = (time.perf_counter() - call_start) * 1000
+            try:
+                self.store.save(key, summary, result, latency_ms, self.inner.name)
+            except Exception as e:
+                self.logger.warning(f"カセット記録エラー: {str(e)}")
+            return result
+
+        entry = self.store.load(key)
+        if entry is None:
+            raise BackendError(f"カセット未記録のリクエストです: {key[:12]}", 404)
+        if self.mode == 'replay':
+            # 記録時の応答時間を再現（キャンセル確認のため短い間隔で待機）
+            deadline = time.monotonic() + entry['latency_ms'] / 1000
+            while time.monotonic() < deadline:
+                time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        self.logger.info(f"カセット再生: {key[:12]} (記録時 {entry['latency_ms']:.0f}ms, {self.mode})")
+        return entry['response']
+
+    def inline_image_urls(self, send, result, timeout):
+        """URL形式の画像は期限切れになるため、記録前にダウンロードしてb64_jsonに置き換え"""
+        for item in result.get('data', []):
+            if 'url' in item and 'b64_json' not in item:
+                response = send('GET', item['url'], timeout=timeout)
+                if response.status_code == 200:
+                    item['b64_json'] = base64.b64encode(response.content).decode('ascii')
+                    del item['url']
+        return result
+
+
+BACKEND_TYPES = {
+    'openai': OpenAIBackend,
+    'azure_openai': AzureOpenAIBackend,
+    'stub': StubBackend,
+}
+
+
+class LatencySketch:
+    """対数バケットのヒストグラムによるストリーミング分位点スケッチ
+
+    値をγ=(1+α)/(1-α)の対数で区切ったバケットに数えるため、分位点を相対誤差α以内で
+    固定サイズのメモリから求められる。件数がmax_countを超えると全バケットを半減し、
+    古い観測ほど重みを下げる。半減は小数の重みのまま行い、分位点を左右する1件だけの
+    裾のバケットを切り捨てない。
+    """
+
+    def __init__(self, relative_accuracy=0.02, max_count=2000):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_count = max_count
+        self.buckets = {}
+        self.count = 0
+
+    def add(self, value):
+        index = math.ceil(math.log(max(value, 1e-3)) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        if self.count > self.max_count:
+            self.buckets = {index: count / 2 for index, count in self.buckets.items()}
+            self.count = sum(self.buckets.values())
+
+    def quantile(self, fraction):
+        """分位点の推定値（観測がなければNone）"""
+        if not self.count:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+        # バケット(γ^(i-1), γ^i]の代表値
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'max_count': self.max_count,
+                'buckets': {str(index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'], data['max_count'])
+        sketch.buckets = {int(index): count for index, count in data['buckets'].items()}
+        sketch.count = sum(sketch.buckets.values())
+        return sketch
+
+
+class AdaptiveTimeouts:
+    """エンドポイント・操作・品質ごとの応答時間スケッチから要求のタイムアウトを決める
+
+    読み取りタイムアウトは過去の応答時間の分位点（quantile）× factorを
+    [min_read_sec, max_read_sec]に収めた値で、観測がmin_samples件に満たない間は固定値を使う。
+    画像APIは生成が終わるまで応答を返さないため、読み取りタイムアウトが実質的に
+    応答全体の待ち時間になる。接続タイムアウトは別にconnect_secで短く打ち切る。
+    打ち切った要求はタイムアウト値を観測として加え、遅くなった傾向に追従させる。
+    """
+
+    def __init__(self, settings, path=None):
+        self.enabled = settings['enabled']
+        self.quantile = settings['quantile']
+        self.factor = settings['factor']
+        self.min_read = settings['min_read_sec']
+        self.max_read = settings['max_read_sec']
+        self.connect = settings['connect_sec']
+        self.min_samples = settings['min_samples']
+        self.max_samples = settings['max_samples']
+        self.path = Path(path) if path else None
+        self.logger = logging.getLogger('ImageTranslator.Timeouts')
+        self._lock = threading.Lock()
+        self.sketches = {}
+        self.dirty = False
+        if self.path is not None and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+                self.sketches = {key: LatencySketch.from_dict(value) for key, value in data.items()}
+            except Exception as e:
+                self.logger.warning(f"応答時間スケッチ読み込みエラー（初期状態で開始）: {str(e)}")
+
+    @staticmethod
+    def key(endpoint, operation, quality):
+        return f"{endpoint}|{operation}|{quality or '-'}"
+
+    def read_timeout(self, endpoint, operation, quality, static_sec):
+        """読み取りタイムアウト秒（観測が少ない間はstatic_sec）"""
+        with self._lock:
+            sketch = self.sketches.get(self.key(endpoint, operation, quality))
+            if sketch is None or sketch.count < self.min_samples:
+                return static_sec
+            estimate_ms = sketch.quantile(self.quantile)
+        return min(self.max_read, max(self.min_read, estimate_ms * self.factor / 1000))
+
+    def timeout_for(self, endpoint, operation, quality, static_sec):
+        """requestsに渡すタイムアウト（無効時は固定値、有効時は(接続, 読み取り)）"""
+        if not self.enabled:
+            return static_sec
+        return self.connect, self.read_timeout(endpoint, operation, quality, static_sec)
+
+    def observe(self, endpoint, operation, quality, latency_ms):
+        """応答時間（打ち切った場合はタイムアウト値）を記録"""
+        if not self.enabled:
+            return
+        key = self.key(endpoint, operation, quality)
+        with self._lock:
+            sketch = self.sketches.get(key)
+            if sketch is None:
+                sketch = self.sketches[key] = LatencySketch(max_count=self.max_samples)
+            sketch.add(latency_ms)
+            self.dirty = True
+
+    def save(self):
+        """変更があればスケッチをファイルに保存"""
+        if self.path is None or not self.dirty:
+            return
+        with self._lock:
+            data = {key: sketch.to_dict() for key, sketch in self.sketches.items()}
+            self.dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_suffix('.tmp')
+            temp.write_text(json.dumps(data), encoding='utf-8')
+            os.replace(temp, self.path)
+        except Exception as e:
+            self.logger.warning(f"応答時間スケッチ保存エラー: {str(e)}")
+
+    @classmethod
+    def replay(cls, trace, settings, static_timeouts):
+        """過去の応答時間の系列を固定・適応タイムアウトで再生し、待ち時間の分布を比較
+
+        traceは(endpoint, operation, quality, latency_ms)の時系列。タイムアウトで
+        打ち切った要求は、その時点の中央値で再試行が成功したものとみなす。
+        """
+        adaptive = cls(dict(settings, enabled=True))
+        waits = {'static': [], 'adaptive': []}
+        cut = 0
+        for endpoint, operation, quality, latency_ms in trace:
+            static_ms = static_timeouts[operation] * 1000
+            read_ms = adaptive.read_timeout(endpoint, operation, quality, static_timeouts[operation]) * 1000
+            with adaptive._lock:
+                sketch = adaptive.sketches.get(cls.key(endpoint, operation, quality))
+                retry_ms = sketch.quantile(0.5) if sketch is not None and sketch.count else latency_ms
+
+            waits['static'].append(latency_ms if latency_ms <= static_ms else static_ms + retry_ms)
+            if latency_ms <= read_ms:
+                waits['adaptive'].append(latency_ms)
+                adaptive.observe(endpoint, operation, quality, latency_ms)
+            else:
+                cut += 1
+                waits['adaptive'].append(read_ms + retry_ms)
+                adaptive.observe(endpoint, operation, quality, read_ms)
+
+        report = {'requests': len(trace), 'cut': cut}
+        for name, values in waits.items():
+            ordered = sorted(values)
+            report[name] = {
+                'p50_ms': PerformanceStats.percentile(ordered, 0.5),
+                'p99_ms': PerformanceStats.percentile(ordered, 0.99),
+                'max_ms': ordered[-1] if ordered else None,
+                'total_sec': sum(ordered) / 1000,
+            }
+        return report
+
+
+class BackendRouter:
+    """バックエンドごとの応答時間・エラー率のEWMAから呼び出し順を決めるルーター
+
+    スコアは 応答時間EWMA × (1 + error_penalty × エラー率EWMA)。連続失敗やヘルスチェック
+    失敗のバックエンドはcooldown_secの間候補の末尾に回す。決定は直近分を保持して参照できる。
+    """
+
+    def __init__(self, backends, routing, clock=time.monotonic, timeouts=None):
+        self.backends = backends
+        self.timeouts = timeouts or AdaptiveTimeouts(dict(app_config['adaptive_timeouts'], enabled=False))
+        self.alpha = routing['ewma_alpha']
+        self.error_penalty = routing['error_penalty']
+        self.cooldown = routing['cooldown_sec']
+        self.failure_threshold = routing['failure_threshold']
+        self.initial_latency = routing['initial_latency_ms']
+        self.clock = clock
+        self.logger = logging.getLogger('ImageTranslator.Router')
+
+        self._lock = threading.Lock()
+        self.stats = {
+            backend.name: {
+                'latency_ms': None,
+                'error_rate': 0.0,
+                'requests': 0,
+                'failures': 0,
+                'consecutive_failures': 0,
+                'down_until': 0.0,
+                'healthy': None,
+            }
+            for backend in backends
+        }
+        self.decisions = deque(maxlen=routing['decision_log_size'])
+
+    @classmethod
+    def from_config(cls, config):
+        """設定のendpoints一覧からルーターを構築"""
+        backends = []
+        for entry in config['backends']['endpoints']:
+            if not entry.get('enabled', True):
+                continue
+            backend_class = BACKEND_TYPES.get(entry['type'])
+            if backend_class is None:
+                logging.getLogger('ImageTranslator.Router').warning(f"未対応のバックエンド種別: {entry['type']}")
+                continue
+            backends.append(backend_class(entry['name'], entry))
+
+        # カセットの記録・再生が有効な場合は各バックエンドを包む
+        cassette_settings = config['cassettes']
+        if cassette_settings['mode'] in ('record', 'replay', 'replay_fast'):
+            store = CassetteStore(Path(__file__).parent.parent / cassette_settings['directory'])
+            backends = [CassetteBackend(backend, store, cassette_settings['mode']) for backend in backends]
+            logging.getLogger('ImageTranslator.Router').info(
+                f"カセットモード: {cassette_settings['mode']} ({store.directory})")
+
+        timeout_settings = config['adaptive_timeouts']
+        timeouts = AdaptiveTimeouts(timeout_settings, Path(__file__).parent.parent / timeout_settings['state_file'])
+        return cls(backends, config['backends']['routing'], timeouts=timeouts)
+
+    def score(self, name, now):
+        """小さいほど優先（クールダウン中は無限大）"""
+        stats = self.stats[name]
+        if stats['down_until'] > now:
+            return float('inf')
+        latency = stats['latency_ms'] if stats['latency_ms'] is not None else self.initial_latency
+        return latency * (1 + self.error_penalty * stats['error_rate'])
+
+    def choose(self, job_id, operation):
+        """呼び出し順に並べたバックエンド一覧を返し、決定を記録"""
+        with self._lock:
+            now = self.clock()
+            available = [backend for backend in self.backends if backend.is_available()]
+            # 同スコアは設定順（sortedは安定ソート）
+            ranked = sorted(available, key=lambda backend: self.score(backend.name, now))
+            scores = {backend.name: round(self.score(backend.name, now), 1) for backend in available}
+            decision = {
+                'time': time.time(),
+                'job_id': job_id,
+                'operation': operation,
+                'order': [backend.name for backend in ranked],
+                'scores': scores,
+                'chosen': None,
+            }
+            self.decisions.append(decision)
+        self.logger.info(f"ルーティング: ジョブ #{job_id} {operation} → 候補 {decision['order']} (スコア {scores})")
+        return ranked, decision
+
+    def record(self, name, latency_ms, ok, decision=None):
+        """呼び出し結果を統計に反映"""
+        with self._lock:
+            stats = self.stats[name]
+            stats['requests'] += 1
+            stats['error_rate'] = (1 - self.alpha) * stats['error_rate'] + self.alpha * (0.0 if ok else 1.0)
+            if ok:
+                stats['consecutive_failures'] = 0
+                stats['latency_ms'] = (latency_ms if stats['latency_ms'] is None
+                                       else (1 - self.alpha) * stats['latency_ms'] + self.alpha * latency_ms)
+                if decision is not None:
+                    decision['chosen'] = name
+            else:
+                stats['failures'] += 1
+                stats['consecutive_failures'] += 1
+                if stats['consecutive_failures'] >= self.failure_threshold:
+                    stats['down_until'] = self.clock() + self.cooldown
+                    self.logger.warning(f"バックエンド {name} を{self.cooldown}秒間候補から外します "
+                                        f"(連続失敗 {stats['consecutive_failures']}回)")
+
+    def run_health_checks(self, timeout=10):
+        """全バックエンドの疎通確認（バックグラウンドスレッドから呼び出し）"""
+        for backend in self.backends:
+            if not backend.is_available():
+                continue
+            try:
+                healthy = backend.health_check(timeout)
+            except Exception as e:
+                self.logger.warning(f"ヘルスチェックエラー: {backend.name}: {str(e)}")
+                healthy = False
+            with self._lock:
+                stats = self.stats[backend.name]
+                stats['healthy'] = healthy
+                if healthy:
+                    # 回復したバックエンドはクールダウンを解除
+                    stats['down_until'] = 0.0
+                    stats['consecutive_failures'] = 0
+                else:
+                    stats['down_until'] = self.clock() + self.cooldown
+            self.logger.info(f"ヘルスチェック: {backend.name} {'OK' if healthy else 'NG'}")
+
+    def snapshot(self):
+        """バックエンドごとの統計と直近の決定のコピー"""
+        with self._lock:
+            now = self.clock()
+            backends = []
+            for backend in self.backends:
+                stats = dict(self.stats[backend.name])
+                stats['name'] = backend.name
+                stats['available'] = backend.is_available()
+                stats['score'] = self.score(backend.name, now)
+                stats['cooling_down'] = stats['down_until'] > now
+                backends.append(stats)
+            return backends, list(self.decisions)
+
+
+class TranslationJob:
+    """翻訳ジョブ（キャプチャ1件分の入力と設定）"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, image, from_language, to_language, source_hash=None, mode=None, source='clipboard',
+                 job_id=None, native_png=None):
+        self.job_id = job_id or next(TranslationJob._ids)
+        self._image = image
+        # そのままAPIに送るクリップボードのPNG（画素は必要になった時点でデコード）
+        self.native_png = native_png
+        self.size = image.size if image is not None else passthrough_png_size(native_png)
+        self.from_language = from_language
+        self.to_language = to_language
+        self.source_hash = source_hash
+        self.mode = mode
+        self.source = source
+        self.thumbnail = None
+        self.result_data = None  # 保存用にエンコード済みの翻訳結果（PNG、出力ストア有効時はその形式）
+        self.allow_packing = True
+        self.frame_group = None  # 複数フレーム画像の代表フレームの場合はFrameSequence
+        self.frame_index = None
+        self.durable = None  # 永続キューのレコード（DurableJobStore.add の戻り値）
+        self.created_at = time.time()
+
+    @property
+    def image(self):
+        """ソース画像（PNGのまま受け取ったジョブは初回アクセス時にデコード）"""
+        if self._image is None and self.native_png is not None:
+            image = Image.open(BytesIO(self.native_png))
+            image.load()
+            self._image = image
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image = image
+
+    def release(self):
+        """ソース画像を解放"""
+        self._image = None
+        self.native_png = None
+        self.result_data = None
+
+
+class AtlasPacker:
+    """小さなキャプチャを1枚のAPIキャンバス（1536x1024 / 1024x1536）に詰めるシェルフ式パッカー"""
+
+    CANVASES = [(1536, 1024), (1024, 1536)]
+
+    def __init__(self, gutter=24, max_item_side=700, max_items=6):
+        self.gutter = gutter
+        self.max_item_side = max_item_side
+        self.max_items = max_items
+
+    def is_small(self, size):
+        """アトラスに詰める対象の小さな画像か"""
+        return size[0] <= self.max_item_side and size[1] <= self.max_item_side
+
+    def shelf_pack(self, sizes, canvas):
+        """到着順を保ったまま先頭から入るだけ配置し、(x, y, w, h) のリストを返す"""
+        canvas_width, canvas_height = canvas
+        gutter = self.gutter
+        x = y = gutter
+        shelf_height = 0
+        placements = []
+        for width, height in sizes[:self.max_items]:
+            if x + width + gutter > canvas_width:
+                # 次の段へ
+                x = gutter
+                y += shelf_height + gutter
+                shelf_height = 0
+            if x + width + gutter > canvas_width or y + height + gutter > canvas_height:
+                break
+            placements.append((x, y, width, height))
+            x += width + gutter
+            shelf_height = max(shelf_height, height)
+        return placements
+
+    def pack(self, sizes, min_items=2):
+        """最も多く詰められるキャンバスを選択（min_items件未満ならNone）"""
+        best = None
+        for canvas in self.CANVASES:
+            placements = self.shelf_pack(sizes, canvas)
+            used = sum(w * h for _, _, w, h in placements)
+            efficiency = used / (canvas[0] * canvas[1])
+            if (best is None or len(placements) > len(best['placements'])
+                    or (len(placements) == len(best['placements']) and efficiency > best['efficiency'])):
+                best = {'canvas': canvas, 'placements': placements, 'efficiency': efficiency}
+        if best is None or len(best['placements']) < min_items:
+            return None
+        return best
+
+    def compose(self, images, layout, background=(255, 255, 255)):
+        """配置に従ってアトラス画像を作成"""
+        atlas = Image.new('RGB', layout['canvas'], background)
+        for image, (x, y, _, _) in zip(images, layout['placements']):
+            atlas.paste(image.convert('RGB'), (x, y))
+        return atlas
+
+
+class FrameSequence:
+    """アニメーションGIF・マルチページTIFFのフレーム列
+
+    フレームは1枚ずつ読み込み、完全一致（画素のハッシュ）と近似一致（dHashのハミング距離）で
+    重複をまとめる。翻訳するのは代表フレームのみで、各フレームは代表フレームの翻訳結果を使って
+    元の表示時間・廃棄方法のまま再構成する。
+    """
+
+    def __init__(self, name, image_format, size):
+        self.name = name
+        self.format = image_format
+        self.size = size
+        self.source_hash = None
+        self.frame_map = []  # フレーム番号 → 代表フレーム番号
+        self.unique_frames = []  # 代表フレームの元画像
+        self.durations = []
+        self.disposals = []
+        self.loop = 0
+        self.results = {}
+        self.failures = 0
+        self.cost = 0.0
+        self.cancelled = False
+        self.started_at = time.perf_counter()
+
+    @staticmethod
+    def dhash(image):
+        """64bitの差分ハッシュ（隣接画素の明暗の大小関係）"""
+        pixels = list(image.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+        return bits
+
+    @classmethod
+    def load(cls, source, name, near_distance, max_frames, max_pixels):
+        """ファイルパスまたはバイト列からフレーム列を読み込む（バックグラウンドで呼び出し）"""
+        logger = logging.getLogger('ImageTranslator.Frames')
+        load_start = time.perf_counter()
+        raw = source if isinstance(source, bytes) else Path(source).read_bytes()
+
+        with Image.open(BytesIO(raw)) as image:
+            sequence = cls(name, image.format, image.size)
+            sequence.source_hash = hashlib.md5(raw).hexdigest()
+            sequence.loop = image.info.get('loop', 0)
+            target_size = fit_within_pixels(image.size[0], image.size[1], max_pixels)
+
+            exact = {}
+            near = []
+            for index, frame in enumerate(ImageSequence.Iterator(image)):
+                if index >= max_frames:
+                    logger.warning(f"フレーム数が上限を超えたため以降を省略: {max_frames}")
+                    break
+                sequence.durations.append(frame.info.get('duration', 100))
+                sequence.disposals.append(getattr(frame, 'disposal_method', 0))
+                pixels = frame.convert('RGBA')
+                if pixels.size != target_size:
+                    pixels = pixels.resize(target_size, Image.LANCZOS, reducing_gap=3.0)
+
+                digest = hashlib.md5(pixels.tobytes()).hexdigest()
+                if digest in exact:
+                    sequence.frame_map.append(exact[digest])
+                    continue
+
+                frame_hash = cls.dhash(pixels)
+                match = next((unique_index for unique_hash, unique_index in near
+                              if bin(unique_hash ^ frame_hash).count('1') <= near_distance), None)
+                if match is None:
+                    match = len(sequence.unique_frames)
+                    sequence.unique_frames.append(pixels)
+                    near.append((frame_hash, match))
+                exact[digest] = match
+                sequence.frame_map.append(match)
+
+        logger.info(f"フレーム読み込み: {name} {sequence.format} {len(sequence.frame_map)}フレーム → "
+                    f"翻訳対象 {len(sequence.unique_frames)}フレーム "
+                    f"({(time.perf_counter() - load_start) * 1000:.0f}ms)")
+        return sequence
+
+    @property
+    def is_animated(self):
+        return len(self.frame_map) > 1
+
+    def add_result(self, unique_index, translated_image, stats):
+        """代表フレームの結果を登録し、全フレームがそろったらTrue（Noneは元フレームを使用）"""
+        if translated_image is None:
+            translated_image = self.unique_frames[unique_index]
+        elif translated_image.size != self.unique_frames[unique_index].size:
+            translated_image = translated_image.resize(self.unique_frames[unique_index].size, Image.LANCZOS)
+        self.results[unique_index] = translated_image
+        if stats and stats.get('cost_estimate') is not None:
+            self.cost += stats['cost_estimate']
+        elif stats and stats.get('quality') in COST_PER_IMAGE:
+            self.cost += COST_PER_IMAGE[stats['quality']]
+        return len(self.results) == len(self.unique_frames)
+
+    def save(self, directory, history=None):
+        """翻訳済みフレームを元の形式で保存（バックグラウンドで呼び出し）、保存情報を返す"""
+        frames = [self.results[unique_index] for unique_index in self.frame_map]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        if self.format == 'TIFF':
+            path = directory / f"translated_{timestamp}.tiff"
+            frames[0].save(path, save_all=True, append_images=frames[1:], compression='tiff_deflate')
+        else:
+            path = directory / f"translated_{timestamp}.gif"
+            frames[0].save(path, save_all=True, append_images=frames[1:], duration=self.durations,
+                           disposal=self.disposals, loop=self.loop, optimize=False)
+
+        return {
+            'path': str(path),
+            'thumbnail': history.make_thumbnail(self.results[0]) if history is not None else None,
+            'latency_ms': int((time.perf_counter() - self.started_at) * 1000),
+        }
+
+
+class ContentStore:
+    """翻訳画像のコンテンツアドレス型ストア
+
+    画素内容のSHA-256を名前とするblobを<root>/.store/<先頭2文字>/<hash>.<png|webp>に
+    1つだけ保存し、ユーザー向けの日時付きファイル名はblobへのハードリンクとして作る
+    （ハードリンクを作れないファイルシステムではblobのパスをそのまま使う）。
+    名前とblobの対応はmanifest.jsonlに追記する。同じ結果の繰り返し保存
+    （再キャプチャ・リトライ）はリンクの追加だけで済み、リンクが消えたblobは
+    collect_garbage()で削除する。
+    """
+
+    MAGIC = {'png': (b'\x89PNG',), 'webp': (b'RIFF',)}
+
+    def __init__(self, root, image_format='png', gc_grace_seconds=3600):
+        self.root = Path(root)
+        self.directory = self.root / '.store'
+        self.manifest_path = self.directory / 'manifest.jsonl'
+        self.format = 'webp' if image_format == 'webp' else 'png'
+        self.suffix = f".{self.format}"
+        self.gc_grace = gc_grace_seconds
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('ImageTranslator.Store')
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def content_hash(image):
+        """画素内容のハッシュ（エンコード方法に依存しない）"""
+        digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}:".encode('ascii'))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def blob_path(self, digest):
+        return self.directory / digest[:2] / f"{digest}{self.suffix}"
+
+    def owns(self, path):
+        """ストア内のblobを指すパスか"""
+        return self.directory.resolve() in Path(path).resolve().parents
+
+    def save(self, image, target, encoded=None):
+        """画像をストアに保存し、targetの名前でリンクして利用者向けのパスを返す"""
+        target = Path(target).with_suffix(self.suffix)
+        with self._lock:
+            digest, blob, created = self._put(image, encoded)
+            output_path = self._link(blob, target)
+            self._append_manifest(target.name, digest, blob, blob.stat().st_size, output_path == str(target))
+        self.logger.info(f"出力ストアに保存: {output_path} "
+                         f"({'新規' if created else '重複のためリンクのみ'} {digest[:12]})")
+        return output_path
+
+    def _put(self, image, encoded=None):
+        """blobを保存（既にあれば再利用）し、(hash, blobのパス, 新規作成か)を返す"""
+        digest = self.content_hash(image)
+        blob = self.blob_path(digest)
+        if blob.exists():
+            # GCの猶予期間を再利用時点から数え直す
+            os.utime(blob)
+            return digest, blob, False
+
+        # 別形式でエンコード済みのデータ（共有キャッシュ由来など）は使わない
+        if not encoded or not encoded.startswith(self.MAGIC[self.format]):
+            encoded = encode_output_image(image, self.format)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        temp = blob.with_name(f"{blob.name}.{os.getpid()}.tmp")
+        temp.write_bytes(encoded)
+        os.replace(temp, blob)
+        return digest, blob, True
+
+    def _link(self, blob, target):
+        """targetにblobのハードリンクを作成（作れない場合はblobのパス）"""
+        temp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.link(blob, temp)
+            os.replace(temp, target)
+            return str(target)
+        except OSError as e:
+            self.logger.debug(f"ハードリンクを作成できないためblobを直接参照: {target}: {str(e)}")
+            temp.unlink(missing_ok=True)
+            return str(blob)
+
+    def _append_manifest(self, name, digest, blob, logical_bytes, linked):
+        entry = {
+            'name': name,
+            'hash': digest,
+            'blob': blob.relative_to(self.directory).as_posix(),
+            'bytes': logical_bytes,
+            'linked': linked,
+            'created_at': time.time(),
+        }
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def read_manifest(self):
+        if not self.manifest_path.exists():
+            return []
+        entries = []
+        with open(self.manifest_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def _live(self, entry):
+        """manifestのエントリが有効か（blobがあり、リンクの場合は名前のファイルも残っている）"""
+        if not (self.directory / entry['blob']).exists():
+            return False
+        return not entry['linked'] or (self.root / entry['name']).exists()
+
+    def collect_garbage(self, referenced=()):
+        """参照されなくなったblobを削除しmanifestを詰める（バックグラウンド実行用）、(削除数, 解放バイト数)を返す
+
+        referencedはハードリンクを作れずblobのパスを直接記録した履歴の出力パス。
+        """
+        referenced = {str(Path(path)) for path in referenced}
+        now = time.time()
+        removed = 0
+        freed = 0
+        with self._lock:
+            for blob in self.directory.glob('??/*'):
+                try:
+                    stat = blob.stat()
+                    if now - stat.st_mtime < self.gc_grace:
+                        continue
+                    if blob.suffix != '.tmp' and (stat.st_nlink > 1 or str(blob) in referenced):
+                        continue
+                    blob.unlink()
+                    removed += 1
+                    freed += stat.st_size
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    self.logger.warning(f"blob削除エラー: {blob}: {str(e)}")
+
+            entries = self.read_manifest()
+            live = [entry for entry in entries if self._live(entry)]
+            if len(live) != len(entries):
+                temp = self.manifest_path.with_suffix('.jsonl.tmp')
+                with open(temp, 'w', encoding='utf-8') as f:
+                    for entry in live:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                os.replace(temp, self.manifest_path)
+
+        if removed:
+            self.logger.info(f"出力ストアのGC: blob {removed}件削除 ({freed / (1024 * 1024):.1f}MB解放), "
+                             f"manifest {len(entries) - len(live)}件整理")
+        return removed, freed
+
+    def usage(self):
+        """ストアの使用量（blobの実容量と、重複排除・圧縮しなかった場合の換算容量）"""
+        blobs = [blob for blob in self.directory.glob('??/*') if blob.suffix != '.tmp']
+        blob_bytes = sum(blob.stat().st_size for blob in blobs)
+        entries = [entry for entry in self.read_manifest() if self._live(entry)]
+        logical_bytes = sum(entry['bytes'] for entry in entries)
+        return {
+            'blobs': len(blobs),
+            'names': len(entries),
+            'blob_bytes': blob_bytes,
+            'logical_bytes': logical_bytes,
+            'saved_bytes': max(0, logical_bytes - blob_bytes),
+        }
+
+    def migrate(self, directory, history=None):
+        """既存の出力フォルダのPNGをストアに移行し、(移行件数, 削減バイト数)を返す"""
+        directory = Path(directory)
+        migrated = 0
+        before = 0
+        after = 0
+        for path in sorted(directory.glob('*.png')):
+            try:
+                stat = path.stat()
+                if stat.st_nlink > 1:
+                    continue  # 移行済み（ストアへのリンク）
+                with Image.open(path) as source:
+                    image = source.copy()
+
+                target = path.with_suffix(self.suffix)
+                with self._lock:
+                    digest, blob, created = self._put(image)
+                    output_path = self._link(blob, target)
+                    self._append_manifest(target.name, digest, blob, stat.st_size, output_path == str(target))
+                if output_path != str(path):
+                    path.unlink()
+                    if history is not None:
+                        history.replace_output_path(str(path), output_path)
+
+                migrated += 1
+                before += stat.st_size
+                if created:
+                    after += blob.stat().st_size
+            except Exception as e:
+                self.logger.warning(f"出力ファイル移行エラー: {path}: {str(e)}")
+
+        self.logger.info(f"出力フォルダを移行: {directory} {migrated}件, "
+                         f"{before / (1024 * 1024):.1f}MB → {after / (1024 * 1024):.1f}MB")
+        return migrated, before - after
+
+
+class TranslationHistory:
+    """翻訳履歴ストア（SQLite）
+
+    ソース画像のハッシュ・言語ペア・品質・処理時間・概算コスト・サムネイル・
+    出力パスを記録する。ハッシュと作成日時にインデックスを張り、
+    10万件規模でもハッシュ検索とページングをインデックスのみで処理する。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_hash TEXT NOT NULL,
+            from_language TEXT NOT NULL,
+            to_language TEXT NOT NULL,
+            quality TEXT,
+            input_fidelity TEXT,
+            method TEXT,
+            latency_ms INTEGER,
+            cost_estimate REAL,
+            source_width INTEGER,
+            source_height INTEGER,
+            thumbnail BLOB,
+            output_path TEXT,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_hash
+            ON history(source_hash, from_language, to_language);
+        CREATE INDEX IF NOT EXISTS idx_history_created
+            ON history(created_at);
+        CREATE TABLE IF NOT EXISTS tier_outcomes (
+            quality TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            fallbacks INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    # 既存DBに後から追加した列（名前, 型）
+    MIGRATED_COLUMNS = [
+        ('policy_reason', 'TEXT'),
+        ('backend', 'TEXT'),
+        ('prompt_variant', 'TEXT'),
+    ]
+
+    def __init__(self, db_path, thumbnail_size=128):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.thumbnail_size = thumbnail_size
+        self.output_store = None  # 出力ストアのblobは保持ポリシーで直接削除しない（GCで削除）
+        self.logger = logging.getLogger('ImageTranslator.History')
+
+        # GUIスレッドとバックグラウンド整理スレッドで共有するためロックで保護
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            # auto_vacuumはテーブル作成前に設定する必要がある
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            existing = {row['name'] for row in self._conn.execute("PRAGMA table_info(history)")}
+            for column, column_type in self.MIGRATED_COLUMNS:
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE history ADD COLUMN {column} {column_type}")
+            self._conn.commit()
+
+        self.logger.info(f"翻訳履歴DB初期化: {self.db_path}")
+
+    def make_thumbnail(self, image):
+        """ソース画像からPNGサムネイル（バイト列）を生成"""
+        width, height = image.size
+        scale = min(1.0, self.thumbnail_size / max(width, height))
+        thumb_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        # reducing_gapで整数倍縮小を先に行い、全解像度のコピーを作らない
+        thumbnail = image.resize(thumb_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        if thumbnail.mode not in ('RGB', 'RGBA'):
+            thumbnail = thumbnail.convert('RGB')
+        buffer = BytesIO()
+        thumbnail.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+    def record(self, source_hash, from_language, to_language, output_path,
+               quality=None, input_fidelity=None, method=None, latency_ms=None,
+               cost_estimate=None, source_size=None, thumbnail=None, policy_reason=None, backend=None,
+               prompt_variant=None):
+        """翻訳結果を1件記録し、行IDを返す"""
+        width, height = source_size if source_size else (None, None)
+        with self._lock:
+            cursor = self._conn.execute(
+                """INSERT INTO history (source_hash, from_language, to_language, quality,
+                       input_fidelity, method, latency_ms, cost_estimate, source_width,
+                       source_height, thumbnail, output_path, created_at, policy_reason, backend,
+                       prompt_variant)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (source_hash, from_language, to_language, quality, input_fidelity, method,
+                 latency_ms, cost_estimate, width, height, thumbnail, output_path, time.time(),
+                 policy_reason, backend, prompt_variant)
+            )
+            self._conn.commit()
+        self.logger.debug(f"翻訳履歴を記録: id={cursor.lastrowid}, hash={source_hash[:8]}...")
+        return cursor.lastrowid
+
+    def find_by_hash(self, source_hash, from_language, to_language):
+        """同一ソース・同一言語ペアの最新の翻訳結果を検索"""
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT * FROM history
+                   WHERE source_hash = ? AND from_language = ? AND to_language = ?
+                   ORDER BY id DESC LIMIT 1""",
+                (source_hash, from_language, to_language)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def latency_trace(self):
+        """API翻訳の(バックエンド, 操作, 品質, 処理時間ms)を記録順に返す（タイムアウトの再生用）"""
+        operations = {'edits': 'edit', 'edits_atlas': 'edit', 'generations': 'generate'}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT backend, method, quality, latency_ms FROM history "
+                "WHERE latency_ms IS NOT NULL AND method IN ('edits', 'edits_atlas', 'generations') ORDER BY id"
+            ).fetchall()
+        return [(row['backend'] or 'openai', operations[row['method']], row['quality'], row['latency_ms'])
+                for row in rows]
+
+    def prompt_variant_results(self):
+        """プロンプト変種ごとの(方式, 処理時間ms, 概算コスト)の一覧"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prompt_variant, method, latency_ms, cost_estimate FROM history "
+                "WHERE prompt_variant IS NOT NULL ORDER BY id"
+            ).fetchall()
+        results = {}
+        for row in rows:
+            results.setdefault(row['prompt_variant'], []).append(
+                (row['method'], row['latency_ms'], row['cost_estimate']))
+        return results
+
+    def replace_output_path(self, old_path, new_path):
+        """出力ファイルの移動を履歴に反映"""
+        with self._lock:
+            self._conn.execute("UPDATE history SET output_path = ? WHERE output_path = ?", (new_path, old_path))
+            self._conn.commit()
+
+    def output_paths_under(self, directory):
+        """指定ディレクトリ以下を指す出力パスの一覧"""
+        prefix = str(Path(directory))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT output_path FROM history WHERE substr(output_path, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+        return [row['output_path'] for row in rows]
+
+    def fetch_page(self, before_id=None, limit=50):
+        """新しい順に1ページ分を取得（キーセットページングでOFFSETを使わない）"""
+        with self._lock:
+            if before_id is None:
+                rows = self._conn.execute(
+                    "SELECT * FROM history ORDER BY id DESC LIMIT ?", (limit,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM history WHERE id < ? ORDER BY id DESC LIMIT ?",
+                    (before_id, limit)
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def record_tier_outcome(self, quality, outcome):
+        """品質ティアごとの結果（'ok' / 'fallback' / 'error'）を集計"""
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO tier_outcomes (quality, attempts, fallbacks, errors)
+                   VALUES (?, 1, ?, ?)
+                   ON CONFLICT(quality) DO UPDATE SET
+                       attempts = attempts + 1,
+                       fallbacks = fallbacks + excluded.fallbacks,
+                       errors = errors + excluded.errors""",
+                (quality, int(outcome == 'fallback'), int(outcome == 'error'))
+            )
+            self._conn.commit()
+
+    def tier_outcomes(self):
+        """品質ティアごとの試行回数・フォールバック回数・エラー回数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM tier_outcomes").fetchall()
+        return {row['quality']: dict(row) for row in rows}
+
+    def count(self):
+        """記録件数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def apply_retention(self, retention_days, max_entries, batch_size=500):
+        """保持ポリシーを適用し、期限切れの履歴と出力ファイルを削除（バックグラウンド実行用）"""
+        cutoff = time.time() - retention_days * 86400 if retention_days else None
+        removed_rows = 0
+        removed_files = 0
+
+        while True:
+            # ロック保持時間を短くするためバッチ単位で削除
+            with self._lock:
+                conditions = []
+                params = []
+                if cutoff is not None:
+                    conditions.append("created_at < ?")
+                    params.append(cutoff)
+                if max_entries:
+                    conditions.append(
+                        "id <= (SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)"
+                    )
+                    params.append(max_entries)
+                if not conditions:
+                    break
+
+                rows = self._conn.execute(
+                    f"SELECT id, output_path FROM history WHERE {' OR '.join(conditions)} "
+                    f"ORDER BY id LIMIT ?",
+                    (*params, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+
+                self._conn.executemany("DELETE FROM history WHERE id = ?", [(row['id'],) for row in rows])
+                self._conn.commit()
+
+            removed_rows += len(rows)
+            for row in rows:
+                if row['output_path'] and self._delete_output(row['output_path']):
+                    removed_files += 1
+
+            if len(rows) < batch_size:
+                break
+
+        if removed_rows:
+            with self._lock:
+                self._conn.execute("PRAGMA incremental_vacuum")
+                self._conn.commit()
+            self.logger.info(f"翻訳履歴を整理: {removed_rows}件削除, 出力ファイル{removed_files}件削除")
+
+        return removed_rows, removed_files
+
+    def _delete_output(self, output_path):
+        """期限切れ履歴の出力ファイルを削除"""
+        if self.output_store is not None and self.output_store.owns(output_path):
+            return False
+        try:
+            Path(output_path).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            self.logger.warning(f"出力ファイル削除エラー: {output_path}: {str(e)}")
+            return False
+
+    def close(self):
+        """DB接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+class DurableJobStore:
+    """翻訳待ちジョブの永続キュー（SQLite WAL＋ソース画像ファイル）
+
+    登録・状態更新は専用の書き込みスレッドがまとめて1トランザクションでコミットし、
+    GUIスレッドをディスク書き込みで待たせない。書き込み前に完了・取り消しになった
+    ジョブは画像も行も書かずに捨てる。アプリの異常終了・ネットワーク断でも未完了の
+    ジョブは残り、次回起動時にresume()で読み出して再開する。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            source TEXT,
+            from_language TEXT NOT NULL,
+            to_language TEXT NOT NULL,
+            mode TEXT,
+            source_hash TEXT,
+            image_path TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status
+            ON jobs(status, created_at);
+    """
+
+    ACTIVE_STATUSES = ('pending', 'retry')
+    SETTLED_STATUSES = ('done', 'cancelled')
+    MAX_BATCH = 200
+
+    def __init__(self, db_path, image_dir):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.image_dir = Path(image_dir)
+        self.image_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger('ImageTranslator.DurableQueue')
+
+        # 書き込みスレッドと起動時の読み出し（GUIスレッド）で共有するためロックで保護
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._conn.commit()
+
+        self._ops = deque()
+        self._ops_ready = threading.Condition()
+        self._pending_ops = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='DurableJobWriter', daemon=True)
+        self._writer.start()
+
+        self.logger.info(f"ジョブキューDB初期化: {self.db_path}")
+
+    def add(self, job):
+        """ジョブを永続化してレコード（dict）を返す（書き込みは非同期）"""
+        record_id = os.urandom(8).hex()
+        now = time.time()
+        record = {
+            'id': record_id,
+            'status': 'pending',
+            'source': job.source,
+            'from_language': job.from_language,
+            'to_language': job.to_language,
+            'mode': job.mode,
+            'source_hash': job.source_hash,
+            'image_path': str(self.image_dir / f"{record_id}.png"),
+            'attempts': 0,
+            'next_attempt_at': 0.0,
+            'last_error': None,
+            'created_at': now,
+        }
+        # PNGのまま受け取ったジョブはデコード・再エンコードせずにそのまま書き出す
+        self._submit(('add', dict(record), job.native_png if job.native_png is not None else job.image))
+        return record
+
+    def update(self, record, status, error=None):
+        """レコードの状態（'pending' / 'retry' / 'done' / 'cancelled' / 'failed'）を更新"""
+        record['status'] = status
+        record['last_error'] = error
+        self._submit(('update', dict(record), None))
+
+    def compact(self, failed_retention_days):
+        """完了・取り消し済みの行と失敗から日数が経った行、孤立した画像を削除"""
+        self._submit(('compact', failed_retention_days, None))
+
+    def _submit(self, op):
+        with self._ops_ready:
+            if self._closed:
+                return
+            self._ops.append(op)
+            self._pending_ops += 1
+            self._ops_ready.notify()
+
+    def flush(self, timeout=None):
+        """登録済みの書き込みがすべて終わるまで待つ"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._ops_ready:
+            while self._pending_ops:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._ops_ready.wait(remaining)
+        return True
+
+    def _write_loop(self):
+        while True:
+            with self._ops_ready:
+                while not self._ops and not self._closed:
+                    self._ops_ready.wait()
+                if not self._ops:
+                    return
+                batch = [self._ops.popleft() for _ in range(min(len(self._ops), self.MAX_BATCH))]
+
+            try:
+                self._apply(batch)
+            except Exception as e:
+                self.logger.error(f"ジョブキュー書き込みエラー: {str(e)}", exc_info=True)
+            finally:
+                with self._ops_ready:
+                    self._pending_ops -= len(batch)
+                    self._ops_ready.notify_all()
+
+    def _apply(self, batch):
+        """まとめて受け取った操作をジョブごとに最新状態へ畳み込んで1回でコミット"""
+        entries = {}
+        compactions = []
+        for kind, payload, image in batch:
+            if kind == 'compact':
+                compactions.append(payload)
+            elif kind == 'add':
+                entries[payload['id']] = {'record': payload, 'image': image, 'new': True}
+            elif payload['id'] in entries:
+                entries[payload['id']]['record'] = payload
+            else:
+                entries[payload['id']] = {'record': payload, 'image': None, 'new': False}
+
+        inserts = []
+        updates = []
+        settled_images = []
+        skipped = 0
+        for entry in entries.values():
+            record = entry['record']
+            if entry['new']:
+                if record['status'] in self.SETTLED_STATUSES:
+                    # 書き込む前に終わったジョブはディスクに残さない
+                    skipped += 1
+                    continue
+                try:
+                    if isinstance(entry['image'], bytes):
+                        Path(record['image_path']).write_bytes(entry['image'])
+                    else:
+                        entry['image'].save(record['image_path'], 'PNG', compress_level=1)
+                except Exception as e:
+                    self.logger.error(f"ジョブ {record['id']} のソース画像を保存できません: {str(e)}")
+                    continue
+                inserts.append(record)
+            else:
+                updates.append(record)
+                if record['status'] in self.SETTLED_STATUSES:
+                    settled_images.append(record['image_path'])
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                """INSERT OR REPLACE INTO jobs
+                   (id, status, source, from_language, to_language, mode, source_hash, image_path,
+                    attempts, next_attempt_at, last_error, created_at, updated_at)
+                   VALUES (:id, :status, :source, :from_language, :to_language, :mode, :source_hash,
+                           :image_path, :attempts, :next_attempt_at, :last_error, :created_at, :updated_at)""",
+                [dict(record, updated_at=now) for record in inserts]
+            )
+            self._conn.executemany(
+                """UPDATE jobs SET status = :status, attempts = :attempts, next_attempt_at = :next_attempt_at,
+                                   last_error = :last_error, updated_at = :updated_at
+                   WHERE id = :id""",
+                [dict(record, updated_at=now) for record in updates]
+            )
+            self._conn.commit()
+
+        # 完了したジョブの画像はコミット後に削除（行はcompactで削除）
+        for image_path in settled_images:
+            Path(image_path).unlink(missing_ok=True)
+
+        if len(batch) > 1:
+            self.logger.debug(f"ジョブキュー書き込み: 操作 {len(batch)}件 → 登録 {len(inserts)}件, "
+                              f"更新 {len(updates)}件, 書き込み省略 {skipped}件")
+
+        for failed_retention_days in compactions:
+            self._compact(failed_retention_days)
+
+    def _compact(self, failed_retention_days):
+        cutoff = time.time() - failed_retention_days * 86400
+        with self._lock:
+            failed_rows = self._conn.execute(
+                "SELECT image_path FROM jobs WHERE status = 'failed' AND updated_at < ?", (cutoff,)
+            ).fetchall()
+            removed = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(self.SETTLED_STATUSES))}) "
+                f"OR (status = 'failed' AND updated_at < ?)",
+                (*self.SETTLED_STATUSES, cutoff)
+            ).rowcount
+            self._conn.commit()
+            referenced = {row['image_path'] for row in self._conn.execute("SELECT image_path FROM jobs")}
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        for row in failed_rows:
+            Path(row['image_path']).unlink(missing_ok=True)
+
+        # 行を書く前に異常終了した画像（1時間以上前のもの）を削除
+        orphans = 0
+        stale_before = time.time() - 3600
+        for path in self.image_dir.glob('*.png'):
+            try:
+                if str(path) not in referenced and path.stat().st_mtime < stale_before:
+                    path.unlink()
+                    orphans += 1
+            except FileNotFoundError:
+                continue
+
+        if removed or orphans:
+            self.logger.info(f"ジョブキューを整理: {removed}件削除, 孤立した画像 {orphans}件削除")
+
+    def resume(self):
+        """前回までに完了しなかったジョブのレコード（登録順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE status IN ({', '.join('?' * len(self.ACTIVE_STATUSES))}) "
+                f"ORDER BY created_at",
+                self.ACTIVE_STATUSES
+            ).fetchall()
+
+        records = []
+        for row in rows:
+            record = dict(row)
+            record.pop('updated_at')
+            if not Path(record['image_path']).exists():
+                self.logger.warning(f"ジョブ {record['id']} のソース画像がないため再開しません")
+                self.update(record, 'failed', 'ソース画像がありません')
+                continue
+            records.append(record)
+        return records
+
+    def close(self, timeout=5.0):
+        """書き込みを終えてDB接続を閉じる"""
+        with self._ops_ready:
+            self._closed = True
+            self._ops_ready.notify_all()
+        self._writer.join(timeout)
+        with self._lock:
+            self._conn.close()
+
+
+class CancellableHTTPAdapter(requests.adapters.HTTPAdapter):
+    """送受信中の接続を利用元ごとに記録し、キャンセル時に別スレッドから切断できるアダプター
+
+    Session.close()はプールに戻った待機中の接続しか閉じないため、アップロード中・応答待ちの
+    接続のソケットを直接shutdownして、ブロックしている送受信を即座に失敗させる。
+    接続プールは全翻訳スレッドで共有し、切断するのはキャンセルした利用元が使用中の接続のみ。
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._owners = weakref.WeakKeyDictionary()  # 使用中の接続 → 利用元
+        self._connections_lock = threading.Lock()
+        self._local = threading.local()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: self._tracking_pool_class(pool_class)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def _tracking_pool_class(self, pool_class):
+        """接続の確立・リクエスト送信・切断を記録するコネクションクラスを使うプールクラス"""
+        adapter = self
+
+        class TrackedConnection(pool_class.ConnectionCls):
+            def connect(self):
+                adapter._claim(self)
+                super().connect()
+
+            def request(self, *args, **kwargs):
+                # プールから再利用された接続は connect() を通らないため送信時にも記録
+                adapter._claim(self)
+                return super().request(*args, **kwargs)
+
+            def close(self):
+                with adapter._connections_lock:
+                    adapter._owners.pop(self, None)
+                super().close()
+
+        return type(pool_class.__name__, (pool_class,), {'ConnectionCls': TrackedConnection})
+
+    def _claim(self, connection):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            return
+        with self._connections_lock:
+            self._owners[connection] = owner
+
+    def bind_owner(self, owner):
+        """このスレッドから送るリクエストの接続をownerの使用中として記録する"""
+        self._local.owner = owner
+
+    def release_owner(self, owner):
+        """ownerのリクエストが終わった（接続はプールに戻った）ことを記録する"""
+        self._local.owner = None
+        with self._connections_lock:
+            for connection in [c for c, o in self._owners.items() if o is owner]:
+                del self._owners[connection]
+
+    def abort(self, owner):
+        """ownerが送受信中の接続を切断（別スレッドから呼び出し可）、切断した接続数を返す"""
+        with self._connections_lock:
+            connections = [c for c, o in self._owners.items() if o is owner]
+        for connection in connections:
+            sock = getattr(connection, 'sock', None)
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return len(connections)
+
+
+def create_http_session(pool_size=10):
+    """キャンセル可能なアダプターをマウントしたセッション（翻訳スレッド間で共有する）"""
+    session = requests.Session()
+    adapter = CancellableHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class TranslationCancelled(Exception):
+    """翻訳ジョブがキャンセルされた"""
+
+
 class TranslationThread(QThread):
     """画像翻訳を実行する別スレッド"""
-    finished = pyqtSignal(Image.Image)
+    # QThread.finished（スレッド終了）と区別するため翻訳完了はtranslatedで通知
+    translated = pyqtSignal(Image.Image)
     error = pyqtSignal(str)
     progress = pyqtSignal(str)  # 進捗状況通知用
+    skipped = pyqtSignal(str)  # テキストなしと判定して翻訳をスキップした場合
+    cancelled = pyqtSignal()  # キャンセルにより中断した場合
+
+    # キャンセル要求を確認する間隔（秒）
+    CANCEL_POLL_INTERVAL = 0.1
+
+    # 通常経路の送信前処理（パディング＋PNGエンコード）の1メガピクセルあたりの時間（ms、全スレッド共通のEWMA）
+    # PNGをそのまま送信したジョブで省略できたCPU時間の推定に使う
+    upload_prep_ms_per_mpx = None
 
-    def __init__(self, image, config, from_language, to_language):
+    def __init__(self, job, config, history=None, router=None, workers=None, shared_cache=None, prompts=None,
+                 session=None):
         super().__init__()
-        self.image = image
+        self.job = job
+        # PNGのまま受け取ったジョブはGUIスレッドでデコードせず、画素が必要になった時点でこのスレッドでデコード
+        # （取り込み時にハッシュ計算のためデコード済みの場合はその画像を使う）
+        self._image = job.image if job.native_png is None else None
         self.config = config
-        self.from_language = from_language
-        self.to_language = to_language
+        self.from_language = job.from_language
+        self.to_language = job.to_language
+        self.history = history
+        # 翻訳方式（ジョブごとに指定可能）: 'image_edit' または 'text_layer'
+        self.mode = job.mode or config['api_settings']['translation_mode']
         self.api_key = os.getenv('OPENAI_API_KEY')
         self.logger = logging.getLogger('ImageTranslator.TranslationThread')
+        # 画像編集・生成APIの呼び出し先（アプリ共有のルーターで応答時間・エラー率を集計）
+        self.router = router or BackendRouter.from_config(config)
+        # リサイズ・PNGエンコードを実行するプロセスプール（未指定時はこのスレッド内で処理）
+        self.workers = workers or ImageWorkerPool(False, 0, 0)
+        # チーム共有の翻訳キャッシュ（未設定ならNone）
+        self.shared_cache = shared_cache
+        self.shared_cache_key = None
+        self.prompts = prompts or PromptTemplateLibrary.from_config(config)
+
+        # 履歴記録用の処理情報（品質・方式・処理時間）
+        self.job_stats = {
+            'quality': None,
+            'input_fidelity': None,
+            'method': None,
+            'latency_ms': None,
+            'cost_estimate': None,
+            'requested_quality': None,
+            'policy_reason': None,
+            'backend': None,
+            'preprocess_ms': None,
+            'api_ms': None,
+            'timeouts': 0,
+            'network_errors': 0,
+            'png_passthrough': False,
+            'passthrough_saved_ms': None,
+            'prompt_variant': None
+        }
+        self.text_features = None
+
+        # キャンセル制御（HTTP接続はアプリ共有のセッションの接続プールを使い、キャンセル時は
+        # このスレッドが送受信中の接続だけを切断。未指定時はスレッド専用のセッション）
+        self._cancel_event = threading.Event()
+        self.owns_session = session is None
+        self.session = session or create_http_session()
+        self.http_adapter = self.session.get_adapter('https://')
+
+    def cancel(self):
+        """キャンセルを要求（GUIスレッドから呼び出し）"""
+        if not self._cancel_event.is_set():
+            self.logger.info(f"キャンセル要求: ジョブ #{self.job.job_id}")
+            self._cancel_event.set()
+
+    def is_cancelled(self):
+        """キャンセル要求済みか"""
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """キャンセル要求済みなら以降の処理を中断"""
+        if self._cancel_event.is_set():
+            raise TranslationCancelled()
+
+    def send_request(self, method, url, **kwargs):
+        """キャンセル可能なHTTPリクエスト
+
+        リクエスト本体は補助スレッドで実行し、このスレッドはキャンセル要求を監視する。
+        キャンセル時は送受信中の接続のソケットを切断し、応答を待たずに中断する
+        （補助スレッドの送受信もその場でエラーになり終了する）。
+        """
+        self.check_cancelled()
+
+        outcome = {}
+        done = threading.Event()
+
+        def perform():
+            self.http_adapter.bind_owner(self)
+            try:
+                outcome['response'] = self.session.request(method, url, **kwargs)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                self.http_adapter.release_owner(self)
+                done.set()
+
+        threading.Thread(target=perform, name=f'Request-{self.job.job_id}', daemon=True).start()
+        while not done.wait(self.CANCEL_POLL_INTERVAL):
+            if self._cancel_event.is_set():
+                aborted = self.http_adapter.abort(self)
+                self.logger.info(f"通信を切断: ジョブ #{self.job.job_id} (接続 {aborted}件)")
+                raise TranslationCancelled()
+
+        self.check_cancelled()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['response']
+
+    def call_backends(self, operation, quality=None, **kwargs):
+        """ルーターが決めた順にバックエンドを呼び出し、失敗時は次のバックエンドに切り替え
+
+        応答JSONを返す。リクエスト内容の誤り（4xx）は切り替えても解決しないためNoneを返す。
+        kwargsのtimeoutは固定値で、応答時間の観測が十分なバックエンドには適応タイムアウトを使う。
+        """
+        static_timeout = kwargs.pop('timeout')
+        timeouts = self.router.timeouts
+        candidates, decision = self.router.choose(self.job.job_id, operation)
+        if not candidates:
+            self.logger.error("利用可能な翻訳バックエンドがありません（APIキーと backends 設定を確認してください）")
+            return None
+
+        max_attempts = self.config['backends']['routing']['max_attempts']
+        for backend in candidates[:max_attempts]:
+            timeout = timeouts.timeout_for(backend.name, operation, quality, static_timeout)
+            call_start = time.perf_counter()
+            try:
+                try:
+                    result = getattr(backend, operation)(self.send_request, timeout=timeout, **kwargs)
+                finally:
+                    # 失敗した呼び出しも含めたAPIの所要時間
+                    self.job_stats['api_ms'] = ((self.job_stats['api_ms'] or 0)
+                                                + (time.perf_counter() - call_start) * 1000)
+            except TranslationCancelled:
+                raise
+            except BackendError as e:
+                latency_ms = (time.perf_counter() - call_start) * 1000
+                self.router.record(backend.name, latency_ms, ok=not e.retryable)
+                if not e.retryable:
+                    self.logger.error(f"バックエンド {backend.name}: {str(e)}（再試行しません）")
+                    return None
+                self.logger.warning(f"バックエンド {backend.name} 失敗、次の候補に切り替え: {str(e)}")
+                continue
+            except (requests.exceptions.RequestException, ValueError) as e:
+                latency_ms = (time.perf_counter() - call_start) * 1000
+                self.router.record(backend.name, latency_ms, ok=False)
+                if isinstance(e, requests.exceptions.RequestException):
+                    self.job_stats['network_errors'] += 1
+                if isinstance(e, requests.exceptions.Timeout):
+                    self.job_stats['timeouts'] += 1
+                    self.log_adaptive_timeout(backend.name, timeout, static_timeout)
+                    timeouts.observe(backend.name, operation, quality, latency_ms)
+                self.logger.warning(f"バックエンド {backend.name} 通信エラー、次の候補に切り替え: {str(e)}")
+                continue
+
+            latency_ms = (time.perf_counter() - call_start) * 1000
+            self.router.record(backend.name, latency_ms, ok=True, decision=decision)
+            timeouts.observe(backend.name, operation, quality, latency_ms)
+            self.job_stats['backend'] = backend.name
+            self.logger.info(f"バックエンド {backend.name} 応答 ({latency_ms:.0f}ms)")
+            return result
+
+        self.logger.error("すべてのバックエンド候補で失敗しました")
+        return None
+
+    def download_result(self, url, static_timeout):
+        """URL形式の結果画像をダウンロード（応答時間を適応タイムアウトに反映）"""
+        timeouts = self.router.timeouts
+        timeout = timeouts.timeout_for('image_download', 'get', None, static_timeout)
+        download_start = time.perf_counter()
+        try:
+            response = self.send_request('GET', url, timeout=timeout)
+        except requests.exceptions.Timeout:
+            self.log_adaptive_timeout('image_download', timeout, static_timeout)
+            timeouts.observe('image_download', 'get', None, (time.perf_counter() - download_start) * 1000)
+            raise
+        timeouts.observe('image_download', 'get', None, (time.perf_counter() - download_start) * 1000)
+        return response
+
+    def log_adaptive_timeout(self, endpoint, timeout, static_timeout):
+        """適応タイムアウトで打ち切った場合、固定値より早く回復に移れた時間を記録"""
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout < static_timeout:
+            self.logger.warning(f"{endpoint}: 適応タイムアウト {read_timeout:.0f}秒で打ち切り "
+                                f"（固定 {static_timeout}秒より {static_timeout - read_timeout:.0f}秒早く切り替え）")
+        else:
+            self.logger.warning(f"{endpoint}: タイムアウト {read_timeout:.0f}秒で打ち切り")
+
+    def wait_future(self, future):
+        """ワーカープロセスの処理完了をキャンセル要求を監視しながら待つ"""
+        while True:
+            try:
+                return future.result(timeout=self.CANCEL_POLL_INTERVAL)
+            except FutureTimeoutError:
+                if self._cancel_event.is_set():
+                    future.cancel()
+                    raise TranslationCancelled()
+
+    @property
+    def image(self):
+        """ソース画像（PNGのまま受け取ったジョブは初回アクセス時にデコード）"""
+        if self._image is None and self.job.native_png is not None:
+            decode_start = time.perf_counter()
+            self._image = self.job.image
+            self.logger.debug(f"クリップボードのPNGをデコード: {self._image.size} "
+                              f"({(time.perf_counter() - decode_start) * 1000:.1f}ms)")
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image = image
+
+    def run_image_stage(self, func, image, *args, output_size=None, output_mode=None):
+        """画像処理ステージを実行（大きい画像はプロセスプールで処理）"""
+        return self.workers.run(func, image, args, output_size=output_size, output_mode=output_mode,
+                                wait=self.wait_future)
+
+    def use_shared_cache_result(self, start_time):
+        """共有キャッシュを参照し、ヒットした場合は結果を送出してTrue"""
+        if self.shared_cache is None:
+            return False
+        try:
+            self.shared_cache_key = SharedCacheClient.make_key(self.image, self.from_language,
+                                                               self.to_language, self.config)
+            png_bytes = self.shared_cache.get(self.shared_cache_key)
+            if png_bytes is None:
+                return False
+            cached_image = Image.open(BytesIO(png_bytes))
+            cached_image.load()
+        except Exception as e:
+            self.logger.warning(f"共有キャッシュ参照エラー（APIで翻訳を継続）: {str(e)}")
+            return False
+
+        self.check_cancelled()
+        self.job.result_data = png_bytes
+        self.job_stats['method'] = 'shared_cache'
+        self.job_stats['cost_estimate'] = 0.0
+        self.job_stats['latency_ms'] = int((time.perf_counter() - start_time) * 1000)
+        self.logger.info(f"共有キャッシュの結果を使用 ({self.job_stats['latency_ms']}ms)")
+        self.translated.emit(cached_image)
+        return True
+
+    def store_shared_cache_result(self, translated_image):
+        """翻訳結果を共有キャッシュに登録（バックグラウンド）
+
+        共有キャッシュの内容はPNGで統一する（出力ストアがWebPの場合はPNGでエンコードし直す）。
+        """
+        if self.shared_cache is None or not self.shared_cache_key or not self.job.result_data:
+            return
+        png_bytes = self.job.result_data
+        if not png_bytes.startswith(PNG_SIGNATURE):
+            try:
+                png_bytes = self.run_image_stage(encode_png, translated_image)
+            except TranslationCancelled:
+                raise
+            except Exception as e:
+                self.logger.warning(f"共有キャッシュ用のPNGエンコードエラー（登録しません）: {str(e)}")
+                return
+        self.shared_cache.put_async(self.shared_cache_key, png_bytes)
+
+    def observe_upload_preparation(self, size, elapsed_sec):
+        """送信前処理の時間を1メガピクセルあたりに換算して記録"""
+        megapixels = size[0] * size[1] / 1_000_000
+        rate = elapsed_sec * 1000 / megapixels
+        previous = TranslationThread.upload_prep_ms_per_mpx
+        TranslationThread.upload_prep_ms_per_mpx = rate if previous is None else previous * 0.8 + rate * 0.2
+
+    def record_png_passthrough(self, size, byte_count):
+        """PNGをそのまま送信したことと、省略できた送信前処理の推定時間を記録"""
+        rate = TranslationThread.upload_prep_ms_per_mpx
+        saved_ms = rate * size[0] * size[1] / 1_000_000 if rate is not None else None
+        self.job_stats['png_passthrough'] = True
+        self.job_stats['passthrough_saved_ms'] = saved_ms
+        saved = f"推定 {saved_ms:.0f}ms" if saved_ms is not None else "推定値なし（通常経路の計測待ち）"
+        self.logger.info(f"クリップボードのPNGをそのまま送信: {size[0]}x{size[1]} {byte_count / 1024:.0f}KB "
+                         f"（パディング・PNGエンコードを省略、{saved}）")
+
+    def encode_result(self, job, translated_image):
+        """保存用のPNGをこのスレッド側で作成（GUIスレッドでエンコードしない）"""
+        try:
+            store_settings = self.config['output_store']
+            if store_settings['enabled']:
+                job.result_data = self.run_image_stage(encode_output_image, translated_image,
+                                                       store_settings['format'])
+            else:
+                job.result_data = self.run_image_stage(encode_png, translated_image)
+        except TranslationCancelled:
+            raise
+        except Exception as e:
+            self.logger.warning(f"結果画像のPNGエンコードエラー（保存時に再エンコード）: {str(e)}")
 
     def run(self):
         """翻訳処理を実行"""
         self.logger.info(f"翻訳処理開始: {LANGUAGE_MAP[self.from_language]['display']} → {LANGUAGE_MAP[self.to_language]['display']}")
         self.progress.emit(f"{LANGUAGE_MAP[self.from_language]['display']}→{LANGUAGE_MAP[self.to_language]['display']}で翻訳を開始")
 
+        start_time = time.perf_counter()
         try:
+            # テキストを含まない画像はAPIを呼ばずにスキップ
+            if self.is_text_absent():
+                return
+            self.check_cancelled()
+
+            # 履歴用サムネイルはGUIスレッドを止めないようここで生成
+            self.make_thumbnails()
+
+            # 共有キャッシュに同じ画像・設定の結果があればAPIを呼ばない
+            if self.use_shared_cache_result(start_time):
+                return
+
+            # テキストレイヤー方式が選択されている場合は先に試行
+            translated_image = None
+            if self.mode == 'text_layer':
+                translated_image = self.translate_text_layer(self.image)
+                if translated_image:
+                    self.logger.info("テキストレイヤー翻訳成功")
+                    self.job_stats['method'] = 'text_layer'
+                else:
+                    self.check_cancelled()
+                    self.logger.warning("テキストレイヤー翻訳に失敗、画像編集方式を試行")
+
             # メイン方式で翻訳を試行
-            translated_image = self.translate_image(self.image)
+            if not translated_image:
+                translated_image = self.translate_image()
+                if translated_image:
+                    self.logger.info("翻訳成功")
+                    self.job_stats['method'] = 'edits'
+
             if translated_image:
-                self.logger.info("翻訳成功")
-                self.finished.emit(translated_image)
+                if self.job_stats['method'] == 'edits':
+                    self.record_tier_outcome('ok')
+                self.job_stats['latency_ms'] = int((time.perf_counter() - start_time) * 1000)
+                self.logger.info(f"処理時間: {self.job_stats['latency_ms']}ms, 方式: {self.job_stats['method']}")
+                self.encode_result(self.job, translated_image)
+                self.store_shared_cache_result(translated_image)
+                self.translated.emit(translated_image)
             else:
+                self.check_cancelled()
                 self.logger.warning("メイン翻訳に失敗、フォールバック方式を試行")
                 self.progress.emit("別の方法で翻訳を試行中...")
                 # フォールバック方式を試行
                 translated_image = self.translate_image_fallback(self.image)
+                self.record_tier_outcome('fallback')
                 if translated_image:
                     self.logger.info("フォールバック翻訳成功")
-                    self.finished.emit(translated_image)
+                    self.job_stats['method'] = 'generations'
+                    self.job_stats['quality'] = 'high'
+                    self.job_stats['input_fidelity'] = None
+                    self.job_stats['latency_ms'] = int((time.perf_counter() - start_time) * 1000)
+                    self.encode_result(self.job, translated_image)
+                    self.translated.emit(translated_image)
                 else:
                     self.logger.warning("すべての翻訳方式に失敗しました")
                     self.error.emit("翻訳に失敗しました。APIキーまたはネットワーク接続を確認してください。")
+        except TranslationCancelled:
+            self.logger.info(f"翻訳をキャンセルしました: ジョブ #{self.job.job_id}")
+            self.cancelled.emit()
         except Exception as e:
             self.logger.error(f"翻訳エラー: {str(e)}", exc_info=True)
+            self.record_tier_outcome('error')
             self.error.emit(f"エラー: {str(e)}")
+        finally:
+            self.close_session()
+            # ソース画像とバッファはスレッド終了時点で解放（スレッドオブジェクトより先に手放す）
+            self.image = None
+
+    def close_session(self):
+        """スレッド専用のセッションの場合のみ閉じる（共有セッションの接続プールは残す）"""
+        if self.owns_session:
+            self.session.close()
+
+    def make_thumbnails(self):
+        """履歴用のソース画像サムネイルを生成"""
+        if self.history is None:
+            return
+        try:
+            self.job.thumbnail = self.history.make_thumbnail(self.image)
+        except Exception as e:
+            self.logger.warning(f"サムネイル生成エラー: {str(e)}")
+
+    def record_tier_outcome(self, outcome):
+        """画像編集APIで要求した品質ティアの結果を履歴に集計"""
+        quality = self.job_stats['requested_quality']
+        if self.history is None or quality is None:
+            return
+        try:
+            self.history.record_tier_outcome(quality, outcome)
+        except Exception as e:
+            self.logger.warning(f"品質ティア結果の記録エラー: {str(e)}")
+
+    def is_text_absent(self):
+        """翻訳元言語のテキストが含まれていないと推定される場合はskippedを送出してTrue"""
+        prefilter = self.config['text_prefilter']
+        if not prefilter['enabled']:
+            return False
+
+        try:
+            classifier = TextPresenceClassifier(prefilter['analysis_max_side'], prefilter['edge_threshold'])
+            features = classifier.analyze(self.image, self.from_language)
+        except Exception as e:
+            self.logger.warning(f"テキスト存在推定エラー（翻訳を継続）: {str(e)}")
+            return False
+
+        self.text_features = features
+        self.logger.info(f"テキスト存在スコア: {features['score']:.3f} (閾値 {prefilter['threshold']}, "
+                         f"CPU {features['cpu_ms']:.1f}ms)")
+        if features['score'] >= prefilter['threshold']:
+            return False
+
+        self.skipped.emit(
+            f"{LANGUAGE_MAP[self.from_language]['display']}のテキストが見つからないため翻訳をスキップしました"
+            f"（スコア {features['score']:.2f}）"
+        )
+        return True
 
     def optimize_aspect_ratio(self, image_size):
         """元画像のアスペクト比に基づいて最適なAPIサイズを決定"""
@@ -286,6 +3593,7 @@ class TranslationThread(QThread):
 
     def prepare_image_with_padding(self, image):
         """アスペクト比保持のため画像にパディングを追加"""
+        prepare_start = time.perf_counter()
         original_width, original_height = image.size
         original_ratio = original_width / original_height
 
@@ -322,13 +3630,11 @@ class TranslationThread(QThread):
             padding_top = (target_height - scaled_height) // 2
             padding_bottom = target_height - scaled_height - padding_top
 
-            # 新しい画像作成（背景は元画像の端の色を自動検出）
+            # 新しい画像作成（背景は元画像の端の色を自動検出）し、元画像をリサイズして配置
             bg_color = self.get_background_color(image)
-            new_image = Image.new('RGB', (target_width, target_height), bg_color)
-
-            # 元画像をリサイズして配置
-            resized_image = image.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
-            new_image.paste(resized_image, (0, padding_top))
+            new_image = self.run_image_stage(pad_to_canvas, image, (target_width, target_height),
+                                             (scaled_width, scaled_height), (0, padding_top), bg_color,
+                                             output_size=(target_width, target_height), output_mode='RGB')
 
             padding_info = {
                 'type': 'vertical',
@@ -348,13 +3654,11 @@ class TranslationThread(QThread):
             padding_left = (target_width - scaled_width) // 2
             padding_right = target_width - scaled_width - padding_left
 
-            # 新しい画像作成
+            # 新しい画像作成し、元画像をリサイズして配置
             bg_color = self.get_background_color(image)
-            new_image = Image.new('RGB', (target_width, target_height), bg_color)
-
-            # 元画像をリサイズして配置
-            resized_image = image.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
-            new_image.paste(resized_image, (padding_left, 0))
+            new_image = self.run_image_stage(pad_to_canvas, image, (target_width, target_height),
+                                             (scaled_width, scaled_height), (padding_left, 0), bg_color,
+                                             output_size=(target_width, target_height), output_mode='RGB')
 
             padding_info = {
                 'type': 'horizontal',
@@ -364,7 +3668,8 @@ class TranslationThread(QThread):
                 'scaled_size': (scaled_width, scaled_height)
             }
 
-        self.logger.info(f"パディング処理完了: {padding_info}")
+        self.logger.info(f"パディング処理完了: {padding_info} "
+                         f"({(time.perf_counter() - prepare_start) * 1000:.1f}ms)")
         return new_image, padding_info
 
     def get_background_color(self, image):
@@ -386,107 +3691,90 @@ class TranslationThread(QThread):
         self.logger.debug(f"検出背景色: {most_common_color}")
         return most_common_color
 
-    def create_optimized_prompt(self, original_size, target_size, padding_info):
-        """レイアウト保持に特化した最適化プロンプト（パディング対応）を生成"""
-        width, height = original_size
+    def padding_content_box(self, padding_info, canvas_size):
+        """パディング後キャンバス内の元画像部分の矩形 (left, top, right, bottom)"""
+        canvas_width, canvas_height = canvas_size
+        if padding_info.get('type') == 'vertical':
+            return (0, padding_info['padding_top'], canvas_width, canvas_height - padding_info['padding_bottom'])
+        if padding_info.get('type') == 'horizontal':
+            return (padding_info['padding_left'], 0, canvas_width - padding_info['padding_right'], canvas_height)
+        return (0, 0, canvas_width, canvas_height)
+
+    def build_text_mask(self, processed_image, padding_info):
+        """テキスト領域マスクを生成（使用しない場合はNone）"""
+        mask_settings = self.config['text_region_mask']
+        if not mask_settings['enabled']:
+            return None
+        if processed_image is None:
+            # PNGをそのまま送信する場合は送信画像＝ソース画像
+            processed_image = self.image
 
-        # API用の英語言語名を取得
-        from_lang = LANGUAGE_MAP[self.from_language]['api']
-        to_lang = LANGUAGE_MAP[self.to_language]['api']
+        try:
+            mask_start = time.perf_counter()
+            prefilter = self.config['text_prefilter']
+            masker = TextRegionMasker(
+                TextPresenceClassifier(prefilter['analysis_max_side'], prefilter['edge_threshold']),
+                merge_px=mask_settings['merge_px'],
+                margin_px=mask_settings['margin_px'],
+                feather_px=mask_settings['feather_px']
+            )
+            content_box = self.padding_content_box(padding_info, processed_image.size)
+            region = masker.build_region(processed_image, content_box)
+        except Exception as e:
+            self.logger.warning(f"テキスト領域マスク生成エラー（マスクなしで継続）: {str(e)}")
+            return None
+
+        coverage = ImageStat.Stat(region).mean[0] / 255
+        if not mask_settings['min_coverage'] <= coverage <= mask_settings['max_coverage']:
+            self.logger.info(f"テキスト領域の割合が範囲外のためマスクを使用しません: {coverage:.3f}")
+            return None
+
+        self.logger.info(f"テキスト領域マスク生成: 面積比 {coverage:.3f} "
+                         f"({(time.perf_counter() - mask_start) * 1000:.1f}ms)")
+        return {
+            'png': masker.to_edit_mask_png(region),
+            'blend': masker.feather(region),
+            'coverage': coverage
+        }
+
+    def choose_quality_by_policy(self, image, padding_info):
+        """品質ポリシーで quality / input_fidelity を選択（無効・失敗時はNone）"""
+        policy_settings = self.config['quality_policy']
+        if not policy_settings['enabled']:
+            return None
+        if image is None:
+            image = self.image
+
+        try:
+            features = self.text_features
+            if features is None:
+                prefilter = self.config['text_prefilter']
+                classifier = TextPresenceClassifier(prefilter['analysis_max_side'], prefilter['edge_threshold'])
+                features = classifier.analyze(image, self.from_language)
+                self.text_features = features
+
+            tier_outcomes = self.history.tier_outcomes() if self.history is not None else {}
+            policy = QualityPolicy(policy_settings, tier_outcomes)
+            return policy.choose(features, image.size, padding_info['scale'])
+        except Exception as e:
+            self.logger.warning(f"品質ポリシー評価エラー（設定値を使用）: {str(e)}")
+            return None
+
+    def render_prompt(self, name, target_size=None, padding_type='none'):
+        """テンプレートからプロンプトを取得し、使用した変種とサイズを記録"""
+        prompt = self.prompts.render(name, self.job.job_id, self.from_language, self.to_language,
+                                     target_size, padding_type)
+        self.job_stats['prompt_variant'] = prompt['variant']
+        self.logger.info(f"プロンプト {prompt['variant']}: {prompt['bytes']:,}バイト / 約{prompt['tokens']:,}トークン")
+        return prompt['text']
 
-        # パディング情報に基づくプロンプト調整
-        padding_instructions = ""
-        if padding_info['type'] == 'vertical':
-            padding_instructions = """
-🔶 重要: この画像は上下にパディングが追加されています。
-- 上下の余白部分は翻訳対象外です
-- 中央部分の元画像内容のみを翻訳してください
-- 上下の余白は元の色のまま保持してください"""
-        elif padding_info['type'] == 'horizontal':
-            padding_instructions = """
-🔶 重要: この画像は左右にパディングが追加されています。
-- 左右の余白部分は翻訳対象外です
-- 中央部分の元画像内容のみを翻訳してください
-- 左右の余白は元の色のまま保持してください"""
-
-        # 画像の特性に応じたプロンプト調整
-        aspect_info = ""
-        if target_size == "1024x1024":
-            aspect_info = "この正方形の画像において、"
-        elif target_size == "1536x1024":
-            aspect_info = "この横長の画像において、"
-        elif target_size == "1024x1536":
-            aspect_info = "この縦長の画像において、"
-
-        # 言語名の翻訳例を追加
-        lang_example = ""
-        if self.from_language == 'japanese' and self.to_language == 'tagalog':
-            lang_example = """
-🔍 【重要な翻訳例】:
-画像内に「中国語」という文字がある場合 → 「wikang Tsino」に翻訳
-画像内に「韓国語」という文字がある場合 → 「wikang Koreano」に翻訳
-つまり、言語名も意味を理解して適切に翻訳してください。文字列の単純置換ではありません。
-
-"""
-
-        # 超強化アイコン保護プロンプト
-        optimized_prompt = f"""
-🔒 PHOTOCOPY MODE: この画像を【工業用スキャナーで完璧複製】- {from_lang}で書かれたテキスト部分のみを{to_lang}に翻訳 🔒
-
-🖨️ 【PHOTOCOPY DIRECTIVE】: オフィスのコピー機で書類をコピーするように、この画像を完璧にコピーしてください。コピー機は{from_lang}で書かれたテキスト部分のみを{to_lang}に翻訳し、他の全ての要素（アイコン、色、レイアウト、デザイン）は1ピクセルも変更しません。
-{padding_instructions}
-{lang_example}
-{aspect_info}この画像の【写真品質の完全複製】を作成し、{from_lang}で書かれているテキスト部分のみを{to_lang}に翻訳してください。
-
-⚠️ 【ABSOLUTE FREEZE ZONES - 絶対変更禁止領域】⚠️
-
-🔐 ICONS & GRAPHICS (アイコン・グラフィック完全保護):
-❌ アイコンの形状変更 FORBIDDEN
-❌ アイコンの色変更 FORBIDDEN
-❌ アイコンのスタイル変更 FORBIDDEN
-❌ ボタンデザイン変更 FORBIDDEN
-❌ グラフィック要素変更 FORBIDDEN
-✅ 元のアイコンデザインを1ピクセル単位で【写真コピー】として保持
-
-🔐 COLOR PROTECTION (色彩絶対保護):
-❌ 背景色変更 FORBIDDEN
-❌ ボタン色変更 FORBIDDEN
-❌ 境界線色変更 FORBIDDEN
-❌ 影・グラデーション色変更 FORBIDDEN
-✅ すべての色を【RGB値完全一致】で保持
-
-🔐 LAYOUT FREEZE (レイアウト完全固定):
-❌ 要素位置移動 FORBIDDEN
-❌ サイズ変更 FORBIDDEN
-❌ 間隔変更 FORBIDDEN
-❌ 配置変更 FORBIDDEN
-✅ 【ミリメートル精度】でレイアウト保持
-
-🔐 TEXT COLOR LOCK (テキスト色固定):
-❌ 文字色変更 FORBIDDEN
-❌ 文字背景色変更 FORBIDDEN
-❌ 文字エフェクト変更 FORBIDDEN
-✅ {from_lang}テキストの色を{to_lang}翻訳テキストでも【完全同一】使用
-
-📝 【TRANSLATION ZONE - 翻訳許可領域】📝
-✅ {from_lang}で書かれたテキスト部分を{to_lang}に翻訳することのみ許可
-✅ テキストの意味を理解した自然な翻訳のみ許可（文字列置換禁止）
-✅ 言語名も適切に翻訳する（例：「日本語」→「wikang Hapon」）
-✅ その他の変更は一切禁止
-
-🎯 【EXECUTION COMMAND】:
-1. 元画像を【スキャナーで取り込んだような完璧さ】で複製
-2. {from_lang}で書かれたテキスト部分を見つけて【その位置・色・スタイルを保持】しながら{to_lang}に翻訳
-3. アイコン、ボタン、色、レイアウトは【1ピクセルも変更せず】保持
-4. 「元画像と見分けがつかない」レベルの複製品質で作成
-
-⚡ この指示を【絶対に遵守】してください。アイコンやデザインの変更は【完全に禁止】です。
-
-🖨️ 【FINAL REMINDER】: あなたは今、高性能コピー機です。原稿（元画像）を見て、{from_lang}で書かれた文字部分のみを{to_lang}に翻訳した完璧なコピーを作成してください。コピー機がアイコンや色を変えることはありません。
-        """.strip()
-
-        self.logger.debug(f"最適化プロンプト生成完了 (長さ: {len(optimized_prompt)}文字)")
-        return optimized_prompt
+    def create_masked_prompt(self, target_size, padding_info):
+        """マスク使用時の短いプロンプト（非テキスト部分は合成で元画像に戻すため保護指示は不要）"""
+        return self.render_prompt('masked', target_size, padding_info['type'])
+
+    def create_optimized_prompt(self, original_size, target_size, padding_info):
+        """レイアウト保持に特化した最適化プロンプト（パディング対応）"""
+        return self.render_prompt('optimized', target_size, padding_info['type'])
 
     def remove_padding_and_restore_size(self, translated_image, original_size, padding_info):
         """パディングを除去して元のアスペクト比に戻す"""
@@ -505,9 +3793,10 @@ class TranslationThread(QThread):
                 # パディング部分を除去（中央部分のみ抽出）
                 crop_top = padding_top
                 crop_bottom = translated_image.height - padding_bottom
-                cropped_image = translated_image.crop((0, crop_top, translated_image.width, crop_bottom))
+                crop_box = (0, crop_top, translated_image.width, crop_bottom)
 
-                self.logger.info(f"上下パディング除去: {translated_image.size} → {cropped_image.size}")
+                self.logger.info(f"上下パディング除去: {translated_image.size} → "
+                                 f"{(translated_image.width, crop_bottom - crop_top)}")
 
             elif padding_info['type'] == 'horizontal':
                 # 左右にパディングが追加された場合
@@ -518,64 +3807,85 @@ class TranslationThread(QThread):
                 # パディング部分を除去（中央部分のみ抽出）
                 crop_left = padding_left
                 crop_right = translated_image.width - padding_right
-                cropped_image = translated_image.crop((crop_left, 0, crop_right, translated_image.height))
+                crop_box = (crop_left, 0, crop_right, translated_image.height)
 
-                self.logger.info(f"左右パディング除去: {translated_image.size} → {cropped_image.size}")
+                self.logger.info(f"左右パディング除去: {translated_image.size} → "
+                                 f"{(crop_right - crop_left, translated_image.height)}")
             else:
-                cropped_image = translated_image
+                crop_box = (0, 0, translated_image.width, translated_image.height)
 
-            # 最終的に元のサイズにリサイズ
-            final_image = cropped_image.resize(original_size, Image.LANCZOS)
-            self.logger.info(f"最終リサイズ: {cropped_image.size} → {final_image.size}")
+            # 切り出しと元のサイズへのリサイズをまとめて実行（4K出力はワーカープロセスで処理）
+            final_image = self.run_image_stage(crop_and_resize, translated_image, crop_box, original_size,
+                                               output_size=original_size)
+            self.logger.info(f"最終リサイズ: {crop_box} → {final_image.size}")
 
             return final_image
 
+        except TranslationCancelled:
+            raise
         except Exception as e:
             self.logger.error(f"パディング除去エラー: {str(e)}")
             # エラーの場合は単純にリサイズして返す
             return translated_image.resize(original_size, Image.LANCZOS)
 
-    def translate_image(self, image):
-        """GPT-Image-1 APIを使用して画像を翻訳"""
+    def translate_image(self, image=None):
+        """GPT-Image-1 APIを使用して画像を翻訳（imageを省略した場合はジョブのソース画像）"""
 
-        # APIキーチェック
-        if not self.api_key:
-            raise Exception("APIキーが設定されていません")
+        source_size = image.size if image is not None else self.job.size
+        self.logger.debug(f"元画像サイズ: {source_size}")
+        preprocess_start = time.perf_counter()
 
-        self.logger.debug(f"元画像サイズ: {image.size}")
-
-        # アスペクト比保持のための前処理
-        processed_image, padding_info = self.prepare_image_with_padding(image)
+        if image is None and self.job.native_png is not None:
+            # 送信サイズと一致するクリップボードのPNGはパディング・再エンコードせずにそのまま送信
+            processed_image = None
+            padding_info = {'type': 'none', 'scale': 1.0}
+            image_png = self.job.native_png
+            self.record_png_passthrough(source_size, len(image_png))
+        else:
+            image = image if image is not None else self.image
 
-        # 画像をPNG形式のバイトデータに変換
-        img_buffer = BytesIO()
-        processed_image.save(img_buffer, format="PNG")
-        img_buffer.seek(0)
+            # アスペクト比保持のための前処理
+            processed_image, padding_info = self.prepare_image_with_padding(image)
 
-        self.logger.debug(f"処理後画像データ準備完了: {len(img_buffer.getvalue())} bytes")
+            # 画像をPNG形式のバイトデータに変換
+            image_png = self.run_image_stage(encode_png, processed_image)
+            self.observe_upload_preparation(processed_image.size, time.perf_counter() - preprocess_start)
 
-        # APIリクエスト準備（multipart/form-data形式）
-        headers = {
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        self.logger.debug(f"処理後画像データ準備完了: {len(image_png)} bytes")
 
         # 画像サイズを決定（パディング後のサイズ）
-        size = self.optimize_aspect_ratio(processed_image.size)
+        size = self.optimize_aspect_ratio(processed_image.size if processed_image is not None else source_size)
 
         self.logger.info(f"API送信サイズ: {size}")
 
         # multipart/form-data形式でデータを準備（gpt-image-1用）
-        # BytesIOを最初に戻してデータを準備
-        img_buffer.seek(0)
         files = [
-            ('image[]', ('image.png', img_buffer.getvalue(), 'image/png'))
+            ('image[]', ('image.png', image_png, 'image/png'))
         ]
 
-        # 高精度レイアウト保持プロンプト（パディング対応）
-        optimized_prompt = self.create_optimized_prompt(image.size, size, padding_info)
+        # テキスト領域マスク（非テキスト部分は後で元画像を合成するため完全に保持される）
+        text_mask = self.build_text_mask(processed_image, padding_info)
 
+        if text_mask:
+            files.append(('mask', ('mask.png', text_mask['png'], 'image/png')))
+            optimized_prompt = self.create_masked_prompt(size, padding_info)
+        else:
+            # 高精度レイアウト保持プロンプト（パディング対応）
+            optimized_prompt = self.create_optimized_prompt(source_size, size, padding_info)
+
+        policy_choice = self.choose_quality_by_policy(image, padding_info)
+
+        # 品質ポリシーが有効な場合は画像ごとに選択
+        if policy_choice:
+            quality, input_fidelity, reason = policy_choice
+            self.job_stats['policy_reason'] = reason
+        # マスク使用時は非テキスト部分の保持を合成で保証するため、設定した品質で十分
+        elif text_mask and self.config['text_region_mask']['quality']:
+            quality = self.config['text_region_mask']['quality']
+            input_fidelity = self.config['api_settings']['input_fidelity']
+            self.logger.info(f"テキスト領域マスク使用: quality={quality}")
         # 超精密モードの場合は強制的に高品質設定
-        if self.config['api_settings'].get('ultra_precision_mode', False):
+        elif self.config['api_settings'].get('ultra_precision_mode', False):
             quality = 'high'
             input_fidelity = 'high'
             self.logger.warning("🎯 超精密モード有効: quality=high, コスト=$0.17/画像")
@@ -583,6 +3893,10 @@ class TranslationThread(QThread):
             quality = self.config['api_settings']['quality']
             input_fidelity = self.config['api_settings']['input_fidelity']
 
+        self.job_stats['quality'] = quality
+        self.job_stats['input_fidelity'] = input_fidelity
+        self.job_stats['requested_quality'] = quality
+
         data = {
             'model': 'gpt-image-1',
             'prompt': optimized_prompt,
@@ -596,23 +3910,15 @@ class TranslationThread(QThread):
         try:
             timeout = self.config['api_settings']['timeout']
             self.logger.info(f"API呼び出し開始 (quality={quality}, input_fidelity={input_fidelity})")
-            self.logger.debug(f"送信データ: {data}")
+            self.logger.debug(f"送信データ: { {key: value for key, value in data.items() if key != 'prompt'} }")
             self.logger.debug(f"ファイル数: {len(files)}")
 
             self.progress.emit(f"AIに翻訳を依頼中...")
-            response = requests.post(
-                "https://api.openai.com/v1/images/edits",
-                headers=headers,
-                files=files,
-                data=data,
-                timeout=timeout
-            )
+            self.job_stats['preprocess_ms'] = (time.perf_counter() - preprocess_start) * 1000
+            result = self.call_backends('edit', quality=quality, files=files, data=data, timeout=timeout)
 
-            self.logger.info(f"APIレスポンス: ステータスコード {response.status_code}")
-
-            if response.status_code == 200:
+            if result is not None:
                 try:
-                    result = response.json()
                     self.logger.debug(f"APIレスポンス構造: {list(result.keys())}")
 
                     # gpt-image-1は常にbase64エンコードされた画像を返す
@@ -629,9 +3935,20 @@ class TranslationThread(QThread):
                             # 翻訳された画像を取得
                             translated_image = Image.open(BytesIO(image_bytes))
 
+                            # キャンセル済みなら後処理を行わない
+                            self.check_cancelled()
+
+                            # マスク外は元のピクセルに戻す（アイコン・色を完全に保持）
+                            if text_mask:
+                                translated_image = self.composite_outside_mask(
+                                    translated_image,
+                                    processed_image if processed_image is not None else self.image,
+                                    text_mask['blend']
+                                )
+
                             # パディング除去・元サイズ復元処理
                             final_image = self.remove_padding_and_restore_size(
-                                translated_image, image.size, padding_info
+                                translated_image, source_size, padding_info
                             )
 
                             return final_image
@@ -646,67 +3963,96 @@ class TranslationThread(QThread):
 
                 except (KeyError, IndexError, ValueError) as e:
                     self.logger.error(f"APIレスポンス解析エラー: {str(e)}")
-                    self.logger.error(f"レスポンス内容: {response.text}")
+                    self.logger.error(f"レスポンス構造: {list(result.keys())}")
                     return None
             else:
-                self.logger.error(f"APIエラー: {response.status_code}")
-                self.logger.error(f"レスポンスヘッダー: {dict(response.headers)}")
-                self.logger.error(f"レスポンス本文: {response.text}")
+                return None
 
-                # エラーレスポンスがJSONの場合は詳細を表示
-                try:
-                    error_detail = response.json()
-                    self.logger.error(f"エラー詳細: {error_detail}")
-                except:
-                    pass
+        except TranslationCancelled:
+            raise
+        except Exception as e:
+            self.logger.error(f"API呼び出しエラー: {str(e)}", exc_info=True)
+            return None
+
+    def composite_outside_mask(self, translated_image, processed_image, blend_mask):
+        """テキスト領域のみ翻訳結果を使い、それ以外は送信前の画像のピクセルを合成"""
+        translated_rgb = translated_image.convert('RGB')
+        if translated_rgb.size != processed_image.size:
+            translated_rgb = translated_rgb.resize(processed_image.size, Image.Resampling.LANCZOS)
+        composited = Image.composite(translated_rgb, processed_image.convert('RGB'), blend_mask)
+        self.logger.info("マスク外の元画像ピクセルを合成")
+        return composited
+
+    def translate_text_layer(self, image):
+        """テキストレイヤー方式: チャットモデルで文字領域と訳文を取得し、ローカルで描画"""
+        if not self.api_key:
+            raise Exception("APIキーが設定されていません")
+
+        translator = TextLayerTranslator(self.config, self.api_key, self.from_language, self.to_language)
+        settings = self.config['text_layer_settings']
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        try:
+            self.logger.info(f"テキストレイヤーAPI呼び出し開始 (model={settings['model']})")
+            self.progress.emit("AIに文字の読み取りと翻訳を依頼中...")
+            api_start = time.perf_counter()
+            response = self.send_request(
+                'POST',
+                settings['endpoint'],
+                headers=headers,
+                json=translator.build_request(image),
+                timeout=settings['timeout']
+            )
+            self.logger.info(f"テキストレイヤーAPIレスポンス: ステータスコード {response.status_code} "
+                             f"({(time.perf_counter() - api_start) * 1000:.0f}ms)")
 
+            if response.status_code != 200:
+                self.logger.error(f"テキストレイヤーAPIエラー: {response.text}")
                 return None
 
+            boxes = translator.parse_response(response.json())
+        except TranslationCancelled:
+            raise
         except requests.exceptions.Timeout:
-            self.logger.error("APIタイムアウト")
+            self.logger.error("テキストレイヤーAPIタイムアウト")
+            return None
+        except (KeyError, IndexError, ValueError) as e:
+            self.logger.error(f"テキストレイヤーレスポンス解析エラー: {str(e)}")
             return None
         except Exception as e:
-            self.logger.error(f"API呼び出しエラー: {str(e)}", exc_info=True)
+            self.logger.error(f"テキストレイヤーAPI呼び出しエラー: {str(e)}", exc_info=True)
             return None
 
+        if not boxes:
+            self.logger.warning("テキストレイヤー: 翻訳対象の文字が見つかりませんでした")
+            return None
+        self.check_cancelled()
+
+        render_start = time.perf_counter()
+        rendered = translator.render(image, boxes)
+        self.logger.info(f"テキストレイヤー描画完了: {len(boxes)}領域 "
+                         f"({(time.perf_counter() - render_start) * 1000:.1f}ms)")
+
+        self.job_stats['quality'] = 'text_layer'
+        self.job_stats['input_fidelity'] = None
+        self.job_stats['cost_estimate'] = translator.estimate_cost()
+        return rendered
+
     def translate_image_fallback(self, image):
         """フォールバック: 画像生成APIを使用して翻訳"""
         self.logger.info("フォールバック方式で翻訳を試行")
 
-        # API用の英語言語名を取得
-        from_lang = LANGUAGE_MAP[self.from_language]['api']
-        to_lang = LANGUAGE_MAP[self.to_language]['api']
-
         # 画像を一時的にbase64エンコード
         img_buffer = BytesIO()
         image.save(img_buffer, format="PNG")
         img_buffer.seek(0)
         image_b64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
-        # フォールバック用の言語例も生成
-        fallback_lang_example = ""
-        if self.from_language == 'japanese' and self.to_language == 'tagalog':
-            fallback_lang_example = """
-🔍 【重要】: 画像内の「中国語」→「wikang Tsino」のように、言語名も意味を理解して翻訳してください。
-"""
-
         # 高精度フォールバック用プロンプト
-        prompt = f"""🎯 ULTRA-PRECISE GENERATION:
-この画像と【完全に同一】のレイアウト・デザインで、{from_lang}で書かれているテキスト部分のみを{to_lang}に翻訳した画像を生成してください。
-{fallback_lang_example}
-【厳密保持要件】:
-🎨 色彩: 背景色、アイコン色、境界線色を【RGB値レベル】で完全維持
-🖼️ デザイン: アイコン、ボタン、UI要素のデザインを【1ピクセル単位】で保持
-📝 テキスト色: {from_lang}テキストの文字色を{to_lang}翻訳テキストでも【完全に同一色】で使用
-📐 レイアウト: 要素の位置、サイズ、間隔を【ミリメートル精度】で保持
-✨ エフェクト: 影、グラデーション、ハイライトを【元と同一】で再現
-
-{from_lang}で書かれた文字部分を意味を理解して自然な{to_lang}に翻訳し、他のすべての要素は【写真的に同一】にしてください。"""
+        prompt = self.render_prompt('fallback')
 
         data = {
             "model": "gpt-image-1",
@@ -718,17 +4064,11 @@ class TranslationThread(QThread):
 
         try:
             self.logger.info("画像生成API呼び出し開始")
-            response = requests.post(
-                "https://api.openai.com/v1/images/generations",
-                headers=headers,
-                json=data,
-                timeout=120
-            )
-
-            self.logger.info(f"画像生成APIレスポンス: ステータスコード {response.status_code}")
+            timeout_settings = self.config['adaptive_timeouts']
+            result = self.call_backends('generate', quality='high', data=data,
+                                        timeout=timeout_settings['fallback_timeout_sec'])
 
-            if response.status_code == 200:
-                result = response.json()
+            if result is not None:
                 if "data" in result and len(result["data"]) > 0:
                     item = result["data"][0]
 
@@ -745,7 +4085,7 @@ class TranslationThread(QThread):
 
                     elif "url" in item:
                         image_url = item["url"]
-                        img_response = requests.get(image_url, timeout=30)
+                        img_response = self.download_result(image_url, timeout_settings['download_timeout_sec'])
                         if img_response.status_code == 200:
                             self.logger.info("フォールバック画像ダウンロード成功")
 
@@ -757,11 +4097,212 @@ class TranslationThread(QThread):
 
             return None
 
+        except TranslationCancelled:
+            raise
         except Exception as e:
             self.logger.error(f"フォールバックAPI呼び出しエラー: {str(e)}", exc_info=True)
             return None
 
 
+class AtlasTranslationThread(TranslationThread):
+    """複数の小さなキャプチャを1枚のアトラスにまとめて1回のAPI呼び出しで翻訳するスレッド"""
+    atlas_finished = pyqtSignal(list)
+    atlas_failed = pyqtSignal()
+    jobs_skipped = pyqtSignal(list, str)  # テキストなしと判定してアトラスから外したジョブ
+
+    ATLAS_NOTE = (
+        "\n\n🔶 この画像は複数の独立したスクリーンショットを余白で区切って並べたものです。"
+        "各スクリーンショットは独立に翻訳し、区切りの余白や配置は変更しないでください。"
+    )
+
+    def __init__(self, jobs, layout, packer, config, history=None, router=None, workers=None, prompts=None,
+                 session=None):
+        self.jobs = jobs
+        self.layout = layout
+        self.packer = packer
+        atlas_image = packer.compose([job.image for job in jobs], layout)
+        atlas_job = TranslationJob(atlas_image, jobs[0].from_language, jobs[0].to_language,
+                                   mode='image_edit', source='atlas')
+        super().__init__(atlas_job, config, history, router, workers, prompts=prompts, session=session)
+
+    def make_thumbnails(self):
+        """各キャプチャのサムネイルを生成"""
+        if self.history is None:
+            return
+        for job in self.jobs:
+            try:
+                job.thumbnail = self.history.make_thumbnail(job.image)
+            except Exception as e:
+                self.logger.warning(f"サムネイル生成エラー: {str(e)}")
+
+    def is_text_absent(self):
+        """キャプチャごとにテキスト有無を判定し、テキストなしのジョブを外してアトラスを詰め直す
+
+        すべてのジョブがテキストなしの場合はskippedを送出してTrue。
+        """
+        prefilter = self.config['text_prefilter']
+        if not prefilter['enabled']:
+            return False
+
+        classifier = TextPresenceClassifier(prefilter['analysis_max_side'], prefilter['edge_threshold'])
+        kept, absent = [], []
+        for job in self.jobs:
+            try:
+                features = classifier.analyze(job.image, self.from_language)
+            except Exception as e:
+                self.logger.warning(f"テキスト存在推定エラー（翻訳を継続）: {str(e)}")
+                kept.append(job)
+                continue
+            self.logger.info(f"テキスト存在スコア #{job.job_id}: {features['score']:.3f} "
+                             f"(閾値 {prefilter['threshold']}, CPU {features['cpu_ms']:.1f}ms)")
+            (kept if features['score'] >= prefilter['threshold'] else absent).append(job)
+        if not absent:
+            return False
+
+        message = f"{LANGUAGE_MAP[self.from_language]['display']}のテキストが見つからないため翻訳をスキップしました"
+        self.jobs = kept
+        self.jobs_skipped.emit(absent, message)
+        if not kept:
+            self.skipped.emit(f"{message}（{len(absent)}件）")
+            return True
+
+        # 残ったジョブは元の配置の部分集合のため、1件でも必ず配置できる
+        self.layout = self.packer.pack([job.size for job in kept], min_items=1)
+        self.image = self.packer.compose([job.image for job in kept], self.layout)
+        self.job.image = self.image
+        self.job.size = self.image.size
+        self.logger.info(f"テキストなしの{len(absent)}件をアトラスから除外: 残り{len(kept)}件, "
+                         f"キャンバス {self.layout['canvas']}, 充填率 {self.layout['efficiency']:.1%}")
+        return False
+
+    def create_optimized_prompt(self, original_size, target_size, padding_info):
+        return super().create_optimized_prompt(original_size, target_size, padding_info) + self.ATLAS_NOTE
+
+    def create_masked_prompt(self, target_size, padding_info):
+        return super().create_masked_prompt(target_size, padding_info) + self.ATLAS_NOTE
+
+    def split_atlas(self, translated_atlas):
+        """翻訳済みアトラスを配置情報に従って個々の結果に分割"""
+        results = []
+        for job, (x, y, width, height) in zip(self.jobs, self.layout['placements']):
+            cropped = translated_atlas.crop((x, y, x + width, y + height))
+            if cropped.size != job.size:
+                cropped = cropped.resize(job.size, Image.LANCZOS)
+            results.append(cropped)
+        return results
+
+    def run(self):
+        """アトラスを翻訳して分割"""
+        count = len(self.jobs)
+        self.logger.info(f"アトラス翻訳開始: {count}件, キャンバス {self.layout['canvas']}, "
+                         f"充填率 {self.layout['efficiency']:.1%}")
+        self.progress.emit(f"{count}件の画像をまとめて翻訳中...")
+
+        start_time = time.perf_counter()
+        try:
+            # テキストを含まないキャプチャはアトラスから外す（すべて該当すればAPIを呼ばない）
+            if self.is_text_absent():
+                return
+            self.check_cancelled()
+            count = len(self.jobs)
+
+            self.make_thumbnails()
+            translated_atlas = self.translate_image(self.image)
+            if translated_atlas is None:
+                self.check_cancelled()
+                self.record_tier_outcome('fallback')
+                self.logger.warning("アトラス翻訳に失敗、個別翻訳に切り替え")
+                self.atlas_failed.emit()
+                return
+
+            self.record_tier_outcome('ok')
+            self.job_stats['method'] = 'edits_atlas'
+            self.job_stats['latency_ms'] = int((time.perf_counter() - start_time) * 1000)
+            self.logger.info(f"アトラス翻訳完了: {count}件を1回のAPI呼び出しで処理 "
+                             f"({self.job_stats['latency_ms']}ms, {self.job_stats['latency_ms'] / count:.0f}ms/件)")
+            results = self.split_atlas(translated_atlas)
+            for job, translated_image in zip(self.jobs, results):
+                self.encode_result(job, translated_image)
+            self.atlas_finished.emit(results)
+        except TranslationCancelled:
+            self.logger.info(f"アトラス翻訳をキャンセルしました: {count}件")
+            self.cancelled.emit()
+        except Exception as e:
+            self.logger.error(f"アトラス翻訳エラー: {str(e)}", exc_info=True)
+            self.record_tier_outcome('error')
+            self.atlas_failed.emit()
+        finally:
+            self.close_session()
+            self.image = None
+
+
+class BackgroundTask(QThread):
+    """GUIスレッドを止めないよう関数を別スレッドで実行し、結果をシグナルで返す"""
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.logger = logging.getLogger('ImageTranslator.BackgroundTask')
+
+    def run(self):
+        try:
+            self.done.emit(self.func(*self.args))
+        except Exception as e:
+            self.logger.error(f"バックグラウンド処理エラー: {str(e)}", exc_info=True)
+            self.failed.emit(str(e))
+
+
+class RegionSelector(QWidget):
+    """画面全体を半透明で覆い、ドラッグで監視領域を選択するオーバーレイ"""
+
+    selected = pyqtSignal(tuple)  # (x, y, width, height) 仮想デスクトップ座標
+
+    MIN_SIDE = 16
+
+    def __init__(self):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setCursor(Qt.CrossCursor)
+        self.setGeometry(QApplication.primaryScreen().virtualGeometry())
+        self.origin = None
+        self.current = None
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 90))
+        if self.origin is not None and self.current is not None:
+            rect = QRect(self.origin, self.current).normalized()
+            painter.fillRect(rect, QColor(255, 255, 255, 1))
+            painter.setPen(QPen(QColor(0, 170, 255), 2))
+            painter.drawRect(rect)
+        painter.end()
+
+    def mousePressEvent(self, event):
+        self.origin = self.current = event.pos()
+        self.update()
+
+    def mouseMoveEvent(self, event):
+        self.current = event.pos()
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self.origin is None:
+            return
+        rect = QRect(self.origin, event.pos()).normalized()
+        self.close()
+        if rect.width() >= self.MIN_SIDE and rect.height() >= self.MIN_SIDE:
+            top_left = self.mapToGlobal(rect.topLeft())
+            self.selected.emit((top_left.x(), top_left.y(), rect.width(), rect.height()))
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.close()
+
+
 class ResultWindow(QMainWindow):
     """翻訳結果表示ウィンドウ"""
 
@@ -823,7 +4364,8 @@ class ResultWindow(QMainWindow):
         buffered.seek(0)
 
         pixmap = QPixmap()
-        pixmap.loadFromData(buffered.read())
+        pixmap.loadFromData(buffered.getvalue())
+        buffered.close()
 
         # 動的ウィンドウサイズ調整（アスペクト比保持）
         image_width, image_height = image.size
@@ -859,6 +4401,9 @@ class ResultWindow(QMainWindow):
             Qt.SmoothTransformation
         )
 
+        # 全解像度のQPixmapは保持しない（表示用の縮小版のみ残す）
+        pixmap = None
+
         self.image_label.setPixmap(scaled_pixmap)
         self.logger.info(f"表示サイズ: {display_width}x{display_height}, ウィンドウ: {window_width}x{window_height}")
 
@@ -866,42 +4411,1435 @@ class ResultWindow(QMainWindow):
         self.raise_()
         self.activateWindow()
 
-    def update_zoom_info(self, scale_factor):
-        """ズーム情報を更新"""
-        zoom_percent = int(scale_factor * 100)
-        self.zoom_label.setText(f"ズーム: {zoom_percent}% (Ctrl+マウスホイールで拡大縮小)")
+    def update_zoom_info(self, scale_factor):
+        """ズーム情報を更新"""
+        zoom_percent = int(scale_factor * 100)
+        self.zoom_label.setText(f"ズーム: {zoom_percent}% (Ctrl+マウスホイールで拡大縮小)")
+
+    def closeEvent(self, event):
+        """ウィンドウを閉じたら表示画像を解放"""
+        self.image_label.release()
+        self.update_zoom_info(1.0)
+        super().closeEvent(event)
+
+
+class HistoryWindow(QMainWindow):
+    """翻訳履歴ブラウザ（スクロールに応じて遅延ページング）"""
+
+    def __init__(self, history, open_callback):
+        super().__init__()
+        self.logger = logging.getLogger('ImageTranslator.HistoryWindow')
+        self.history = history
+        self.open_callback = open_callback
+        self.page_size = app_config['history_settings']['page_size']
+        self.last_loaded_id = None
+        self.all_loaded = False
+        self.init_ui()
+
+    def init_ui(self):
+        """UI初期化"""
+        self.setWindowTitle("翻訳履歴")
+        self.setGeometry(120, 120, 720, 640)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.setSpacing(3)
+        central_widget.setLayout(layout)
+
+        self.summary_label = QLabel("")
+        self.summary_label.setStyleSheet("color: #333; font-size: 14px; padding: 4px;")
+        layout.addWidget(self.summary_label)
+
+        # 履歴リスト（サムネイル付き）
+        thumbnail_size = app_config['history_settings']['thumbnail_size']
+        self.list_widget = QListWidget()
+        self.list_widget.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.list_widget.setStyleSheet("font-size: 14px;")
+        self.list_widget.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.list_widget.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        layout.addWidget(self.list_widget)
+
+        close_button = QPushButton("閉じる")
+        close_button.setStyleSheet("font-size: 16px; font-weight: bold; padding: 10px 20px; min-height: 35px;")
+        close_button.clicked.connect(self.close)
+        layout.addWidget(close_button)
+
+    def reload(self):
+        """先頭から読み込み直して表示"""
+        self.list_widget.clear()
+        self.last_loaded_id = None
+        self.all_loaded = False
+        self.summary_label.setText(f"履歴件数: {self.history.count()}件（ダブルクリックで結果を表示）")
+        self.load_next_page()
+
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def load_next_page(self):
+        """次のページを読み込み"""
+        if self.all_loaded:
+            return
+
+        rows = self.history.fetch_page(before_id=self.last_loaded_id, limit=self.page_size)
+        if len(rows) < self.page_size:
+            self.all_loaded = True
+
+        for row in rows:
+            created = datetime.fromtimestamp(row['created_at']).strftime("%Y-%m-%d %H:%M:%S")
+            from_display = LANGUAGE_MAP.get(row['from_language'], {}).get('display', row['from_language'])
+            to_display = LANGUAGE_MAP.get(row['to_language'], {}).get('display', row['to_language'])
+            latency = f"{row['latency_ms'] / 1000:.1f}秒" if row['latency_ms'] is not None else "-"
+            cost = f"${row['cost_estimate']:.2f}" if row['cost_estimate'] is not None else "-"
+
+            item = QListWidgetItem(
+                f"{created}  {from_display} → {to_display}\n"
+                f"品質: {row['quality'] or '-'} / 方式: {row['method'] or '-'} / 処理時間: {latency} / 概算: {cost}"
+            )
+            tooltip = []
+            if row.get('policy_reason'):
+                tooltip.append(f"品質選択の理由: {row['policy_reason']}")
+            if row.get('backend'):
+                tooltip.append(f"バックエンド: {row['backend']}")
+            if tooltip:
+                item.setToolTip("\n".join(tooltip))
+            if row['thumbnail']:
+                pixmap = QPixmap()
+                pixmap.loadFromData(row['thumbnail'])
+                item.setIcon(QIcon(pixmap))
+            item.setData(Qt.UserRole, row['output_path'])
+            self.list_widget.addItem(item)
+
+            self.last_loaded_id = row['id']
+
+        self.logger.debug(f"履歴ページ読み込み: {len(rows)}件")
+
+    def on_scroll(self, value):
+        """末尾付近までスクロールしたら次のページを読み込み"""
+        scroll_bar = self.list_widget.verticalScrollBar()
+        if value >= scroll_bar.maximum() - 2:
+            self.load_next_page()
+
+    def on_item_double_clicked(self, item):
+        """選択した履歴の翻訳結果を表示"""
+        output_path = item.data(Qt.UserRole)
+        if output_path and Path(output_path).exists():
+            self.open_callback(output_path)
+        else:
+            QMessageBox.warning(self, "翻訳履歴", "翻訳結果ファイルが見つかりません（保持期間切れの可能性があります）")
+
+
+class SharedCacheClient:
+    """チーム共有の翻訳キャッシュサーバーのクライアント
+
+    GET/PUT /cache/<key> でPNGを取得・登録し、X-Content-SHA256ヘッダーで内容を検証する。
+    取得は短いタイムアウトで行い、失敗が続いた場合はbackoff_secの間問い合わせを止める
+    （遅い・停止したキャッシュが翻訳を遅らせないようにする）。登録はバックグラウンドで行う。
+    """
+
+    def __init__(self, settings):
+        self.base_url = settings['url'].rstrip('/')
+        self.lookup_timeout = settings['lookup_timeout_ms'] / 1000
+        self.store_timeout = settings['store_timeout_sec']
+        self.backoff = settings['backoff_sec']
+        self.auth_token = settings['auth_token']
+        self.logger = logging.getLogger('ImageTranslator.SharedCache')
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self.disabled_until = 0.0
+
+    @staticmethod
+    def make_key(image, from_language, to_language, config):
+        """画像の画素データ・言語ペア・品質関連の設定から完全一致のキーを作る"""
+        digest = hashlib.sha256(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode('ascii'))
+        digest.update(image.tobytes())
+        settings = {
+            'from': from_language,
+            'to': to_language,
+            'mode': config['api_settings']['translation_mode'],
+            'quality': config['api_settings']['quality'],
+            'input_fidelity': config['api_settings']['input_fidelity'],
+            'ultra_precision_mode': config['api_settings'].get('ultra_precision_mode', False),
+            'quality_policy': config['quality_policy']['enabled'],
+            'text_region_mask': config['text_region_mask']['enabled'],
+        }
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def headers(self):
+        return {'X-Auth-Token': self.auth_token} if self.auth_token else {}
+
+    def available(self):
+        with self._lock:
+            return time.monotonic() >= self.disabled_until
+
+    def mark_failure(self, reason):
+        with self._lock:
+            self.disabled_until = time.monotonic() + self.backoff
+        self.logger.warning(f"共有キャッシュに接続できません（{self.backoff}秒間問い合わせを停止）: {reason}")
+
+    def get(self, key):
+        """キャッシュ済みのPNGバイト列（なし・失敗時はNone）"""
+        if not self.available():
+            return None
+        lookup_start = time.perf_counter()
+        try:
+            response = self.session.get(f"{self.base_url}/cache/{key}", headers=self.headers(),
+                                        timeout=self.lookup_timeout)
+        except requests.exceptions.RequestException as e:
+            self.mark_failure(str(e))
+            return None
+
+        elapsed_ms = (time.perf_counter() - lookup_start) * 1000
+        if response.status_code == 404:
+            self.logger.info(f"共有キャッシュ: ミス {key[:12]} ({elapsed_ms:.0f}ms)")
+            return None
+        if response.status_code != 200:
+            self.mark_failure(f"ステータスコード {response.status_code}")
+            return None
+
+        body = response.content
+        if hashlib.sha256(body).hexdigest() != response.headers.get('X-Content-SHA256'):
+            self.logger.warning(f"共有キャッシュ: 内容のハッシュが一致しないため破棄 {key[:12]}")
+            return None
+        self.logger.info(f"共有キャッシュ: ヒット {key[:12]} ({len(body) / 1024:.0f}KB, {elapsed_ms:.0f}ms)")
+        return body
+
+    def put_async(self, key, png_bytes):
+        """PNGをバックグラウンドで登録"""
+        if not png_bytes or not self.available():
+            return
+        threading.Thread(target=self.put, args=(key, png_bytes), name='SharedCachePut', daemon=True).start()
+
+    def put(self, key, png_bytes):
+        headers = self.headers()
+        headers['X-Content-SHA256'] = hashlib.sha256(png_bytes).hexdigest()
+        headers['Content-Type'] = 'image/png'
+        try:
+            response = requests.put(f"{self.base_url}/cache/{key}", data=png_bytes, headers=headers,
+                                    timeout=self.store_timeout)
+            if response.status_code not in (200, 201, 204):
+                self.logger.warning(f"共有キャッシュ登録エラー: ステータスコード {response.status_code}")
+                return
+            self.logger.info(f"共有キャッシュに登録: {key[:12]} ({len(png_bytes) / 1024:.0f}KB)")
+        except requests.exceptions.RequestException as e:
+            self.mark_failure(str(e))
+
+
+class SharedCacheRequestHandler(BaseHTTPRequestHandler):
+    """共有キャッシュの参照実装サーバーのハンドラー（GET/PUT /cache/<sha256キー>）"""
+
+    protocol_version = 'HTTP/1.0'
+    KEY_PATTERN = re.compile(r'/cache/([0-9a-f]{64})')
+
+    def log_message(self, format, *args):
+        logger.debug("SharedCache: " + format % args)
+
+    def reply(self, status_code, body=b'', headers=None):
+        self.send_response(status_code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def resolve(self):
+        """認証とキーの検証を行い、保存先パスを返す（不正な場合は応答してNone）"""
+        token = self.server.auth_token
+        if token and self.headers.get('X-Auth-Token') != token:
+            self.reply(401)
+            return None
+        match = self.KEY_PATTERN.fullmatch(self.path)
+        if not match:
+            self.reply(404)
+            return None
+        key = match.group(1)
+        return self.server.directory / key[:2] / f"{key}.png"
+
+    def do_GET(self):
+        path = self.resolve()
+        if path is None:
+            return
+        if not path.exists():
+            self.reply(404)
+            return
+        body = path.read_bytes()
+        self.reply(200, body, {'Content-Type': 'image/png',
+                               'X-Content-SHA256': hashlib.sha256(body).hexdigest()})
+
+    def do_PUT(self):
+        path = self.resolve()
+        if path is None:
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > self.server.max_bytes:
+            self.reply(413)
+            return
+        body = self.rfile.read(length)
+        if hashlib.sha256(body).hexdigest() != self.headers.get('X-Content-SHA256'):
+            self.reply(400, b'content hash mismatch')
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + f".{threading.get_ident()}.tmp")
+        temp_path.write_bytes(body)
+        os.replace(temp_path, path)
+        self.reply(201)
+
+
+def serve_shared_cache(host, port, directory, auth_token='', max_mb=50):
+    """共有キャッシュの参照実装サーバーを起動（Ctrl+Cで終了）"""
+    server = ThreadingHTTPServer((host, port), SharedCacheRequestHandler)
+    server.daemon_threads = True
+    server.directory = Path(directory)
+    server.directory.mkdir(parents=True, exist_ok=True)
+    server.auth_token = auth_token
+    server.max_bytes = max_mb * 1024 * 1024
+    logger.info(f"共有キャッシュサーバー起動: http://{host}:{port} (保存先: {server.directory})")
+    print(f"共有キャッシュサーバー起動: http://{host}:{port} (保存先: {server.directory})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class PerformanceStats:
+    """処理時間・リクエスト件数・コストのリングバッファ
+
+    記録はdequeへの追加とカウンタの加算のみ（O(1)）で、パーセンタイルなどの集計は
+    snapshot()を呼んだときだけ行う。
+    """
+
+    STAGES = ('capture', 'preprocess', 'api', 'display')
+    OUTCOMES = ('ok', 'error', 'timeout', 'fallback')
+
+    def __init__(self, window_size=200):
+        self.latencies = {stage: deque(maxlen=window_size) for stage in self.STAGES}
+        self.outcomes = deque(maxlen=window_size)
+        self.quality_counts = {}
+        self.requests = 0
+        self.total_cost = 0.0
+        self.passthrough_count = 0
+        self.passthrough_saved_ms = 0.0
+        self.started_at = time.time()
+
+    def record_latency(self, stage, latency_ms):
+        self.latencies[stage].append(latency_ms)
+
+    def record_job(self, outcome, quality=None, cost=None):
+        """翻訳1回分の結果を記録"""
+        self.outcomes.append(outcome)
+        self.requests += 1
+        if quality:
+            self.quality_counts[quality] = self.quality_counts.get(quality, 0) + 1
+        if cost:
+            self.total_cost += cost
+
+    def record_passthrough(self, saved_ms=None):
+        """クリップボードのPNGをそのまま送信した件数と省略できた前処理の推定時間を記録"""
+        self.passthrough_count += 1
+        if saved_ms:
+            self.passthrough_saved_ms += saved_ms
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        if not sorted_values:
+            return None
+        return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+    def snapshot(self):
+        """直近window_size件のp50/p95と結果の比率、累計の件数・コスト"""
+        latencies = {}
+        for stage, values in self.latencies.items():
+            ordered = sorted(values)
+            latencies[stage] = {
+                'count': len(ordered),
+                'p50': self.percentile(ordered, 0.5),
+                'p95': self.percentile(ordered, 0.95),
+            }
+        outcomes = list(self.outcomes)
+        rates = {outcome: (outcomes.count(outcome) / len(outcomes) if outcomes else 0.0)
+                 for outcome in self.OUTCOMES}
+        return {
+            'latencies': latencies,
+            'rates': rates,
+            'window': len(outcomes),
+            'requests': self.requests,
+            'quality_counts': dict(self.quality_counts),
+            'total_cost': self.total_cost,
+            'passthrough_count': self.passthrough_count,
+            'passthrough_saved_ms': self.passthrough_saved_ms,
+            'uptime_sec': time.time() - self.started_at,
+        }
+
+
+class PerformanceWindow(QMainWindow):
+    """パフォーマンス表示ウィンドウ（表示中のみ定期更新）"""
+
+    STAGE_LABELS = {'capture': "取り込み", 'preprocess': "前処理", 'api': "API", 'display': "表示"}
+    OUTCOME_LABELS = {'ok': "成功", 'error': "エラー", 'timeout': "タイムアウト", 'fallback': "フォールバック"}
+
+    def __init__(self, stats, refresh_interval_ms=1000):
+        super().__init__()
+        self.stats = stats
+        self.refresh_timer = QTimer()
+        self.refresh_timer.setInterval(refresh_interval_ms)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.init_ui()
+
+    def init_ui(self):
+        """UI初期化"""
+        self.setWindowTitle("パフォーマンス")
+        self.setGeometry(140, 140, 460, 420)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.setSpacing(3)
+        central_widget.setLayout(layout)
+
+        self.stats_label = QLabel("")
+        self.stats_label.setStyleSheet("color: #333; font-family: Consolas, monospace; font-size: 13px; padding: 6px;")
+        self.stats_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.stats_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.stats_label)
+
+        close_button = QPushButton("閉じる")
+        close_button.setStyleSheet("font-size: 16px; font-weight: bold; padding: 10px 20px; min-height: 35px;")
+        close_button.clicked.connect(self.close)
+        layout.addWidget(close_button)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def refresh(self):
+        """最新の統計を表示"""
+        snapshot = self.stats.snapshot()
+
+        def format_ms(value):
+            return f"{value:>8.0f}ms" if value is not None else f"{'-':>10}"
+
+        lines = [f"【処理時間】（直近{self.stats.latencies['api'].maxlen}件）",
+                 f"{'':<8}{'p50':>10}{'p95':>10}{'件数':>6}"]
+        for stage, label in self.STAGE_LABELS.items():
+            latency = snapshot['latencies'][stage]
+            lines.append(f"{label:<8}{format_ms(latency['p50'])}{format_ms(latency['p95'])}{latency['count']:>6}")
+
+        lines.append("")
+        lines.append(f"【結果の比率】（直近{snapshot['window']}件）")
+        lines.append(" / ".join(f"{label} {snapshot['rates'][outcome]:.0%}"
+                                for outcome, label in self.OUTCOME_LABELS.items()))
+
+        lines.append("")
+        lines.append(f"【リクエスト】累計 {snapshot['requests']}件")
+        for quality, count in sorted(snapshot['quality_counts'].items()):
+            lines.append(f"  {quality}: {count}件")
+        lines.append(f"PNGをそのまま送信: {snapshot['passthrough_count']}件"
+                     f"（前処理の削減 推定 {snapshot['passthrough_saved_ms'] / 1000:.1f}秒）")
+
+        memory_mb = get_process_memory_mb()
+        uptime_min = snapshot['uptime_sec'] / 60
+        lines.append("")
+        lines.append(f"概算コスト: ${snapshot['total_cost']:.2f}（起動から{uptime_min:.0f}分）")
+        lines.append(f"メモリ使用量: {memory_mb:.0f}MB" if memory_mb is not None else "メモリ使用量: -")
+        self.stats_label.setText("\n".join(lines))
+
+
+class EventLoopLagProbe:
+    """GUIイベントループの遅延を計測するプローブ
+
+    一定間隔のQTimerが予定よりどれだけ遅れて発火したかを記録し、翻訳処理中（busy）と
+    待機中に分けてp50/p95/最大値を定期的にログ出力する。
+    """
+
+    def __init__(self, interval_ms, report_interval_sec, busy=None):
+        self.interval = interval_ms / 1000
+        self.report_interval = report_interval_sec
+        self.busy = busy or (lambda: False)
+        self.logger = logging.getLogger('ImageTranslator.LagProbe')
+        self.samples = {True: deque(maxlen=4096), False: deque(maxlen=4096)}
+        self.last_tick = time.perf_counter()
+        self.last_report = time.monotonic()
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        if interval_ms > 0:
+            self.timer.start(interval_ms)
+
+    def tick(self):
+        """タイマー発火の遅れ(ms)を記録して返す"""
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self.last_tick - self.interval) * 1000)
+        self.last_tick = now
+        self.samples[self.busy()].append(lag_ms)
+
+        if self.report_interval > 0 and time.monotonic() - self.last_report >= self.report_interval:
+            self.report()
+        return lag_ms
+
+    @staticmethod
+    def summarize(samples):
+        """(件数, p50, p95, 最大) をmsで返す"""
+        ordered = sorted(samples)
+        if not ordered:
+            return 0, 0.0, 0.0, 0.0
+        def quantile(q):
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return len(ordered), quantile(0.5), quantile(0.95), ordered[-1]
+
+    def report(self):
+        """計測結果をログ出力してリセット"""
+        self.last_report = time.monotonic()
+        for busy, label in ((True, "翻訳処理中"), (False, "待機中")):
+            count, p50, p95, worst = self.summarize(self.samples[busy])
+            if count:
+                self.logger.info(f"イベントループ遅延（{label}）: {count}回 p50={p50:.1f}ms "
+                                 f"p95={p95:.1f}ms 最大={worst:.1f}ms")
+            self.samples[busy].clear()
+
+
+class ResponsivenessWatchdog(EventLoopLagProbe):
+    """GUIスレッドの停止（ジャンク）を検出してスタックを記録するウォッチドッグ
+
+    GUIスレッドはタイマー発火ごとにハートビートを更新し、監視スレッドはハートビートが
+    stall_threshold_ms以上途絶えたらGUIスレッドのPythonスタックを取得する。タイマーの遅れの
+    ヒストグラムと停止時間の長いスタック上位をレポートファイル（JSON）に書き出す。
+    """
+
+    # 遅れのヒストグラムの上限値(ms)
+    HISTOGRAM_BOUNDS = [16, 33, 50, 100, 200, 500, 1000, 2000, 5000]
+
+    def __init__(self, interval_ms, report_interval_sec, settings, report_path, busy=None):
+        super().__init__(interval_ms, report_interval_sec, busy)
+        self.stall_threshold = settings['stall_threshold_ms'] / 1000
+        self.stack_depth = settings['stack_depth']
+        self.top_stacks = settings['top_stacks']
+        self.report_path = Path(report_path)
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.gui_thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+        self.heartbeat = time.monotonic()
+        self.captured_stack = None  # 現在の停止中に取得したスタック
+        self.histogram = [0] * (len(self.HISTOGRAM_BOUNDS) + 1)
+        self.stalls = {}  # スタック → {count, total_ms, max_ms}
+        self.started_at = time.time()
+
+        self._stop = threading.Event()
+        self.watcher = threading.Thread(target=self.watch, args=(settings['report_write_interval_sec'],),
+                                        name='ResponsivenessWatchdog', daemon=True)
+        self.watcher.start()
+
+    def tick(self):
+        lag_ms = super().tick()
+        bucket = next((i for i, bound in enumerate(self.HISTOGRAM_BOUNDS) if lag_ms < bound),
+                      len(self.HISTOGRAM_BOUNDS))
+        with self._lock:
+            self.histogram[bucket] += 1
+            self.heartbeat = time.monotonic()
+            stack, self.captured_stack = self.captured_stack, None
+            if lag_ms >= self.stall_threshold * 1000:
+                key = stack or "(スタック未取得: 監視スレッドが実行されませんでした)"
+                entry = self.stalls.setdefault(key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                entry['count'] += 1
+                entry['total_ms'] += lag_ms
+                entry['max_ms'] = max(entry['max_ms'], lag_ms)
+        if lag_ms >= self.stall_threshold * 1000:
+            self.logger.warning(f"GUIスレッド停止: {lag_ms:.0f}ms")
+        return lag_ms
+
+    def watch(self, write_interval_sec):
+        """監視スレッド: ハートビートの途絶を検出してGUIスレッドのスタックを取得"""
+        check_interval = min(0.05, self.stall_threshold / 2)
+        last_write = time.monotonic()
+        while not self._stop.wait(check_interval):
+            now = time.monotonic()
+            with self._lock:
+                stalled = now - self.heartbeat - self.interval >= self.stall_threshold
+                need_stack = stalled and self.captured_stack is None
+            if need_stack:
+                frame = sys._current_frames().get(self.gui_thread_id)
+                if frame is not None:
+                    stack = "".join(traceback.format_list(traceback.extract_stack(frame, limit=self.stack_depth)))
+                    with self._lock:
+                        self.captured_stack = stack
+            if now - last_write >= write_interval_sec:
+                last_write = now
+                self.write_report()
+
+    def build_report(self):
+        with self._lock:
+            labels = [f"<{bound}ms" for bound in self.HISTOGRAM_BOUNDS] + [f">={self.HISTOGRAM_BOUNDS[-1]}ms"]
+            top = sorted(self.stalls.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+            return {
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                'timer_interval_ms': self.interval * 1000,
+                'stall_threshold_ms': self.stall_threshold * 1000,
+                'drift_histogram': dict(zip(labels, self.histogram)),
+                'stall_count': sum(entry['count'] for entry in self.stalls.values()),
+                'top_stacks': [
+                    {'count': entry['count'], 'total_ms': round(entry['total_ms'], 1),
+                     'max_ms': round(entry['max_ms'], 1), 'stack': stack.splitlines()}
+                    for stack, entry in top[:self.top_stacks]
+                ],
+            }
+
+    def write_report(self):
+        """レポートファイルを書き出し（一時ファイル経由で置き換え）"""
+        try:
+            temp_path = self.report_path.with_suffix('.tmp')
+            temp_path.write_text(json.dumps(self.build_report(), ensure_ascii=False, indent=2), encoding='utf-8')
+            os.replace(temp_path, self.report_path)
+        except Exception as e:
+            self.logger.warning(f"応答性レポート書き出しエラー: {str(e)}")
+
+    def stop(self):
+        self._stop.set()
+        self.timer.stop()
+        self.write_report()
+
+
+class IpcJobBoard:
+    """IPC経由のジョブの状態・イベント・結果を保持（HTTPスレッドとGUIスレッドで共有）"""
+
+    TERMINAL_STATES = ('done', 'skipped', 'error', 'cancelled')
+
+    def __init__(self, result_ttl_sec=600):
+        self.result_ttl = result_ttl_sec
+        self._condition = threading.Condition()
+        self.jobs = {}
+
+    def create(self, job_id):
+        """ジョブを登録"""
+        with self._condition:
+            self._prune()
+            self.jobs[job_id] = {
+                'status': 'queued',
+                'events': [],
+                'result': None,
+                'result_png': None,
+                'updated_at': time.time(),
+            }
+            self._append(job_id, 'queued', None)
+
+    def publish(self, job_id, status, message=None, result=None):
+        """状態を更新して待機中のクライアントに通知（GUIスレッドから呼び出し）"""
+        with self._condition:
+            entry = self.jobs.get(job_id)
+            if entry is None or entry['status'] in self.TERMINAL_STATES:
+                return
+            entry['status'] = status
+            entry['updated_at'] = time.time()
+            if result is not None:
+                entry['result'] = result
+            self._append(job_id, status, message)
+            self._condition.notify_all()
+
+    def _append(self, job_id, status, message):
+        event = {'job_id': job_id, 'status': status, 'time': time.time()}
+        if message:
+            event['message'] = message
+        self.jobs[job_id]['events'].append(event)
+
+    def _prune(self):
+        """保持期間を過ぎた完了ジョブを破棄"""
+        limit = time.time() - self.result_ttl
+        expired = [job_id for job_id, entry in self.jobs.items()
+                   if entry['status'] in self.TERMINAL_STATES and entry['updated_at'] < limit]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def status(self, job_id):
+        """現在の状態（存在しなければNone）"""
+        with self._condition:
+            entry = self.jobs.get(job_id)
+            if entry is None:
+                return None
+            return {'job_id': job_id, 'status': entry['status'], 'events': len(entry['events'])}
+
+    def wait_events(self, job_id, start, timeout):
+        """start番目以降のイベントを待って返す（(events, 完了したか)、存在しなければNone）"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                entry = self.jobs.get(job_id)
+                if entry is None:
+                    return None
+                events = entry['events'][start:]
+                finished = entry['status'] in self.TERMINAL_STATES
+                remaining = deadline - time.monotonic()
+                if events or finished or remaining <= 0:
+                    return events, finished
+                self._condition.wait(remaining)
+
+    def wait_result(self, job_id, timeout):
+        """完了を待って(状態, PNGバイト列)を返す（存在しなければNone）"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                entry = self.jobs.get(job_id)
+                if entry is None:
+                    return None
+                remaining = deadline - time.monotonic()
+                if entry['status'] in self.TERMINAL_STATES or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            status, result, png = entry['status'], entry['result'], entry['result_png']
+
+        # PNGエンコードはロック外・HTTPスレッドで行い、1回だけ実施
+        if status == 'done' and png is None and result is not None:
+            buffer = BytesIO()
+            result.save(buffer, format="PNG")
+            png = buffer.getvalue()
+            with self._condition:
+                entry['result_png'] = png
+                entry['result'] = None
+        return status, png
+
+
+class IpcRequestHandler(BaseHTTPRequestHandler):
+    """IPCサーバーのHTTPハンドラー（接続ごとのスレッドで実行され、GUIスレッドを止めない）
+
+    POST /jobs?from=&to=           画像を投入してジョブIDを返す
+    POST /translate?from=&to=      画像を投入し、完了まで待って翻訳結果のPNGを返す
+    GET  /jobs/<id>                状態
+    GET  /jobs/<id>/events         状態の変化をNDJSONで逐次送信（完了で終了）
+    GET  /jobs/<id>/result?wait=秒 翻訳結果のPNG
+    """
+
+    protocol_version = 'HTTP/1.0'
+
+    def log_message(self, format, *args):
+        self.server.owner.logger.debug("IPC: " + format % args)
+
+    def send_json(self, status_code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorize(self):
+        token = self.server.owner.settings['auth_token']
+        if token and self.headers.get('X-Auth-Token') != token:
+            self.send_json(401, {'error': 'unauthorized'})
+            return False
+        return True
+
+    def do_POST(self):
+        if not self.authorize():
+            return
+        url = urlparse(self.path)
+        if url.path not in ('/jobs', '/translate'):
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        owner = self.server.owner
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > owner.settings['max_request_mb'] * 1024 * 1024:
+            self.send_json(413 if length > 0 else 400, {'error': 'image body required (size limit exceeded or empty)'})
+            return
+
+        query = parse_qs(url.query)
+        from_language = query.get('from', [owner.app.from_language])[0]
+        to_language = query.get('to', [owner.app.to_language])[0]
+        if from_language not in LANGUAGE_MAP or to_language not in LANGUAGE_MAP:
+            self.send_json(400, {'error': f"unknown language (available: {', '.join(LANGUAGE_MAP)})"})
+            return
+
+        try:
+            job_id = owner.submit(self.rfile.read(length), from_language, to_language)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+
+        if url.path == '/jobs':
+            self.send_json(202, {'job_id': job_id, 'status': 'queued'})
+        else:
+            self.send_result(job_id, owner.settings['sync_timeout_sec'])
+
+    def do_GET(self):
+        if not self.authorize():
+            return
+        url = urlparse(self.path)
+        match = re.fullmatch(r'/jobs/(\d+)(/events|/result)?', url.path)
+        if not match:
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        job_id = int(match.group(1))
+        board = self.server.owner.board
+        if match.group(2) == '/events':
+            self.stream_events(job_id)
+        elif match.group(2) == '/result':
+            wait = self.parse_wait(parse_qs(url.query).get('wait', ['0'])[0])
+            if wait is None:
+                self.send_json(400, {'error': 'wait must be a number of seconds'})
+                return
+            self.send_result(job_id, wait)
+        else:
+            status = board.status(job_id)
+            if status is None:
+                self.send_json(404, {'error': 'unknown job'})
+            else:
+                self.send_json(200, status)
+
+    def parse_wait(self, value):
+        """wait（秒）を0〜sync_timeout_secに丸めて返す（数値でない・NaNの場合はNone）"""
+        try:
+            wait = float(value)
+        except ValueError:
+            return None
+        if math.isnan(wait):
+            return None
+        return min(max(wait, 0.0), self.server.owner.settings['sync_timeout_sec'])
+
+    def stream_events(self, job_id):
+        """イベントを1行1JSONで逐次送信（接続終了で区切る）"""
+        board = self.server.owner.board
+        sent = 0
+        headers_sent = False
+        while True:
+            waited = board.wait_events(job_id, sent, timeout=15)
+            if waited is None:
+                if not headers_sent:
+                    self.send_json(404, {'error': 'unknown job'})
+                return
+            if not headers_sent:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                headers_sent = True
+            events, finished = waited
+            for event in events:
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8'))
+            self.wfile.flush()
+            sent += len(events)
+            if finished and not events:
+                return
+
+    def send_result(self, job_id, timeout):
+        waited = self.server.owner.board.wait_result(job_id, timeout)
+        if waited is None:
+            self.send_json(404, {'error': 'unknown job'})
+            return
+        status, png = waited
+        if status != 'done':
+            code = 202 if status not in IpcJobBoard.TERMINAL_STATES else 422
+            self.send_json(code, {'job_id': job_id, 'status': status})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(png)))
+        self.send_header('X-Job-Id', str(job_id))
+        self.end_headers()
+        self.wfile.write(png)
+
+
+class IpcServer(QObject):
+    """ローカルHTTPで画像翻訳を受け付けるIPCサーバー
+
+    受信・デコード・待機は接続ごとのスレッドで行い、ジョブの登録だけをシグナルで
+    GUIスレッドに渡す。ジョブはクリップボードと同じキュー・履歴キャッシュ・バックエンドを使う。
+    """
+    submitted = pyqtSignal(object)
+
+    def __init__(self, app, settings):
+        super().__init__()
+        self.app = app
+        self.settings = settings
+        self.logger = logging.getLogger('ImageTranslator.IPC')
+        self.board = IpcJobBoard(settings['result_ttl_sec'])
+        self.httpd = None
+        # HTTPスレッドからのemitはキュー接続でGUIスレッドに届く
+        self.submitted.connect(app.on_ipc_submitted)
+
+    def start(self):
+        """待ち受けを開始"""
+        host, port = self.settings['host'], self.settings['port']
+        if host not in ('127.0.0.1', 'localhost', '::1'):
+            self.logger.warning(f"IPCサーバーをループバック以外で公開しています: {host}")
+        self.httpd = ThreadingHTTPServer((host, port), IpcRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        threading.Thread(target=self.httpd.serve_forever, name='IpcServer', daemon=True).start()
+        self.logger.info(f"IPCサーバー起動: http://{host}:{port}")
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def submit(self, image_bytes, from_language, to_language):
+        """画像をデコードしてジョブを登録（HTTPスレッドから呼び出し）、ジョブIDを返す"""
+        qimage = QImage.fromData(image_bytes)
+        if qimage.isNull():
+            raise ValueError("image could not be decoded")
+        # 履歴照合用の厳密なハッシュはGUIスレッドを止めないようHTTPスレッドで計算
+        image_hash = compute_source_digest(qimage_to_pil(qimage))
+
+        job_id = next(TranslationJob._ids)
+        self.board.create(job_id)
+        self.logger.info(f"IPCジョブ受付: #{job_id} {qimage.width()}x{qimage.height()} "
+                         f"{from_language} → {to_language}")
+        self.submitted.emit({
+            'job_id': job_id,
+            'qimage': qimage,
+            'image_hash': image_hash,
+            'from_language': from_language,
+            'to_language': to_language,
+        })
+        return job_id
+
+
+class ImageTranslatorApp(QWidget):
+    """メインアプリケーション"""
+
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger('ImageTranslator.Main')
+        self.clipboard = QApplication.clipboard()
+        self.last_image = None
+        self.last_image_hash = None
+        self.own_clipboard_hashes = deque(maxlen=16)  # 自分がクリップボードに書き込んだ翻訳結果
+        self.result_window = ResultWindow()
+        self.config = app_config
+
+        # 翻訳ジョブキュー（待機中のジョブと実行中のスレッド）
+        self.pending_jobs = []
+        self.pending_frame_jobs = []  # 複数フレーム画像の代表フレーム（専用の同時実行数で実行し、アトラスには含めない）
+        self.active_threads = []
+        self.cancelling_threads = []  # キャンセル要求済みで終了待ちのスレッド（同時実行数に含めない）
+        self.exiting_threads = []  # 結果を受け取り済みでrun()の終了処理中のスレッド（終了後に破棄）
+        self.background_tasks = []  # フレーム読み込み・保存などのバックグラウンド処理
+        self.capture_digest_queue = deque()  # 厳密なハッシュの計算待ちのキャプチャ（取り込み順に処理）
+        packing = self.config['atlas_packing']
+        self.atlas_packer = AtlasPacker(packing['gutter_px'], packing['max_item_side'], packing['max_items'])
+
+        # リサイズ・PNGエンコード用のプロセスプール（全スレッドで共有）
+        pool_settings = self.config['process_pool']
+        self.image_workers = ImageWorkerPool(pool_settings['enabled'], pool_settings['max_workers'],
+                                             pool_settings['min_pixels'])
+        QTimer.singleShot(3000, self.image_workers.warm_up)
+
+        # イベントループの遅延計測（重い処理中もUIが応答しているかを記録）
+        # ウォッチドッグ有効時はGUIスレッド停止時のスタック取得とレポート出力も行う
+        watchdog_settings = self.config['responsiveness_watchdog']
+        if watchdog_settings['enabled']:
+            self.lag_probe = ResponsivenessWatchdog(
+                pool_settings['lag_probe_interval_ms'] or 50,
+                pool_settings['lag_report_interval_sec'],
+                watchdog_settings,
+                Path(__file__).parent.parent / watchdog_settings['report_file'],
+                busy=lambda: bool(self.active_threads)
+            )
+        else:
+            self.lag_probe = EventLoopLagProbe(pool_settings['lag_probe_interval_ms'],
+                                               pool_settings['lag_report_interval_sec'],
+                                               busy=lambda: bool(self.active_threads))
+
+        # チーム共有の翻訳キャッシュ
+        cache_settings = self.config['shared_cache']
+        self.shared_cache = SharedCacheClient(cache_settings) if cache_settings['enabled'] else None
+
+        # プロンプトテンプレート（組み立て結果を全スレッドで共有）
+        self.prompt_library = PromptTemplateLibrary.from_config(self.config)
+
+        # 翻訳バックエンドのルーター（全スレッドで共有して応答時間・エラー率を集計）
+        self.backend_router = BackendRouter.from_config(self.config)
+
+        # HTTPセッション（クリップボード・IPC・フレームの全翻訳スレッドで接続プールを共有）
+        self.http_session = create_http_session(self.config['job_settings']['max_concurrent_jobs']
+                                                + self.config['multi_frame']['max_concurrent_frames'])
+        self.init_backend_health_checks()
+
+        # 適応タイムアウトの応答時間スケッチを定期保存
+        self.timeout_save_timer = QTimer()
+        self.timeout_save_timer.timeout.connect(self.backend_router.timeouts.save)
+        self.timeout_save_timer.start(5 * 60 * 1000)
+
+        # 翻訳履歴ストア
+        self.history = None
+        self.history_window = None
+        self.init_history()
+
+        # パフォーマンス統計（トレイメニューのウィンドウで表示）
+        self.perf_stats = PerformanceStats(self.config['performance_stats']['window_size'])
+        self.performance_window = None
+
+        # 翻訳画像のコンテンツアドレス型ストア
+        self.output_store = None
+        self.init_output_store()
+
+        # 再起動・ネットワーク断をまたいで翻訳待ちジョブを保持する永続キュー
+        self.durable_store = None
+        self.durable_backlog = []  # ディスク上にあり、まだ画像を読み込んでいないジョブのレコード
+        self.durable_retry_timer = QTimer()
+        self.durable_retry_timer.setSingleShot(True)
+        self.durable_retry_timer.timeout.connect(self.dispatch_jobs)
+        self.init_durable_queue()
+
+        # メモリ使用量の定期記録
+        self.init_memory_monitor()
+
+        # 自動翻訳機能の状態（デフォルトOFF）
+        self.auto_translation_enabled = False
+
+        # 翻訳言語設定の初期化
+        self.from_language = self.config.get('translation_settings', {}).get('from_language', 'japanese')
+        self.to_language = self.config.get('translation_settings', {}).get('to_language', 'english')
+
+        # 画面領域の監視（キャプチャ間隔は変化の有無で調整するためシングルショットで再設定）
+        # トレイメニューが監視状態を参照するため、トレイより先に初期化する
+        self.region_watcher = None
+        self.region_selector = None
+        self.watch_timer = QTimer()
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.timeout.connect(self.poll_region_watcher)
+
+        # システムトレイ初期化
+        self.init_system_tray()
+
+        # 外部ツールからの翻訳要求を受け付けるIPCサーバー
+        self.ipc_server = None
+        self.init_ipc_server()
+
+        # クリップボードの連続更新をまとめるデバウンサー
+        debounce = self.config['clipboard_debounce']
+        self.clipboard_debouncer = ClipboardDebouncer(debounce['settle_ms'], debounce['max_wait_ms'])
+        self.debounce_timer = QTimer()
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self.flush_clipboard_debounce)
+
+        # クリップボード監視タイマー
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.check_clipboard)
+        check_interval = app_config['ui_settings']['clipboard_check_interval']
+        self.timer.start(check_interval)
+
+        self.logger.info("画像翻訳ツール起動 - クリップボード監視開始")
+
+    def init_history(self):
+        """翻訳履歴ストアと保持ポリシーの定期実行を初期化"""
+        history_settings = self.config['history_settings']
+        if not history_settings['enabled']:
+            return
+
+        try:
+            project_root = Path(__file__).parent.parent
+            self.history = TranslationHistory(
+                project_root / history_settings['database_file'],
+                thumbnail_size=history_settings['thumbnail_size']
+            )
+        except Exception as e:
+            self.logger.error(f"翻訳履歴DB初期化エラー: {str(e)}", exc_info=True)
+            self.history = None
+            return
+
+        # 古い履歴・出力ファイルの整理をバックグラウンドで定期実行
+        self.history_compaction_timer = QTimer()
+        self.history_compaction_timer.timeout.connect(self.compact_history)
+        self.history_compaction_timer.start(history_settings['compaction_interval_minutes'] * 60 * 1000)
+        QTimer.singleShot(10000, self.compact_history)
+
+    def init_output_store(self):
+        """出力ストアと参照されなくなったblobのGCの定期実行を初期化"""
+        store_settings = self.config['output_store']
+        if not store_settings['enabled']:
+            return
+
+        try:
+            images_dir = Path(__file__).parent.parent / self.config['output_settings']['save_directory']
+            self.output_store = ContentStore(images_dir, store_settings['format'],
+                                             store_settings['gc_grace_minutes'] * 60)
+        except Exception as e:
+            self.logger.error(f"出力ストア初期化エラー: {str(e)}", exc_info=True)
+            return
+        if self.history is not None:
+            self.history.output_store = self.output_store
+
+        self.store_gc_timer = QTimer()
+        self.store_gc_timer.timeout.connect(self.collect_store_garbage)
+        self.store_gc_timer.start(store_settings['gc_interval_minutes'] * 60 * 1000)
+        QTimer.singleShot(30000, self.collect_store_garbage)
+
+    def collect_store_garbage(self):
+        """出力ストアのGCをバックグラウンドスレッドで実行"""
+        store = self.output_store
+        if store is None:
+            return
+        history = self.history
+
+        def run_gc():
+            try:
+                referenced = history.output_paths_under(store.directory) if history is not None else ()
+                store.collect_garbage(referenced)
+                usage = store.usage()
+                self.logger.info(f"出力ストア: blob {usage['blobs']}件 {usage['blob_bytes'] / (1024 * 1024):.1f}MB, "
+                                 f"ファイル名 {usage['names']}件, 削減 {usage['saved_bytes'] / (1024 * 1024):.1f}MB")
+            except Exception as e:
+                self.logger.error(f"出力ストアGCエラー: {str(e)}", exc_info=True)
+
+        threading.Thread(target=run_gc, name='OutputStoreGC', daemon=True).start()
+
+    def init_durable_queue(self):
+        """永続ジョブキューを初期化し、前回の未完了ジョブの再開と定期整理を予約"""
+        queue_settings = self.config['durable_queue']
+        if not queue_settings['enabled']:
+            return
+
+        try:
+            project_root = Path(__file__).parent.parent
+            self.durable_store = DurableJobStore(project_root / queue_settings['database_file'],
+                                                 project_root / queue_settings['image_directory'])
+        except Exception as e:
+            self.logger.error(f"ジョブキューDB初期化エラー: {str(e)}", exc_info=True)
+            self.durable_store = None
+            return
+
+        self.durable_compaction_timer = QTimer()
+        self.durable_compaction_timer.timeout.connect(self.compact_durable_queue)
+        self.durable_compaction_timer.start(queue_settings['compaction_interval_minutes'] * 60 * 1000)
+        # トレイ・ウィンドウの初期化が終わってから再開
+        QTimer.singleShot(queue_settings['resume_delay_ms'], self.resume_durable_jobs)
+
+    def compact_durable_queue(self):
+        """完了済みジョブの行と画像を削除（書き込みスレッドで実行）"""
+        if self.durable_store is not None:
+            self.durable_store.compact(self.config['durable_queue']['failed_retention_days'])
+
+    def resume_durable_jobs(self):
+        """前回終了時に未完了だったジョブを再開"""
+        if self.durable_store is None:
+            return
+        try:
+            records = self.durable_store.resume()
+        except Exception as e:
+            self.logger.error(f"未完了ジョブの読み出しエラー: {str(e)}", exc_info=True)
+            return
+        self.compact_durable_queue()
+        if not records:
+            return
+
+        # 再起動時はバックオフを待たずにすぐ再試行
+        for record in records:
+            record['next_attempt_at'] = 0.0
+        self.durable_backlog.extend(records)
+        self.logger.info(f"未完了ジョブを再開: {len(records)}件")
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"前回の未完了の翻訳 {len(records)}件を再開します",
+                QSystemTrayIcon.Information,
+                app_config['ui_settings']['notification_duration']
+            )
+        self.dispatch_jobs()
+
+    def refill_from_durable_backlog(self):
+        """再試行時刻になった永続ジョブの画像をディスクから読み込んで待機キューに戻す
+
+        数百件たまっていても画像を読み込むのは max_loaded_jobs 件までにとどめる。
+        """
+        if not self.durable_backlog:
+            return
+        loaded = sum(1 for job in self.pending_jobs if job.durable is not None)
+        capacity = self.config['durable_queue']['max_loaded_jobs'] - loaded
+        now = time.time()
+        remaining = []
+        for record in self.durable_backlog:
+            if capacity > 0 and record['next_attempt_at'] <= now:
+                job = self.load_durable_job(record)
+                if job is not None:
+                    self.pending_jobs.append(job)
+                    capacity -= 1
+            else:
+                remaining.append(record)
+        self.durable_backlog = remaining
+        self.schedule_durable_retry()
+
+    def load_durable_job(self, record):
+        """永続キューのレコードから翻訳ジョブを復元（画像を読めない場合は失敗として記録）"""
+        try:
+            data = Path(record['image_path']).read_bytes()
+            native_png = data if self.png_passthrough_enabled() and passthrough_png_size(data) else None
+            image = None
+            if native_png is None:
+                image = Image.open(BytesIO(data))
+                image.load()
+        except Exception as e:
+            self.logger.error(f"ジョブ {record['id']} のソース画像を読み込めません: {str(e)}")
+            self.durable_store.update(record, 'failed', f"ソース画像を読み込めません: {str(e)}")
+            return None
+        job = TranslationJob(image, record['from_language'], record['to_language'],
+                             source_hash=record['source_hash'], mode=record['mode'], source=record['source'],
+                             native_png=native_png)
+        job.durable = record
+        return job
+
+    def schedule_durable_retry(self):
+        """次に再試行時刻を迎える永続ジョブに合わせてタイマーを設定"""
+        waiting = [record['next_attempt_at'] for record in self.durable_backlog]
+        if not waiting:
+            self.durable_retry_timer.stop()
+            return
+        delay_ms = max(0, int((min(waiting) - time.time()) * 1000))
+        self.durable_retry_timer.start(max(delay_ms, 100))
+
+    def retry_durable_job(self, job, stats, error_message):
+        """通信エラーで失敗した永続ジョブを指数バックオフ後に再試行（再試行する場合True）"""
+        record = job.durable
+        if record is None or self.durable_store is None:
+            return False
+        queue_settings = self.config['durable_queue']
+        if not stats['network_errors'] or record['attempts'] >= queue_settings['max_retries']:
+            self.durable_store.update(record, 'failed', error_message)
+            return False
+
+        record['attempts'] += 1
+        delay = min(queue_settings['retry_base_sec'] * 2 ** (record['attempts'] - 1), queue_settings['retry_max_sec'])
+        delay *= random.uniform(0.8, 1.2)
+        record['next_attempt_at'] = time.time() + delay
+        self.durable_store.update(record, 'retry', error_message)
+        job.durable = None
+        self.durable_backlog.append(record)
+        self.schedule_durable_retry()
+
+        self.logger.warning(f"通信エラーのため {delay:.0f}秒後に再試行: #{job.job_id} "
+                            f"({record['attempts']}/{queue_settings['max_retries']}回目)")
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"APIに接続できないため{delay:.0f}秒後に再試行します（{record['attempts']}回目）",
+                QSystemTrayIcon.Warning,
+                app_config['ui_settings']['notification_duration']
+            )
+        return True
 
+    def expedite_durable_retries(self):
+        """APIへの接続が回復したら、バックオフ中のジョブを待たずに再試行"""
+        now = time.time()
+        waiting = [record for record in self.durable_backlog if record['next_attempt_at'] > now]
+        if not waiting:
+            return
+        for record in waiting:
+            record['next_attempt_at'] = now
+        self.logger.info(f"接続回復: 再試行待ちのジョブ {len(waiting)}件を再開")
+        QTimer.singleShot(0, self.dispatch_jobs)
+
+    def settle_durable_jobs(self, jobs, status, error=None):
+        """永続ジョブの完了・取り消しを記録"""
+        if self.durable_store is None:
+            return
+        for job in jobs:
+            if job.durable is not None:
+                self.durable_store.update(job.durable, status, error)
+                job.durable = None
+
+    def init_memory_monitor(self):
+        """メモリ使用量（RSS・tracemalloc）の定期ログ出力を初期化"""
+        memory_settings = self.config['memory_settings']
+        if memory_settings['tracemalloc_enabled']:
+            import tracemalloc
+            tracemalloc.start()
+
+        self.baseline_memory_mb = get_process_memory_mb()
+        interval_sec = memory_settings['memory_log_interval_sec']
+        if interval_sec and interval_sec > 0:
+            self.memory_log_timer = QTimer()
+            self.memory_log_timer.timeout.connect(self.log_memory_usage)
+            self.memory_log_timer.start(interval_sec * 1000)
+
+    def log_memory_usage(self):
+        """現在のメモリ使用量を起動時との差分付きでログ出力"""
+        rss_mb = get_process_memory_mb()
+        message = "メモリ使用量: RSS=不明"
+        if rss_mb is not None:
+            message = f"メモリ使用量: RSS={rss_mb:.1f}MB"
+            if self.baseline_memory_mb is not None:
+                message += f" (起動時から{rss_mb - self.baseline_memory_mb:+.1f}MB)"
+
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            message += f", tracemalloc: 現在={current / (1024 * 1024):.1f}MB, ピーク={peak / (1024 * 1024):.1f}MB"
+
+        self.logger.info(message)
+
+    def release_translation_thread(self, thread, keep_job_images=False):
+        """完了した翻訳スレッドを破棄し（QThreadとソース画像をリークさせない）、次のジョブを開始"""
+        if thread in self.active_threads:
+            self.active_threads.remove(thread)
+        elif thread in self.cancelling_threads:
+            self.cancelling_threads.remove(thread)
+        else:
+            return
 
-class ImageTranslatorApp(QWidget):
-    """メインアプリケーション"""
+        thread.image = None
+        thread.job.release()
+        if not keep_job_images:
+            for job in getattr(thread, 'jobs', []):
+                job.release()
+
+        # 結果のシグナル送出直後はrun()の終了処理中のため、GUIスレッドで待たずに
+        # QThread.finished（スレッドの実際の終了）を受けてから破棄する
+        self.exiting_threads.append(thread)
+        thread.finished.connect(lambda: self.on_thread_exited(thread))
+        if thread.isFinished():
+            self.on_thread_exited(thread)
+
+        # シグナル処理が終わってから次のジョブを開始
+        QTimer.singleShot(0, self.dispatch_jobs)
+
+    def on_thread_exited(self, thread):
+        """終了したスレッドを破棄（QThread.finishedと終了済みの確認の両方から呼ばれる）"""
+        if thread in self.exiting_threads:
+            self.exiting_threads.remove(thread)
+            thread.deleteLater()
+
+    def init_ipc_server(self):
+        """IPCサーバーを起動"""
+        ipc_settings = self.config['ipc_server']
+        if not ipc_settings['enabled']:
+            return
+        try:
+            self.ipc_server = IpcServer(self, ipc_settings)
+            self.ipc_server.start()
+        except Exception as e:
+            self.logger.error(f"IPCサーバー起動エラー: {str(e)}", exc_info=True)
+            self.ipc_server = None
 
-    def __init__(self):
-        super().__init__()
-        self.logger = logging.getLogger('ImageTranslator.Main')
-        self.clipboard = QApplication.clipboard()
-        self.last_image = None
-        self.last_image_hash = None
-        self.result_window = ResultWindow()
-        self.translation_thread = None
-        self.config = app_config
+    def publish_ipc_status(self, jobs, status, message=None, result=None):
+        """IPC由来のジョブの状態をIPCサーバーに通知"""
+        if self.ipc_server is None:
+            return
+        for job in jobs:
+            if job.source == 'ipc':
+                self.ipc_server.board.publish(job.job_id, status, message, result)
+
+    def on_ipc_submitted(self, request):
+        """IPCで受け付けた画像をジョブとして登録（GUIスレッド）"""
+        job_id = request['job_id']
+        board = self.ipc_server.board
+        try:
+            qimage = self.limit_image_size(request['qimage'])
+            if qimage is None:
+                board.publish(job_id, 'error', "画像が大きすぎます")
+                return
+            pil_image = qimage_to_pil(qimage)
+        except Exception as e:
+            self.logger.error(f"IPC画像変換エラー: {str(e)}", exc_info=True)
+            board.publish(job_id, 'error', str(e))
+            return
 
-        # 自動翻訳機能の状態（デフォルトOFF）
-        self.auto_translation_enabled = False
+        # 履歴キャッシュはクリップボードと共有
+        cached = self.find_cached_result(request['image_hash'], request['from_language'], request['to_language'])
+        if cached:
+            cached_image, output_path = cached
+            self.logger.info(f"IPCジョブ #{job_id}: 翻訳履歴の結果を再利用 {output_path}")
+            board.publish(job_id, 'done', "翻訳履歴の結果を再利用", result=cached_image)
+            return
 
-        # 翻訳言語設定の初期化
-        self.from_language = self.config.get('translation_settings', {}).get('from_language', 'japanese')
-        self.to_language = self.config.get('translation_settings', {}).get('to_language', 'english')
+        job = TranslationJob(pil_image, request['from_language'], request['to_language'],
+                             source_hash=request['image_hash'], mode=self.config['api_settings']['translation_mode'],
+                             source='ipc', job_id=job_id)
+        self.enqueue_job(job)
 
-        # システムトレイ初期化
-        self.init_system_tray()
+    def init_backend_health_checks(self):
+        """バックエンドのヘルスチェックの定期実行を初期化"""
+        interval_sec = self.config['backends']['routing']['health_check_interval_sec']
+        if not interval_sec or interval_sec <= 0:
+            return
+        self.health_check_timer = QTimer()
+        self.health_check_timer.timeout.connect(self.check_backend_health)
+        self.health_check_timer.start(interval_sec * 1000)
+        QTimer.singleShot(5000, self.check_backend_health)
+
+    def check_backend_health(self):
+        """ヘルスチェックをバックグラウンドスレッドで実行"""
+        threading.Thread(target=self.backend_router.run_health_checks,
+                         name='BackendHealthCheck', daemon=True).start()
+
+    def show_routing_status(self):
+        """バックエンドごとの統計と直近のルーティング決定を表示"""
+        backends, decisions = self.backend_router.snapshot()
+
+        lines = ["【バックエンド】"]
+        for stats in backends:
+            latency = f"{stats['latency_ms']:.0f}ms" if stats['latency_ms'] is not None else "-"
+            health = {True: "OK", False: "NG", None: "未確認"}[stats['healthy']]
+            state = "利用不可" if not stats['available'] else ("停止中" if stats['cooling_down'] else "稼働")
+            lines.append(f"{stats['name']}: {state} / 応答 {latency} / エラー率 {stats['error_rate']:.0%} / "
+                         f"呼び出し {stats['requests']}回 (失敗 {stats['failures']}回) / ヘルス {health}")
+
+        lines.append("")
+        lines.append("【直近の決定】")
+        for decision in decisions[-10:]:
+            created = datetime.fromtimestamp(decision['time']).strftime('%H:%M:%S')
+            lines.append(f"{created} #{decision['job_id']} {decision['operation']}: "
+                         f"{' > '.join(decision['order']) or '-'} → {decision['chosen'] or '失敗'}")
+        if not decisions:
+            lines.append("まだありません")
+
+        QMessageBox.information(None, "ルーティング状況", "\n".join(lines))
+
+    def show_performance(self):
+        """パフォーマンスウィンドウを表示"""
+        if self.performance_window is None:
+            self.performance_window = PerformanceWindow(self.perf_stats,
+                                                        self.config['performance_stats']['refresh_interval_ms'])
+        self.performance_window.show()
+        self.performance_window.raise_()
+        self.performance_window.activateWindow()
+
+    def record_performance(self, stats, failed=False):
+        """翻訳スレッドの統計をパフォーマンス統計に記録"""
+        if failed:
+            outcome = 'timeout' if stats['timeouts'] else 'error'
+        else:
+            outcome = 'fallback' if stats['method'] == 'generations' else 'ok'
+        cost = stats['cost_estimate'] if stats['cost_estimate'] is not None else COST_PER_IMAGE.get(stats['quality'])
+        self.perf_stats.record_job(outcome, stats['quality'] or stats['method'], cost if not failed else None)
+        for stage in ('preprocess', 'api'):
+            if stats[f'{stage}_ms'] is not None:
+                self.perf_stats.record_latency(stage, stats[f'{stage}_ms'])
+        if stats['png_passthrough']:
+            self.perf_stats.record_passthrough(stats['passthrough_saved_ms'])
+            self.logger.info(f"PNGをそのまま送信した累計: {self.perf_stats.passthrough_count}件, "
+                             f"送信前処理の削減 推定 {self.perf_stats.passthrough_saved_ms / 1000:.1f}秒")
+
+    def compact_history(self):
+        """保持ポリシーをバックグラウンドスレッドで適用"""
+        if self.history is None:
+            return
 
-        # クリップボード監視タイマー
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.check_clipboard)
-        check_interval = app_config['ui_settings']['clipboard_check_interval']
-        self.timer.start(check_interval)
+        history_settings = self.config['history_settings']
 
-        self.logger.info("画像翻訳ツール起動 - クリップボード監視開始")
+        def run_retention():
+            try:
+                self.history.apply_retention(
+                    history_settings['retention_days'],
+                    history_settings['max_entries']
+                )
+            except Exception as e:
+                self.logger.error(f"翻訳履歴整理エラー: {str(e)}", exc_info=True)
+
+        threading.Thread(target=run_retention, name='HistoryRetention', daemon=True).start()
 
     def init_system_tray(self):
         """システムトレイ初期化"""
@@ -982,8 +5920,53 @@ class ImageTranslatorApp(QWidget):
         )
         current_setting.setEnabled(False)
 
+        # 翻訳方式サブメニュー
+        mode_menu = self.tray_menu.addMenu("⚙️ 翻訳方式")
+        current_mode = self.config['api_settings']['translation_mode']
+        for mode_key, mode_label in TRANSLATION_MODES.items():
+            mode_action = QAction(f"{'✓' if mode_key == current_mode else '  '} {mode_label}", self)
+            mode_action.triggered.connect(lambda checked, m=mode_key: self.change_translation_mode(m))
+            mode_menu.addAction(mode_action)
+
+        # 実行中・待機中の翻訳をキャンセル
+        cancel_action = QAction("⏹ 翻訳をキャンセル", self)
+        cancel_action.triggered.connect(self.cancel_all_jobs)
+        self.tray_menu.addAction(cancel_action)
+
         self.tray_menu.addSeparator()
 
+        # 翻訳結果をクリップボードにコピー
+        copy_enabled = self.config['output_settings']['copy_to_clipboard']
+        copy_action = QAction(f"📋 結果をクリップボードにコピー: {'ON' if copy_enabled else 'OFF'}", self)
+        copy_action.triggered.connect(self.toggle_copy_to_clipboard)
+        self.tray_menu.addAction(copy_action)
+
+        # 翻訳履歴
+        history_action = QAction("📚 翻訳履歴", self)
+        history_action.triggered.connect(self.show_history)
+        history_action.setEnabled(self.history is not None)
+        self.tray_menu.addAction(history_action)
+
+        # パフォーマンス
+        performance_action = QAction("📊 パフォーマンス", self)
+        performance_action.triggered.connect(self.show_performance)
+        self.tray_menu.addAction(performance_action)
+
+        # バックエンドのルーティング状況
+        routing_action = QAction("🛰️ ルーティング状況", self)
+        routing_action.triggered.connect(self.show_routing_status)
+        self.tray_menu.addAction(routing_action)
+
+        # ファイルを選択して翻訳（アニメーションGIF・マルチページTIFF対応）
+        file_action = QAction("🎞️ ファイルを翻訳", self)
+        file_action.triggered.connect(self.translate_file)
+        self.tray_menu.addAction(file_action)
+
+        # 画面領域の監視
+        watch_action = QAction("⏹ 画面監視を停止" if self.region_watcher else "👁️ 画面領域を監視", self)
+        watch_action.triggered.connect(self.toggle_region_watch)
+        self.tray_menu.addAction(watch_action)
+
         # テスト表示機能
         test_action = QAction("📸 画像表示テスト", self)
         test_action.triggered.connect(self.test_image_display)
@@ -1046,6 +6029,22 @@ class ImageTranslatorApp(QWidget):
 
         self.logger.info(f"翻訳設定変更: {self.from_language} → {self.to_language}")
 
+    def change_translation_mode(self, mode):
+        """翻訳方式を変更（次のジョブから適用）"""
+        self.config['api_settings']['translation_mode'] = mode
+        self.save_config()
+        self.create_tray_menu()
+
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "翻訳方式変更",
+                TRANSLATION_MODES[mode],
+                QSystemTrayIcon.Information,
+                2000
+            )
+
+        self.logger.info(f"翻訳方式変更: {mode}")
+
     def save_config(self):
         """設定をファイルに保存"""
         try:
@@ -1063,25 +6062,25 @@ class ImageTranslatorApp(QWidget):
         """現在のクリップボード画像のハッシュを更新（古い画像を処理しないため）"""
         try:
             mime_data = self.clipboard.mimeData()
+            gif_bytes = self.clipboard_gif_bytes(mime_data)
+            if gif_bytes:
+                self.last_image_hash = hashlib.md5(gif_bytes).hexdigest()
+                return
+            # そのまま送信するPNGはcheck_clipboardと同じくバイト列のハッシュで判定する
+            native_png = self.clipboard_png_bytes(mime_data)
+            if native_png:
+                self.last_image_hash = hashlib.md5(native_png).hexdigest()
+                self.clipboard_debouncer.reset()
+                self.logger.info(f"現在のクリップボード画像ハッシュを更新: {self.last_image_hash[:8]}... (PNG)")
+                return
             if mime_data.hasImage():
                 qimage = self.clipboard.image()
                 if not qimage.isNull():
-                    # QImageをPIL Imageに変換してハッシュ計算
-                    from PyQt5.QtCore import QByteArray, QBuffer, QIODevice
-
-                    byte_array = QByteArray()
-                    buffer = QBuffer(byte_array)
-                    buffer.open(QIODevice.WriteOnly)
-                    qimage.save(buffer, "PNG")
-
-                    pil_buffer = BytesIO(byte_array.data())
-                    pil_buffer.seek(0)
-
                     try:
-                        pil_image = Image.open(pil_buffer)
-                        import hashlib
-                        image_hash = hashlib.md5(pil_image.tobytes()).hexdigest()
+                        fingerprint_size = app_config['image_size_limits']['fingerprint_size']
+                        image_hash = compute_image_fingerprint(qimage, fingerprint_size)
                         self.last_image_hash = image_hash
+                        self.clipboard_debouncer.reset()
                         self.logger.info(f"現在のクリップボード画像ハッシュを更新: {image_hash[:8]}...")
                     except Exception as e:
                         self.logger.warning(f"クリップボード画像ハッシュ更新エラー: {str(e)}")
@@ -1097,36 +6096,44 @@ class ImageTranslatorApp(QWidget):
         try:
             mime_data = self.clipboard.mimeData()
 
+            # GIFは全フレームを翻訳（QImageとして読むと先頭フレームしか取得できない）
+            gif_bytes = self.clipboard_gif_bytes(mime_data)
+            if gif_bytes:
+                gif_hash = hashlib.md5(gif_bytes).hexdigest()
+                if self.last_image_hash != gif_hash:
+                    self.last_image_hash = gif_hash
+                    self.start_frame_sequence(gif_bytes, "クリップボードのGIF")
+                return
+
+            # APIの送信サイズと一致するPNGはデコードせず、バイト列のハッシュで新しい画像か判定
+            native_png = self.clipboard_png_bytes(mime_data)
+            if native_png:
+                image_hash = hashlib.md5(native_png).hexdigest()
+                if self.last_image_hash != image_hash:
+                    self.last_image_hash = image_hash
+                    self.clipboard_debouncer.offer(image_hash, native_png)
+                    self.schedule_clipboard_flush()
+                return
+
             if mime_data.hasImage():
-                # QImageをPIL Imageに変換
                 qimage = self.clipboard.image()
 
                 if not qimage.isNull():
-                    # QImageをQByteArrayに変換してからBytesIOに
-                    from PyQt5.QtCore import QByteArray, QBuffer, QIODevice
-
-                    byte_array = QByteArray()
-                    buffer = QBuffer(byte_array)
-                    buffer.open(QIODevice.WriteOnly)
-                    qimage.save(buffer, "PNG")
-
-                    # BytesIOに変換
-                    pil_buffer = BytesIO(byte_array.data())
-                    pil_buffer.seek(0)
-
-                    # PIL Imageとして読み込み
                     try:
-                        pil_image = Image.open(pil_buffer)
+                        # 縮小表現でハッシュ値を計算
+                        fingerprint_size = app_config['image_size_limits']['fingerprint_size']
+                        image_hash = compute_image_fingerprint(qimage, fingerprint_size)
 
-                        # 画像のハッシュ値を計算
-                        import hashlib
-                        image_hash = hashlib.md5(pil_image.tobytes()).hexdigest()
+                        # 自分が書き込んだ翻訳結果は再翻訳しない（翻訳のループを防ぐ）
+                        if image_hash in self.own_clipboard_hashes:
+                            self.last_image_hash = image_hash
+                            return
 
-                        # 新しい画像の場合のみ処理
+                        # 新しい画像の場合のみデバウンサーに登録（連続更新は最後の1枚だけ翻訳）
                         if self.last_image_hash != image_hash:
-                            self.logger.info(f"新しい画像を検出: {pil_image.size}")
                             self.last_image_hash = image_hash
-                            self.process_image(pil_image)
+                            self.clipboard_debouncer.offer(image_hash, qimage)
+                            self.schedule_clipboard_flush()
 
                     except Exception as e:
                         self.logger.error(f"画像変換エラー: {str(e)}", exc_info=True)
@@ -1134,43 +6141,629 @@ class ImageTranslatorApp(QWidget):
         except Exception as e:
             self.logger.error(f"クリップボードチェックエラー: {str(e)}", exc_info=True)
 
-    def process_image(self, image):
-        """画像を翻訳処理"""
-        self.logger.info("翻訳処理を開始")
+    def clipboard_gif_bytes(self, mime_data):
+        """クリップボードのGIFデータ（なければNone）"""
+        if not self.config['multi_frame']['enabled'] or not mime_data.hasFormat('image/gif'):
+            return None
+        data = bytes(mime_data.data('image/gif'))
+        return data or None
+
+    def png_passthrough_enabled(self):
+        return self.config['clipboard_png_passthrough']['enabled']
+
+    def clipboard_png_bytes(self, mime_data):
+        """そのままAPIに送れるクリップボードのPNG（なければNone）"""
+        if not self.png_passthrough_enabled() or not mime_data.hasFormat('image/png'):
+            return None
+        # 自分が書き込んだ翻訳結果は従来どおりフィンガープリントで判定する
+        if self.clipboard.ownsClipboard():
+            return None
+        data = bytes(mime_data.data('image/png'))
+        return data if passthrough_png_size(data) else None
+
+    def run_in_background(self, func, args, on_done, on_failed=None):
+        """関数をバックグラウンドスレッドで実行し、結果をGUIスレッドで受け取る"""
+        task = BackgroundTask(func, *args)
+        task.done.connect(on_done)
+        task.failed.connect(on_failed or self.on_background_failed)
+        task.finished.connect(lambda: self.release_background_task(task))
+        self.background_tasks.append(task)
+        task.start()
+
+    def release_background_task(self, task):
+        if task in self.background_tasks:
+            self.background_tasks.remove(task)
+            task.deleteLater()
+
+    def on_background_failed(self, error_message):
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"画像の処理に失敗しました:\n{error_message}",
+                QSystemTrayIcon.Warning,
+                app_config['ui_settings']['notification_duration']
+            )
+
+    def translate_file(self):
+        """ファイルを選択して翻訳（アニメーションGIF・マルチページTIFFは全フレーム）"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            None,
+            "翻訳する画像を選択",
+            str(Path(__file__).parent.parent / "images"),
+            "画像ファイル (*.png *.jpg *.jpeg *.bmp *.gif *.tif *.tiff);;すべてのファイル (*)"
+        )
+        if file_path:
+            self.start_frame_sequence(file_path, Path(file_path).name)
+
+    def start_frame_sequence(self, source, name):
+        """画像を読み込んでフレームの重複を除く（バックグラウンド）"""
+        settings = self.config['multi_frame']
+        self.run_in_background(
+            FrameSequence.load,
+            (source, name, settings['near_duplicate_distance'], settings['max_frames'],
+             self.config['image_size_limits']['max_working_pixels']),
+            self.on_frame_sequence_loaded
+        )
+
+    def on_frame_sequence_loaded(self, sequence):
+        """代表フレームごとに翻訳ジョブを登録"""
+        mode = self.config['api_settings']['translation_mode']
+        sequence.from_language = self.from_language
+        sequence.to_language = self.to_language
+
+        # 1フレームのみの画像は通常の翻訳
+        if not sequence.is_animated:
+            self.enqueue_job(TranslationJob(sequence.unique_frames[0].convert('RGB'), self.from_language,
+                                            self.to_language, source_hash=sequence.source_hash,
+                                            mode=mode, source='file'))
+            return
+
+        for unique_index, frame in enumerate(sequence.unique_frames):
+            job = TranslationJob(frame.convert('RGB'), self.from_language, self.to_language,
+                                 mode=mode, source='frames')
+            job.frame_group = sequence
+            job.frame_index = unique_index
+            job.allow_packing = False
+            self.pending_frame_jobs.append(job)
+        self.logger.info(f"フレーム翻訳ジョブ登録: {sequence.name} {len(sequence.unique_frames)}件")
+        self.dispatch_jobs()
+
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"{len(sequence.frame_map)}フレーム中 {len(sequence.unique_frames)}フレームを翻訳します",
+                QSystemTrayIcon.Information,
+                2000
+            )
+
+    def on_frame_translated(self, job, stats, translated_image):
+        """代表フレームの翻訳結果を登録し、すべてそろったら保存（Noneは元フレームのまま）"""
+        sequence = job.frame_group
+        if sequence.cancelled:
+            return
+        if sequence.add_result(job.frame_index, translated_image, stats):
+            save_dir = Path(__file__).parent.parent / app_config['output_settings']['save_directory']
+            self.run_in_background(sequence.save, (save_dir, self.history),
+                                   lambda saved: self.on_frame_sequence_saved(sequence, saved))
+
+    def on_frame_sequence_saved(self, sequence, saved):
+        """再構成したファイルを履歴に記録して表示"""
+        self.logger.info(f"フレーム翻訳完了: {saved['path']} ({len(sequence.frame_map)}フレーム, "
+                         f"API対象 {len(sequence.unique_frames)}フレーム, {saved['latency_ms']}ms)")
+        if self.history is not None:
+            try:
+                self.history.record(sequence.source_hash, sequence.from_language, sequence.to_language,
+                                    saved['path'], method='frames', latency_ms=saved['latency_ms'],
+                                    cost_estimate=sequence.cost, source_size=sequence.size,
+                                    thumbnail=saved['thumbnail'])
+            except Exception as e:
+                self.logger.error(f"翻訳履歴記録エラー: {str(e)}", exc_info=True)
+
+        self.result_window.show_image(sequence.results[sequence.frame_map[0]])
+        if self.tray_icon.isSystemTrayAvailable():
+            failed = f"\n翻訳に失敗したフレーム: {sequence.failures}件" if sequence.failures else ""
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"{len(sequence.frame_map)}フレームの翻訳が完了しました！"
+                f"（API呼び出し {len(sequence.unique_frames)}回）{failed}\n保存先: {saved['path']}",
+                QSystemTrayIcon.Information,
+                app_config['ui_settings']['notification_duration']
+            )
+        sequence.results.clear()
+        sequence.unique_frames.clear()
+
+    def abort_frame_groups(self, jobs):
+        """キャンセルされたジョブを含む複数フレーム画像の翻訳を中止"""
+        for job in jobs:
+            if job.frame_group is not None:
+                job.frame_group.cancelled = True
+
+    def toggle_region_watch(self):
+        """画面領域の監視を開始・停止（トレイメニューから）"""
+        if self.region_watcher is not None:
+            self.stop_region_watch()
+        else:
+            self.select_watch_region()
+
+    def select_watch_region(self):
+        """監視する画面領域をドラッグで選択"""
+        settings = self.config['region_watch']
+        if settings['frame_source'] == 'synthetic':
+            synthetic = settings['synthetic']
+            self.start_region_watch(SyntheticFrameSource(synthetic['size'], synthetic['change_every'],
+                                                         synthetic['settle_grabs']))
+            return
+
+        self.region_selector = RegionSelector()
+        self.region_selector.selected.connect(lambda region: self.start_region_watch(ScreenFrameSource(region)))
+        self.region_selector.destroyed.connect(lambda: setattr(self, 'region_selector', None))
+        self.region_selector.show()
+        self.region_selector.activateWindow()
+
+    def start_region_watch(self, source):
+        """フレームソースの監視を開始"""
+        self.region_watcher = ScreenRegionWatcher(source, self.config['region_watch'])
+        self.watch_timer.start(0)
+        self.create_tray_menu()
+
+        region = getattr(source, 'region', None)
+        self.logger.info(f"画面監視開始: {type(source).__name__} {region or ''}")
+        if region and self.result_window.isVisible() and \
+                self.result_window.frameGeometry().intersects(QRect(*region)):
+            self.logger.warning("翻訳結果ウィンドウが監視領域に重なっています（結果の表示が変化として検出されます）")
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                "画面領域の監視を開始しました\n内容が変わって落ち着くと自動で翻訳します",
+                QSystemTrayIcon.Information,
+                2000
+            )
+
+    def stop_region_watch(self):
+        """画面領域の監視を停止"""
+        watcher = self.region_watcher
+        if watcher is None:
+            return
+        self.watch_timer.stop()
+        self.region_watcher = None
+        self.create_tray_menu()
+
+        grabs = watcher.stats['grabs']
+        average_ms = watcher.stats['grab_ms'] / grabs if grabs else 0.0
+        self.logger.info(f"画面監視停止: キャプチャ {grabs}回 (平均 {average_ms:.1f}ms), "
+                         f"翻訳 {watcher.stats['submitted']}回")
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"画面領域の監視を停止しました（翻訳 {watcher.stats['submitted']}回）",
+                QSystemTrayIcon.Information,
+                2000
+            )
+
+    def poll_region_watcher(self):
+        """監視領域を1回キャプチャし、変化が落ち着いていれば翻訳"""
+        watcher = self.region_watcher
+        if watcher is None:
+            return
+        try:
+            frame = watcher.poll()
+            if frame is not None:
+                self.submit_watch_frame(frame)
+        except Exception as e:
+            self.logger.error(f"画面キャプチャエラー: {str(e)}", exc_info=True)
+            watcher.current_interval_ms = watcher.max_interval_ms
+        if self.region_watcher is watcher:
+            self.watch_timer.start(watcher.current_interval_ms)
+
+    def submit_watch_frame(self, frame):
+        """監視領域のフレームを翻訳キューに登録"""
+        width, height = frame.size
+        target_size = fit_within_pixels(width, height, self.config['image_size_limits']['max_working_pixels'])
+        if target_size != (width, height):
+            frame = frame.resize(target_size, Image.LANCZOS, reducing_gap=3.0)
+        frame = frame.convert('RGB')
+        image_hash = hashlib.md5(frame.tobytes()).hexdigest()
+        self.logger.info(f"監視領域の変化を検出: {frame.size}")
+        self.process_image(frame, image_hash, source='watch')
+
+    def schedule_clipboard_flush(self):
+        """デバウンサーの確定予定時刻に取り出し処理を予約"""
+        remaining = self.clipboard_debouncer.time_until_ready()
+        if remaining is None:
+            return
+        if remaining == 0:
+            self.flush_clipboard_debounce()
+        else:
+            self.debounce_timer.start(int(remaining * 1000) + 1)
+
+    def flush_clipboard_debounce(self):
+        """落ち着いたクリップボード画像を翻訳に回す"""
+        coalesced = self.clipboard_debouncer.coalesced
+        ready = self.clipboard_debouncer.poll()
+        if ready is None:
+            self.schedule_clipboard_flush()
+            return
+        if not self.auto_translation_enabled:
+            return
+
+        image_hash, qimage = ready
+        if isinstance(qimage, bytes):
+            self.process_native_png(qimage, coalesced)
+            return
+        try:
+            capture_start = time.perf_counter()
+
+            # サイズ上限チェックと早期縮小（PIL変換前にQt側で1回だけ縮小）
+            qimage = self.limit_image_size(qimage)
+            if qimage is None:
+                return
+
+            # QImageをPIL Imageに変換（PNG経由なし）
+            pil_image = qimage_to_pil(qimage)
+            self.perf_stats.record_latency('capture', (time.perf_counter() - capture_start) * 1000)
+            self.logger.info(f"新しい画像を検出: {pil_image.size} "
+                             f"(取り込み {(time.perf_counter() - capture_start) * 1000:.1f}ms, "
+                             f"まとめた更新 {coalesced}件)")
+            self.submit_capture(pil_image)
+        except Exception as e:
+            self.logger.error(f"画像変換エラー: {str(e)}", exc_info=True)
+
+    def submit_capture(self, image, native_png=None):
+        """履歴照合用の厳密なハッシュをバックグラウンドで計算してから翻訳処理に回す（取り込み順を保つ）
+
+        PNGのまま受け取ったキャプチャ（imageはNone）は同じスレッドでデコードしてからハッシュを計算する。
+        """
+        self.capture_digest_queue.append((image, native_png))
+        if len(self.capture_digest_queue) == 1:
+            self.run_next_capture_digest()
+
+    def run_next_capture_digest(self):
+        image, native_png = self.capture_digest_queue[0]
+        if native_png is not None:
+            self.run_in_background(decode_png_capture, (native_png,),
+                                   self.on_capture_digest, self.on_capture_digest_failed)
+        else:
+            self.run_in_background(compute_source_digest, (image,),
+                                   self.on_capture_digest, self.on_capture_digest_failed)
+
+    def on_capture_digest(self, result):
+        """ハッシュの計算が終わったキャプチャを翻訳処理に回し、次のキャプチャの計算を開始"""
+        image, native_png = self.capture_digest_queue.popleft()
+        if self.capture_digest_queue:
+            self.run_next_capture_digest()
+        digest = result
+        if native_png is not None:
+            image, digest = result
+        if self.auto_translation_enabled:
+            self.process_image(image, digest, native_png=native_png)
+
+    def on_capture_digest_failed(self, error_message):
+        """ハッシュを計算できなかった場合は履歴を照合せずに翻訳"""
+        self.logger.warning(f"キャプチャのハッシュ計算エラー（履歴を照合せずに翻訳）: {error_message}")
+        image, native_png = self.capture_digest_queue.popleft()
+        if self.capture_digest_queue:
+            self.run_next_capture_digest()
+        if self.auto_translation_enabled:
+            self.process_image(image, native_png=native_png)
+
+    def process_native_png(self, png_bytes, coalesced=0):
+        """クリップボードのPNGをGUIスレッドでデコードせずに翻訳に回す
+
+        PNGバイト列のハッシュは変化検出にのみ使う。履歴・キャッシュのキーには、QImage経由の
+        取り込みと同じく画素の厳密なハッシュをバックグラウンドでのデコード時に計算して使う。
+        """
+        capture_start = time.perf_counter()
+        width, height = passthrough_png_size(png_bytes)
+        capture_ms = (time.perf_counter() - capture_start) * 1000
+        self.perf_stats.record_latency('capture', capture_ms)
+        self.logger.info(f"新しい画像を検出: ({width}, {height}) PNG {len(png_bytes) / 1024:.0f}KB "
+                         f"(取り込み {capture_ms:.1f}ms, GUIスレッドでのデコードなし, まとめた更新 {coalesced}件)")
+        self.submit_capture(None, native_png=png_bytes)
+
+    def limit_image_size(self, qimage):
+        """画像サイズの上限を適用（処理不可ならNone、大きすぎる場合は縮小したQImageを返す）"""
+        size_limits = app_config['image_size_limits']
+        width, height = qimage.width(), qimage.height()
+        pixels = width * height
+
+        if pixels > size_limits['max_input_pixels']:
+            self.logger.warning(f"画像が大きすぎるため翻訳をスキップ: {width}x{height} ({pixels:,}ピクセル)")
+            if self.tray_icon.isSystemTrayAvailable():
+                self.tray_icon.showMessage(
+                    "画像翻訳ツール",
+                    f"画像が大きすぎるため翻訳をスキップしました: {width}x{height}\n"
+                    f"上限: {size_limits['max_input_pixels']:,}ピクセル",
+                    QSystemTrayIcon.Warning,
+                    app_config['ui_settings']['notification_duration']
+                )
+            return None
+
+        # APIに送るのは最大1536x1024のため、作業用サイズを超える分は最初に縮小する
+        target_width, target_height = fit_within_pixels(width, height, size_limits['max_working_pixels'])
+        if (target_width, target_height) == (width, height):
+            return qimage
 
-        # 通知
+        resize_start = time.perf_counter()
+        reduced = qimage.scaled(target_width, target_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.logger.info(f"大きな画像を縮小: {width}x{height} → {reduced.width()}x{reduced.height()} "
+                         f"({(time.perf_counter() - resize_start) * 1000:.1f}ms)")
         if self.tray_icon.isSystemTrayAvailable():
             self.tray_icon.showMessage(
                 "画像翻訳ツール",
-                "翻訳処理を開始しました...",
+                f"大きな画像を縮小して翻訳します: {width}x{height} → {reduced.width()}x{reduced.height()}",
+                QSystemTrayIcon.Information,
+                2000
+            )
+        return reduced
+
+    def process_image(self, image, image_hash=None, source='clipboard', native_png=None):
+        """画像を翻訳処理（native_pngを渡す場合、imageはNone）"""
+        self.logger.info("翻訳処理を開始")
+
+        # 同一画像・同一言語ペアの翻訳済み結果があれば再利用（API呼び出しなし）
+        if image_hash and self.reuse_history_result(image_hash):
+            return
+
+        job = TranslationJob(image, self.from_language, self.to_language, source_hash=image_hash,
+                             mode=self.config['api_settings']['translation_mode'], source=source,
+                             native_png=native_png)
+
+        # 新しいキャプチャで実行中・待機中の同じ取り込み元の翻訳を置き換える
+        if self.config['job_settings']['supersede_policy'] == 'latest_wins':
+            self.supersede_jobs(source)
+
+        # 通知（画面監視中は翻訳のたびに通知しない）
+        if source != 'watch' and self.tray_icon.isSystemTrayAvailable():
+            if self.active_threads:
+                message = f"翻訳待ちに追加しました（待機 {len(self.pending_jobs) + 1}件）"
+            else:
+                message = "翻訳処理を開始しました..."
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                message,
                 QSystemTrayIcon.Information,
                 2000
             )
 
-        # 翻訳スレッドが動作中の場合はキャンセル
-        if self.translation_thread and self.translation_thread.isRunning():
-            self.logger.warning("既に翻訳処理が実行中です")
+        self.enqueue_job(job)
+
+    def enqueue_job(self, job):
+        """ジョブをキューに追加して実行可能なら開始"""
+        if (self.durable_store is not None and job.durable is None
+                and job.source in self.config['durable_queue']['sources']):
+            job.durable = self.durable_store.add(job)
+        self.pending_jobs.append(job)
+        self.logger.info(f"ジョブ登録: #{job.job_id} {job.size} "
+                         f"(待機 {len(self.pending_jobs)}件, 実行中 {len(self.active_threads)}件)")
+        self.dispatch_jobs()
+
+    def supersede_jobs(self, source='clipboard'):
+        """同じ取り込み元（クリップボード・画面監視）の実行中ジョブをキャンセルし、待機中のジョブを破棄"""
+        stale_jobs = [job for job in self.pending_jobs if job.source == source]
+        for job in stale_jobs:
+            self.pending_jobs.remove(job)
+            job.release()
+        self.settle_durable_jobs(stale_jobs, 'cancelled')
+        stale_records = [record for record in self.durable_backlog if record['source'] == source]
+        for record in stale_records:
+            self.durable_backlog.remove(record)
+            self.durable_store.update(record, 'cancelled')
+
+        stale_threads = [thread for thread in self.active_threads
+                         if all(job.source == source for job in getattr(thread, 'jobs', [thread.job]))]
+        for thread in stale_threads:
+            self.cancel_translation_thread(thread)
+
+        if stale_jobs or stale_threads or stale_records:
+            self.logger.info(f"新しいキャプチャで置き換え: 実行中 {len(stale_threads)}件をキャンセル, "
+                             f"待機中 {len(stale_jobs) + len(stale_records)}件を破棄")
+
+    def cancel_translation_thread(self, thread):
+        """翻訳スレッドにキャンセルを要求（終了はcancelledシグナルで受け取る）"""
+        if thread not in self.active_threads:
             return
+        thread.cancel()
+        self.active_threads.remove(thread)
+        self.cancelling_threads.append(thread)
+        self.publish_ipc_status(getattr(thread, 'jobs', [thread.job]), 'cancelled')
+
+    def cancel_all_jobs(self):
+        """実行中・待機中のすべての翻訳をキャンセル（トレイメニューから）"""
+        count = (len(self.active_threads) + len(self.pending_jobs) + len(self.pending_frame_jobs)
+                 + len(self.durable_backlog))
+        self.publish_ipc_status(self.pending_jobs, 'cancelled')
+        self.abort_frame_groups(self.pending_jobs + self.pending_frame_jobs)
+        self.settle_durable_jobs(self.pending_jobs, 'cancelled')
+        for job in self.pending_jobs + self.pending_frame_jobs:
+            job.release()
+        self.pending_jobs.clear()
+        self.pending_frame_jobs.clear()
+        for record in self.durable_backlog:
+            self.durable_store.update(record, 'cancelled')
+        self.durable_backlog.clear()
+        self.durable_retry_timer.stop()
+        for thread in list(self.active_threads):
+            self.cancel_translation_thread(thread)
+
+        self.logger.info(f"手動キャンセル: {count}件")
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"{count}件の翻訳をキャンセルしました" if count else "実行中の翻訳はありません",
+                QSystemTrayIcon.Information,
+                2000
+            )
 
-        # 翻訳スレッド開始
-        self.translation_thread = TranslationThread(image, app_config, self.from_language, self.to_language)
-        self.translation_thread.finished.connect(self.on_translation_finished)
-        self.translation_thread.error.connect(self.on_translation_error)
-        self.translation_thread.progress.connect(self.on_translation_progress)
-        self.translation_thread.start()
+    def dispatch_jobs(self):
+        """同時実行数の上限まで待機中のジョブを開始（フレームのジョブは別枠の上限で並行実行）"""
+        max_concurrent = self.config['job_settings']['max_concurrent_jobs']
+        self.refill_from_durable_backlog()
+        while self.pending_jobs and self.count_active_threads(frames=False) < max_concurrent:
+            jobs, layout = self.take_next_jobs()
+            self.start_translation_thread(jobs, layout)
+
+        max_frames = self.config['multi_frame']['max_concurrent_frames']
+        while self.pending_frame_jobs and self.count_active_threads(frames=True) < max_frames:
+            job = self.pending_frame_jobs.pop(0)
+            if job.frame_group.cancelled:
+                job.release()
+                continue
+            self.start_translation_thread([job])
+
+    def count_active_threads(self, frames):
+        """実行中のスレッド数（frames=Trueなら複数フレーム画像のフレーム、Falseならそれ以外）"""
+        return sum(1 for thread in self.active_threads if (thread.job.frame_group is not None) == frames)
+
+    def take_next_jobs(self):
+        """次に実行するジョブを取り出す（同じ言語ペアの小さなキャプチャはアトラスにまとめる）"""
+        head = self.pending_jobs[0]
+
+        def packable(job):
+            return (job.allow_packing and job.mode == 'image_edit'
+                    and job.from_language == head.from_language and job.to_language == head.to_language
+                    and self.atlas_packer.is_small(job.size))
+
+        if self.config['atlas_packing']['enabled'] and packable(head):
+            candidates = [job for job in self.pending_jobs if packable(job)]
+            if len(candidates) >= 2:
+                layout = self.atlas_packer.pack([job.size for job in candidates])
+                if layout:
+                    packed = candidates[:len(layout['placements'])]
+                    for job in packed:
+                        self.pending_jobs.remove(job)
+                    self.logger.info(f"アトラスにまとめて翻訳: {len(packed)}件 "
+                                     f"(キャンバス {layout['canvas']}, 充填率 {layout['efficiency']:.1%})")
+                    return packed, layout
+
+        return [self.pending_jobs.pop(0)], None
+
+    def start_translation_thread(self, jobs, layout=None):
+        """翻訳スレッドを作成して開始"""
+        if layout:
+            thread = AtlasTranslationThread(jobs, layout, self.atlas_packer, app_config,
+                                            history=self.history, router=self.backend_router,
+                                            workers=self.image_workers, prompts=self.prompt_library,
+                                            session=self.http_session)
+            thread.atlas_finished.connect(self.on_atlas_finished)
+            thread.atlas_failed.connect(self.on_atlas_failed)
+            thread.jobs_skipped.connect(self.on_atlas_jobs_skipped)
+        else:
+            thread = TranslationThread(jobs[0], app_config, history=self.history, router=self.backend_router,
+                                       workers=self.image_workers, shared_cache=self.shared_cache,
+                                       prompts=self.prompt_library, session=self.http_session)
+            thread.translated.connect(self.on_translation_finished)
+        thread.skipped.connect(self.on_translation_skipped)
+        thread.cancelled.connect(self.on_translation_cancelled)
+        thread.error.connect(self.on_translation_error)
+        thread.progress.connect(self.on_translation_progress)
+
+        self.active_threads.append(thread)
+        thread.start()
+        self.publish_ipc_status(jobs, 'running')
 
     def on_translation_finished(self, translated_image):
         """翻訳完了時の処理"""
+        thread = self.sender()
+        if thread.is_cancelled():
+            # キャンセル要求と完了が行き違った古い結果は破棄
+            self.logger.info(f"キャンセル済みジョブの結果を破棄: #{thread.job.job_id}")
+            self.settle_durable_jobs([thread.job], 'cancelled')
+            self.release_translation_thread(thread)
+            return
         self.logger.info("翻訳完了")
 
+        self.record_performance(thread.job_stats)
+        self.deliver_result(thread.job, thread.job_stats, translated_image)
+        if thread.job_stats['backend'] is not None:
+            self.expedite_durable_retries()
+
+        # 翻訳スレッドを破棄
+        self.release_translation_thread(thread)
+
+    def on_atlas_finished(self, translated_images):
+        """アトラス翻訳完了時の処理（分割済みの結果をジョブごとに保存・記録）"""
+        thread = self.sender()
+        if thread.is_cancelled():
+            self.logger.info(f"キャンセル済みアトラスの結果を破棄: {len(translated_images)}件")
+            self.settle_durable_jobs(thread.jobs, 'cancelled')
+            self.release_translation_thread(thread)
+            return
+        count = len(translated_images)
+        self.logger.info(f"アトラス翻訳完了: {count}件")
+        self.record_performance(thread.job_stats)
+
+        # コストはアトラス1回分を件数で按分
+        stats = dict(thread.job_stats)
+        quality_cost = COST_PER_IMAGE.get(stats['quality'])
+        stats['cost_estimate'] = quality_cost / count if quality_cost is not None else None
+
+        for index, (job, translated_image) in enumerate(zip(thread.jobs, translated_images)):
+            is_last = index == count - 1
+            self.deliver_result(job, stats, translated_image, show=is_last, notify=False)
+        self.expedite_durable_retries()
+
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"{count}件の翻訳が完了しました！",
+                QSystemTrayIcon.Information,
+                app_config['ui_settings']['notification_duration']
+            )
+
+        self.release_translation_thread(thread)
+
+    def on_atlas_jobs_skipped(self, jobs, message):
+        """テキストなしと判定されてアトラスから外されたジョブの処理（スレッドは翻訳を継続）"""
+        self.logger.info(f"アトラスから除外: {len(jobs)}件 ({message})")
+        self.settle_durable_jobs(jobs, 'done')
+        self.publish_ipc_status(jobs, 'skipped', message)
+        for job in jobs:
+            job.release()
+
+    def on_atlas_failed(self):
+        """アトラス翻訳に失敗した場合は各ジョブを個別翻訳としてキューの先頭に戻す"""
+        thread = self.sender()
+        if thread.is_cancelled():
+            self.release_translation_thread(thread)
+            return
+        for job in reversed(thread.jobs):
+            job.allow_packing = False
+            self.pending_jobs.insert(0, job)
+        self.release_translation_thread(thread, keep_job_images=True)
+
+    def deliver_result(self, job, stats, translated_image, show=True, notify=True):
+        """翻訳結果の保存・履歴記録・表示"""
+        # 複数フレーム画像のフレームはすべてそろってから保存
+        if job.frame_group is not None:
+            self.on_frame_translated(job, stats, translated_image)
+            return
+
+        result_at = time.perf_counter()
+
+        # 貼り付けを待たせないよう保存より先にクリップボードへ書き込む
+        if job.source != 'ipc':
+            self.copy_result_to_clipboard(translated_image, result_at)
+
         # 生成画像を自動保存
-        saved_path = self.save_translated_image(translated_image)
+        saved_path = self.save_translated_image(translated_image, job.result_data)
+
+        # 翻訳履歴に記録
+        self.record_history(job, stats, saved_path)
+        self.settle_durable_jobs([job], 'done')
+
+        # IPC由来のジョブは要求元に返し、画面には表示しない
+        if job.source == 'ipc':
+            self.publish_ipc_status([job], 'done', saved_path, result=translated_image)
+            return
 
         # 結果表示
-        self.result_window.show_image(translated_image)
+        if show:
+            display_start = time.perf_counter()
+            self.result_window.show_image(translated_image)
+            self.perf_stats.record_latency('display', (time.perf_counter() - display_start) * 1000)
 
         # 通知（保存パス情報も含める）
-        if self.tray_icon.isSystemTrayAvailable():
+        if notify and self.tray_icon.isSystemTrayAvailable():
             notification_duration = app_config['ui_settings']['notification_duration']
             self.tray_icon.showMessage(
                 "画像翻訳ツール",
@@ -1179,8 +6772,119 @@ class ImageTranslatorApp(QWidget):
                 notification_duration
             )
 
-    def save_translated_image(self, image):
-        """翻訳された画像を一意の名前で自動保存"""
+    def copy_result_to_clipboard(self, image, result_at):
+        """翻訳結果をクリップボードに書き込む（自動翻訳で再翻訳されないよう登録）"""
+        if not self.config['output_settings']['copy_to_clipboard']:
+            return
+
+        try:
+            convert_start = time.perf_counter()
+            qimage = pil_to_qimage(image)
+            fingerprint = compute_image_fingerprint(qimage, app_config['image_size_limits']['fingerprint_size'])
+            self.own_clipboard_hashes.append(fingerprint)
+            self.last_image_hash = fingerprint
+            self.clipboard_debouncer.reset()
+
+            set_start = time.perf_counter()
+            self.clipboard.setImage(qimage)
+            ready_at = time.perf_counter()
+            self.logger.info(f"翻訳結果をクリップボードにコピー: {image.size} "
+                             f"(貼り付け可能まで {(ready_at - result_at) * 1000:.1f}ms, "
+                             f"変換 {(set_start - convert_start) * 1000:.1f}ms, "
+                             f"書き込み {(ready_at - set_start) * 1000:.1f}ms)")
+        except Exception as e:
+            self.logger.error(f"クリップボードへのコピーエラー: {str(e)}", exc_info=True)
+
+    def toggle_copy_to_clipboard(self):
+        """翻訳結果のクリップボードへのコピーをON/OFF（トレイメニューから）"""
+        output_settings = self.config['output_settings']
+        output_settings['copy_to_clipboard'] = not output_settings['copy_to_clipboard']
+        self.save_config()
+        self.create_tray_menu()
+        self.logger.info(f"翻訳結果のクリップボードコピー: {'ON' if output_settings['copy_to_clipboard'] else 'OFF'}")
+
+    def find_cached_result(self, image_hash, from_language, to_language):
+        """翻訳履歴から同一ソース・同一言語ペアの結果を探す（(画像, 保存先)またはNone）"""
+        if self.history is None or not self.config['history_settings']['reuse_cached_results']:
+            return None
+
+        try:
+            row = self.history.find_by_hash(image_hash, from_language, to_language)
+            if not row or not row['output_path'] or not Path(row['output_path']).exists():
+                return None
+
+            with Image.open(row['output_path']) as cached:
+                return cached.convert('RGB'), row['output_path']
+        except Exception as e:
+            self.logger.warning(f"翻訳履歴の再利用エラー: {str(e)}")
+            return None
+
+    def reuse_history_result(self, image_hash):
+        """翻訳履歴から同一ソースの結果を探して表示（見つかった場合True）"""
+        cached = self.find_cached_result(image_hash, self.from_language, self.to_language)
+        if not cached:
+            return False
+
+        cached_image, output_path = cached
+        self.logger.info(f"翻訳履歴から結果を再利用: {output_path}")
+        self.copy_result_to_clipboard(cached_image, time.perf_counter())
+        self.result_window.show_image(cached_image)
+
+        if self.tray_icon.isSystemTrayAvailable():
+            notification_duration = app_config['ui_settings']['notification_duration']
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                f"翻訳済みの画像です。履歴の結果を表示しました。\n保存先: {output_path}",
+                QSystemTrayIcon.Information,
+                notification_duration
+            )
+        return True
+
+    def record_history(self, job, stats, saved_path):
+        """翻訳結果を履歴に記録"""
+        if self.history is None or not job.source_hash:
+            return
+
+        try:
+            self.history.record(
+                job.source_hash,
+                job.from_language,
+                job.to_language,
+                saved_path if saved_path != "保存失敗" else None,
+                quality=stats['quality'],
+                input_fidelity=stats['input_fidelity'],
+                method=stats['method'],
+                latency_ms=stats['latency_ms'],
+                cost_estimate=(stats['cost_estimate'] if stats['cost_estimate'] is not None
+                               else COST_PER_IMAGE.get(stats['quality'])),
+                source_size=job.size,
+                thumbnail=job.thumbnail,
+                policy_reason=stats['policy_reason'],
+                backend=stats['backend'],
+                prompt_variant=stats['prompt_variant']
+            )
+        except Exception as e:
+            self.logger.error(f"翻訳履歴記録エラー: {str(e)}", exc_info=True)
+
+    def show_history(self):
+        """翻訳履歴ブラウザを表示"""
+        if self.history is None:
+            return
+        if self.history_window is None:
+            self.history_window = HistoryWindow(self.history, self.open_history_output)
+        self.history_window.reload()
+
+    def open_history_output(self, output_path):
+        """履歴の翻訳結果を結果ウィンドウで表示"""
+        try:
+            with Image.open(output_path) as img:
+                self.result_window.show_image(img.convert('RGB'))
+        except Exception as e:
+            self.logger.error(f"履歴画像読み込みエラー: {str(e)}")
+            QMessageBox.critical(None, "エラー", f"画像の読み込みに失敗しました:\n{str(e)}")
+
+    def save_translated_image(self, image, png_bytes=None):
+        """翻訳された画像を一意の名前で自動保存（エンコード済みのデータがあればそのまま書き込む）"""
         try:
             # 設定から保存ディレクトリとファイル名フォーマットを取得
             save_dir = app_config['output_settings']['save_directory']
@@ -1196,8 +6900,15 @@ class ImageTranslatorApp(QWidget):
             filename = filename_format.format(timestamp=timestamp)
             filepath = images_dir / filename
 
-            # 画像保存
-            image.save(filepath, "PNG")
+            # 出力ストアに保存（同じ内容の画像はリンクのみ）
+            if self.output_store is not None:
+                return self.output_store.save(image, filepath, encoded=png_bytes)
+
+            # 画像保存（PNG以外でエンコード済みのデータは.pngに書き込まない）
+            if png_bytes and png_bytes.startswith(PNG_SIGNATURE):
+                filepath.write_bytes(png_bytes)
+            else:
+                image.save(filepath, "PNG")
             self.logger.info(f"翻訳画像保存完了: {filepath}")
 
             return str(filepath)
@@ -1210,6 +6921,14 @@ class ImageTranslatorApp(QWidget):
         """翻訳進捗通知の処理"""
         self.logger.info(f"進捗: {message}")
 
+        thread = self.sender()
+        if thread is not None:
+            jobs = getattr(thread, 'jobs', [thread.job])
+            self.publish_ipc_status(jobs, 'running', message)
+            # IPCのみのジョブはトレイ通知しない
+            if all(job.source == 'ipc' for job in jobs):
+                return
+
         # システムトレイ通知
         if self.tray_icon.isSystemTrayAvailable():
             self.tray_icon.showMessage(
@@ -1219,10 +6938,62 @@ class ImageTranslatorApp(QWidget):
                 2000
             )
 
+    def on_translation_skipped(self, message):
+        """テキストなしと判定されて翻訳をスキップした場合の処理"""
+        self.logger.info(f"翻訳スキップ: {message}")
+
+        # 翻訳スレッドを破棄
+        thread = self.sender()
+        self.release_translation_thread(thread)
+        if thread.is_cancelled():
+            return
+        if thread.job.frame_group is not None:
+            self.on_frame_translated(thread.job, None, None)
+            return
+        self.settle_durable_jobs([thread.job], 'done')
+        self.publish_ipc_status([thread.job], 'skipped', message)
+        if thread.job.source == 'ipc':
+            return
+
+        if self.tray_icon.isSystemTrayAvailable():
+            self.tray_icon.showMessage(
+                "画像翻訳ツール",
+                message,
+                QSystemTrayIcon.Information,
+                app_config['ui_settings']['notification_duration']
+            )
+
+    def on_translation_cancelled(self):
+        """キャンセルにより翻訳が中断された場合の処理"""
+        thread = self.sender()
+        self.logger.info(f"翻訳スレッド終了（キャンセル）: #{thread.job.job_id}")
+        self.publish_ipc_status(getattr(thread, 'jobs', [thread.job]), 'cancelled')
+        self.abort_frame_groups(getattr(thread, 'jobs', [thread.job]))
+        self.settle_durable_jobs(getattr(thread, 'jobs', [thread.job]), 'cancelled')
+        self.release_translation_thread(thread)
+
     def on_translation_error(self, error_message):
         """翻訳エラー時の処理"""
         self.logger.error(f"翻訳エラー: {error_message}")
 
+        # 翻訳スレッドを破棄
+        thread = self.sender()
+        self.release_translation_thread(thread)
+        if thread.is_cancelled():
+            return
+        self.record_performance(thread.job_stats, failed=True)
+        if thread.job.frame_group is not None:
+            # 失敗したフレームは元のまま再構成
+            thread.job.frame_group.failures += 1
+            self.on_frame_translated(thread.job, None, None)
+            return
+        self.publish_ipc_status([thread.job], 'error', error_message)
+        if thread.job.source == 'ipc':
+            return
+        # 通信エラーは永続キューに残してバックオフ後に再試行
+        if self.retry_durable_job(thread.job, thread.job_stats, error_message):
+            return
+
         # システムトレイ通知
         if self.tray_icon.isSystemTrayAvailable():
             self.tray_icon.showMessage(
@@ -1303,6 +7074,7 @@ class ImageTranslatorApp(QWidget):
             self.logger.info("自動翻訳機能: ON")
         else:
             # OFFの場合
+            self.clipboard_debouncer.reset()
             self.translation_action.setText("🔴 自動翻訳: OFF")
             self.tray_icon.setToolTip("画像翻訳ツール - 自動翻訳: OFF")
             # アイコンをOFF.pngに変更
@@ -1323,11 +7095,147 @@ class ImageTranslatorApp(QWidget):
         """アプリケーション終了"""
         self.logger.info("アプリケーション終了")
         self.timer.stop()
+        self.watch_timer.stop()
+        self.backend_router.timeouts.save()
+        # 未完了のジョブは永続キューに残したまま終了（この後のキャンセルは記録しない）
+        if self.durable_store is not None:
+            self.durable_store.close()
+        if self.ipc_server is not None:
+            self.ipc_server.stop()
+        # 実行中の翻訳は応答を待たずに中断
+        for thread in self.active_threads + self.cancelling_threads + self.exiting_threads:
+            thread.cancel()
+            thread.wait(1000)
+        self.http_session.close()
+        self.image_workers.shutdown()
+        if isinstance(self.lag_probe, ResponsivenessWatchdog):
+            self.lag_probe.stop()
+        if self.history is not None:
+            self.history.close()
         QApplication.quit()
 
 
+def print_prompt_report():
+    """プロンプト変種ごとのサイズと翻訳履歴の結果（A/B比較）を表示"""
+    library = PromptTemplateLibrary.from_config(app_config)
+    settings = app_config['translation_settings']
+    from_language, to_language = settings['from_language'], settings['to_language']
+
+    print(f"【プロンプトのサイズ】{from_language} → {to_language}")
+    for name, version in sorted(library.templates):
+        sizes = [library.compile(name, version, from_language, to_language, target_size, padding_type)
+                 for target_size in ('1024x1024', '1536x1024', '1024x1536')
+                 for padding_type in ('none', 'vertical', 'horizontal')]
+        print(f"{name}.v{version}: {min(size['bytes'] for size in sizes):,}〜{max(size['bytes'] for size in sizes):,}バイト / "
+              f"約{min(size['tokens'] for size in sizes):,}〜{max(size['tokens'] for size in sizes):,}トークン")
+
+    history_settings = app_config['history_settings']
+    history = TranslationHistory(Path(__file__).parent.parent / history_settings['database_file'])
+    try:
+        results = history.prompt_variant_results()
+    finally:
+        history.close()
+
+    print("")
+    print("【翻訳履歴の結果】")
+    if not results:
+        print("プロンプト変種が記録された履歴はまだありません")
+    for variant, rows in sorted(results.items()):
+        latencies = sorted(latency for _, latency, _ in rows if latency is not None)
+        costs = [cost for _, _, cost in rows if cost is not None]
+        fallbacks = sum(1 for method, _, _ in rows if method == 'generations')
+        p50 = PerformanceStats.percentile(latencies, 0.5)
+        p95 = PerformanceStats.percentile(latencies, 0.95)
+        print(f"{variant}: {len(rows)}件 / 処理時間 p50 {p50 / 1000 if p50 else 0:.1f}秒 "
+              f"p95 {p95 / 1000 if p95 else 0:.1f}秒 / フォールバック {fallbacks}件 / "
+              f"平均コスト ${sum(costs) / len(costs) if costs else 0:.3f}")
+
+
+def print_timeout_report():
+    """翻訳履歴の処理時間の系列で固定・適応タイムアウトを比較して表示"""
+    history_settings = app_config['history_settings']
+    history = TranslationHistory(Path(__file__).parent.parent / history_settings['database_file'])
+    try:
+        trace = history.latency_trace()
+    finally:
+        history.close()
+
+    timeout_settings = app_config['adaptive_timeouts']
+    static_timeouts = {'edit': app_config['api_settings']['timeout'],
+                       'generate': timeout_settings['fallback_timeout_sec']}
+    report = AdaptiveTimeouts.replay(trace, timeout_settings, static_timeouts)
+
+    print(f"再生: {report['requests']}件（適応タイムアウトで打ち切り {report['cut']}件）")
+    for name, label in (('static', "固定"), ('adaptive', "適応")):
+        waits = report[name]
+        if waits['max_ms'] is None:
+            continue
+        print(f"{label}: p50 {waits['p50_ms'] / 1000:.1f}秒 / p99 {waits['p99_ms'] / 1000:.1f}秒 / "
+              f"最大 {waits['max_ms'] / 1000:.1f}秒 / 合計 {waits['total_sec']:.0f}秒")
+    if report['requests']:
+        print(f"p99の短縮: {(report['static']['p99_ms'] - report['adaptive']['p99_ms']) / 1000:.1f}秒")
+
+
+def migrate_output_images(directory=''):
+    """既存の出力フォルダを出力ストアに移行し、削減した容量を表示"""
+    project_root = Path(__file__).parent.parent
+    images_dir = Path(directory) if directory else project_root / app_config['output_settings']['save_directory']
+    store_settings = app_config['output_store']
+    store = ContentStore(images_dir, store_settings['format'], store_settings['gc_grace_minutes'] * 60)
+
+    history = None
+    history_settings = app_config['history_settings']
+    if history_settings['enabled']:
+        history = TranslationHistory(project_root / history_settings['database_file'],
+                                     thumbnail_size=history_settings['thumbnail_size'])
+    try:
+        migrated, saved_bytes = store.migrate(images_dir, history)
+    finally:
+        if history is not None:
+            history.close()
+
+    usage = store.usage()
+    print(f"移行: {migrated}件 ({images_dir})")
+    print(f"削減: {saved_bytes / (1024 * 1024):.1f}MB")
+    print(f"ストア合計: blob {usage['blobs']}件 {usage['blob_bytes'] / (1024 * 1024):.1f}MB, "
+          f"ファイル名 {usage['names']}件 (重複排除・圧縮による削減 {usage['saved_bytes'] / (1024 * 1024):.1f}MB)")
+    if not store_settings['enabled']:
+        print("注意: output_store.enabledがfalseのため、新しい翻訳結果は従来どおり保存されます")
+
+
 def main():
     """メインエントリーポイント"""
+    parser = argparse.ArgumentParser(description="画像翻訳ツール")
+    parser.add_argument('--serve-cache', action='store_true',
+                        help="共有翻訳キャッシュの参照実装サーバーを起動（トレイアプリは起動しない）")
+    parser.add_argument('--cache-host', default='127.0.0.1', help="キャッシュサーバーの待ち受けアドレス")
+    parser.add_argument('--cache-port', type=int, default=8766, help="キャッシュサーバーの待ち受けポート")
+    parser.add_argument('--migrate-images', nargs='?', const='', metavar='DIR',
+                        help="出力フォルダ（省略時はsave_directory）の画像を出力ストアに移行して終了")
+    parser.add_argument('--prompt-report', action='store_true',
+                        help="プロンプト変種ごとのサイズと、翻訳履歴に記録された変種ごとの結果を表示して終了")
+    parser.add_argument('--timeout-report', action='store_true',
+                        help="翻訳履歴の処理時間を固定・適応タイムアウトで再生し、待ち時間を比較して終了")
+    args, _ = parser.parse_known_args()
+
+    if args.timeout_report:
+        print_timeout_report()
+        return
+
+    if args.prompt_report:
+        print_prompt_report()
+        return
+
+    if args.migrate_images is not None:
+        migrate_output_images(args.migrate_images)
+        return
+
+    if args.serve_cache:
+        cache_settings = app_config['shared_cache']
+        serve_shared_cache(args.cache_host, args.cache_port,
+                           Path(__file__).parent.parent / cache_settings['server_directory'],
+                           auth_token=cache_settings['auth_token'])
+        return
 
     try:
         logger.info("=" * 50)
@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# GUIを表示せずにmain.pyを読み込む
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'source'))
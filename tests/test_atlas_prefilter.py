@@ -0,0 +1,92 @@
+"""アトラスにまとめたキャプチャにもテキスト事前判定が適用されることの確認"""
+import copy
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+from PyQt5.QtCore import QCoreApplication
+
+import main
+
+
+@pytest.fixture(scope='module')
+def qt_app():
+    return QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+
+@pytest.fixture
+def config():
+    config = copy.deepcopy(main.app_config)
+    config['backends']['endpoints'] = [{'name': 'stub', 'type': 'stub', 'latency_ms': 0}]
+    config['cassettes']['mode'] = 'off'
+    config['adaptive_timeouts']['enabled'] = False
+    return config
+
+
+def text_capture(size=(480, 320)):
+    """文字列の行を模したキャプチャ"""
+    image = Image.new('RGB', size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for top in range(20, size[1] - 30, 26):
+        left = 20
+        while left < size[0] - 80:
+            draw.rectangle((left, top, left + 40, top + 12), fill=(30, 30, 30))
+            left += 52
+    return image
+
+
+def blank_capture(size=(400, 300)):
+    return Image.new('RGB', size, (200, 220, 240))
+
+
+def run_atlas(config, images):
+    packer = main.AtlasPacker()
+    jobs = [main.TranslationJob(image, 'english', 'japanese', mode='image_edit') for image in images]
+    layout = packer.pack([job.size for job in jobs])
+    thread = main.AtlasTranslationThread(jobs, layout, packer, config,
+                                         router=main.BackendRouter.from_config(config),
+                                         prompts=main.PromptTemplateLibrary.from_config(config))
+    events = {'skipped_jobs': [], 'finished': None, 'skipped': None}
+    thread.jobs_skipped.connect(lambda skipped, message: events['skipped_jobs'].extend(skipped))
+    thread.atlas_finished.connect(lambda results: events.__setitem__('finished', results))
+    thread.skipped.connect(lambda message: events.__setitem__('skipped', message))
+    thread.run()
+    return jobs, thread, events
+
+
+def test_text_free_captures_are_dropped_before_translation(qt_app, config):
+    images = [text_capture(), blank_capture(), text_capture((360, 240))]
+    jobs, thread, events = run_atlas(config, images)
+
+    assert events['skipped_jobs'] == [jobs[1]]
+    assert thread.jobs == [jobs[0], jobs[2]]
+    assert len(thread.layout['placements']) == 2
+    assert [result.size for result in events['finished']] == [jobs[0].size, jobs[2].size]
+    assert events['skipped'] is None
+
+
+def test_single_remaining_capture_is_still_translated(qt_app, config):
+    images = [blank_capture(), text_capture()]
+    jobs, thread, events = run_atlas(config, images)
+
+    assert events['skipped_jobs'] == [jobs[0]]
+    assert [result.size for result in events['finished']] == [jobs[1].size]
+
+
+def test_all_text_free_captures_skip_the_api_call(qt_app, config):
+    images = [blank_capture(), blank_capture((300, 200))]
+    jobs, thread, events = run_atlas(config, images)
+
+    assert events['skipped_jobs'] == jobs
+    assert events['finished'] is None
+    assert events['skipped'] is not None
+    assert thread.job_stats.get('method') != 'edits_atlas'
+
+
+def test_prefilter_disabled_keeps_every_capture(qt_app, config):
+    config['text_prefilter']['enabled'] = False
+    images = [text_capture(), blank_capture()]
+    jobs, thread, events = run_atlas(config, images)
+
+    assert events['skipped_jobs'] == []
+    assert len(events['finished']) == 2
@@ -0,0 +1,85 @@
+"""時刻付きの合成クリップボードイベントでデバウンサーの翻訳回数を確認するハーネス"""
+import pytest
+
+import main
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def simulate(events_ms, settle_ms=300, max_wait_ms=1500, poll_interval_ms=500):
+    """アプリと同じ手順（監視タイマーでoffer、確定予定時刻のタイマーでpoll）を時刻順に再生
+
+    events_msはクリップボードが変化した時刻（ms）。確定した内容（キー）の一覧を返す。
+    """
+    clock = FakeClock()
+    debouncer = main.ClipboardDebouncer(settle_ms, max_wait_ms, clock=clock)
+    changes = sorted(events_ms)
+    end_ms = (changes[-1] if changes else 0) + max_wait_ms + poll_interval_ms * 2
+    dispatched = []
+    flush_at = None
+    clipboard = None
+    next_change = 0
+    last_seen = None
+
+    def schedule_flush():
+        remaining = debouncer.time_until_ready()
+        return None if remaining is None else clock.now + remaining
+
+    step_ms = 1
+    for tick in range(0, int(end_ms) + 1, step_ms):
+        clock.now = tick / 1000
+        while next_change < len(changes) and changes[next_change] <= tick:
+            clipboard = f"image-{next_change}"
+            next_change += 1
+        # check_clipboard: 監視間隔ごとに新しい内容ならoffer
+        if tick % poll_interval_ms == 0 and clipboard is not None and clipboard != last_seen:
+            last_seen = clipboard
+            debouncer.offer(clipboard, None)
+            flush_at = schedule_flush()
+        # flush_clipboard_debounce: 予約した時刻にpoll、未確定なら予約し直す
+        if flush_at is not None and clock.now >= flush_at:
+            ready = debouncer.poll()
+            if ready is None:
+                flush_at = schedule_flush()
+            else:
+                dispatched.append(ready[0])
+                flush_at = None
+    return dispatched
+
+
+def test_burst_within_settle_dispatches_once():
+    # 監視間隔より短い間隔の連続コピーは最後の1枚だけ
+    dispatched = simulate([0, 40, 80, 120, 160], settle_ms=300, poll_interval_ms=50)
+    assert dispatched == ["image-4"]
+
+
+@pytest.mark.parametrize('count', [1, 3, 6])
+def test_spaced_events_dispatch_each(count):
+    dispatched = simulate([index * 2000 for index in range(count)], settle_ms=300, poll_interval_ms=50)
+    assert dispatched == [f"image-{index}" for index in range(count)]
+
+
+def test_continuous_updates_dispatch_at_max_wait():
+    # settle_msより短い間隔で更新が続く場合はmax_wait_msごとに打ち切って確定
+    events = list(range(0, 5000, 100))
+    dispatched = simulate(events, settle_ms=300, max_wait_ms=1500, poll_interval_ms=100)
+    assert len(dispatched) == 4
+    assert dispatched[-1] == f"image-{len(events) - 1}"
+
+
+def test_poll_before_settle_returns_nothing():
+    clock = FakeClock()
+    debouncer = main.ClipboardDebouncer(300, 1500, clock=clock)
+    debouncer.offer("a", None)
+    clock.now = 0.299
+    assert debouncer.poll() is None
+    assert debouncer.time_until_ready() == pytest.approx(0.001)
+    clock.now = 0.300
+    assert debouncer.poll() == ("a", None)
+    assert debouncer.poll() is None
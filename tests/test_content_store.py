@@ -0,0 +1,176 @@
+"""出力ストア: 同じ画像の重複排除とハードリンク、GC、既存の出力フォルダの移行の確認"""
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageDraw
+
+import main
+
+
+def translated(seed=0, size=(320, 200)):
+    image = Image.new('RGB', size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for index in range(6):
+        top = 10 + index * 30
+        draw.rectangle((10, top, 60 + (index * 37 + seed * 53) % 240, top + 14), fill=(20, 20, 20))
+    return image
+
+
+def blobs(store):
+    return sorted(path for path in store.directory.glob('??/*') if path.suffix != '.tmp')
+
+
+def png_bytes(image, **kwargs):
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', **kwargs)
+    return buffer.getvalue()
+
+
+def test_same_bytes_saved_twice_share_one_blob(tmp_path):
+    store = main.ContentStore(tmp_path)
+    first = store.save(translated(), tmp_path / 'translated_20250101_120000.png')
+    second = store.save(translated(), tmp_path / 'translated_20250101_120500.png')
+
+    assert first == str(tmp_path / 'translated_20250101_120000.png')
+    assert second == str(tmp_path / 'translated_20250101_120500.png')
+    [blob] = blobs(store)
+    entries = store.read_manifest()
+    assert [entry['name'] for entry in entries] == ['translated_20250101_120000.png', 'translated_20250101_120500.png']
+    assert {entry['hash'] for entry in entries} == {blob.stem}
+    assert all(entry['linked'] for entry in entries)
+
+    # 利用者向けのファイル名はどちらもblobへのハードリンク
+    assert os.path.samefile(first, blob) and os.path.samefile(second, blob)
+    assert blob.stat().st_nlink == 3
+    with Image.open(first) as image:
+        assert image.convert('RGB').tobytes() == translated().tobytes()
+
+    usage = store.usage()
+    assert (usage['blobs'], usage['names']) == (1, 2)
+    assert usage['saved_bytes'] == blob.stat().st_size
+
+
+def test_key_is_the_pixels_not_the_encoding(tmp_path):
+    store = main.ContentStore(tmp_path)
+    image = translated()
+    store.save(image, tmp_path / 'a.png', encoded=png_bytes(image, compress_level=0))
+    store.save(image, tmp_path / 'b.png', encoded=png_bytes(image, compress_level=9))
+    store.save(translated(seed=1), tmp_path / 'c.png')
+
+    assert len(blobs(store)) == 2
+    assert main.ContentStore.content_hash(image) == main.ContentStore.content_hash(image.copy())
+    assert main.ContentStore.content_hash(image) != main.ContentStore.content_hash(image.convert('RGBA'))
+
+
+def test_encoded_data_in_another_format_is_reencoded(tmp_path):
+    store = main.ContentStore(tmp_path, image_format='webp')
+    image = translated()
+    output = store.save(image, tmp_path / 'a.png', encoded=png_bytes(image))
+
+    assert output == str(tmp_path / 'a.webp')
+    [blob] = blobs(store)
+    assert blob.suffix == '.webp' and blob.read_bytes().startswith(b'RIFF')
+    with Image.open(output) as decoded:
+        assert decoded.convert('RGB').tobytes() == image.tobytes()
+
+
+def test_blob_path_is_used_when_hardlinks_are_unavailable(tmp_path, monkeypatch):
+    store = main.ContentStore(tmp_path, gc_grace_seconds=0)
+
+    def no_link(source, target):
+        raise OSError('hard links not supported')
+
+    monkeypatch.setattr(main.os, 'link', no_link)
+    output = store.save(translated(), tmp_path / 'a.png')
+
+    [blob] = blobs(store)
+    assert output == str(blob) and store.owns(output)
+    assert not (tmp_path / 'a.png').exists()
+    assert store.read_manifest()[0]['linked'] is False
+
+    # 履歴がblobのパスを直接参照している間はGCで消さない
+    assert store.collect_garbage(referenced=[output]) == (0, 0)
+    assert store.collect_garbage()[0] == 1
+    assert blobs(store) == [] and store.read_manifest() == []
+
+
+def test_garbage_collection_waits_for_every_link_and_the_grace_period(tmp_path):
+    store = main.ContentStore(tmp_path, gc_grace_seconds=0)
+    first = store.save(translated(), tmp_path / 'a.png')
+    second = store.save(translated(), tmp_path / 'b.png')
+    other = store.save(translated(seed=1), tmp_path / 'c.png')
+
+    os.unlink(first)
+    assert store.collect_garbage() == (0, 0)
+    assert len(blobs(store)) == 2
+    assert [entry['name'] for entry in store.read_manifest()] == ['b.png', 'c.png']
+
+    os.unlink(second)
+    size = main.ContentStore(tmp_path).blob_path(main.ContentStore.content_hash(translated())).stat().st_size
+    assert store.collect_garbage() == (1, size)
+    assert [entry['name'] for entry in store.read_manifest()] == ['c.png']
+    assert os.path.samefile(other, blobs(store)[0])
+
+    # 猶予期間内のblobは参照がなくても残す
+    recent = main.ContentStore(tmp_path, gc_grace_seconds=3600)
+    os.unlink(other)
+    assert recent.collect_garbage() == (0, 0)
+    assert len(blobs(recent)) == 1
+
+
+def test_migrate_deduplicates_an_existing_output_folder(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    for name, seed in [('old_1.png', 0), ('old_2.png', 1), ('old_3.png', 0)]:
+        translated(seed).save(images / name, format='PNG', compress_level=0)
+    sizes = sum(path.stat().st_size for path in images.glob('*.png'))
+
+    store = main.ContentStore(images)
+    migrated, saved_bytes = store.migrate(images)
+
+    assert migrated == 3
+    assert len(blobs(store)) == 2
+    assert saved_bytes == sizes - sum(blob.stat().st_size for blob in blobs(store))
+    assert os.path.samefile(images / 'old_1.png', images / 'old_3.png')
+    assert all((images / name).stat().st_nlink > 1 for name in ('old_1.png', 'old_2.png', 'old_3.png'))
+    with Image.open(images / 'old_2.png') as image:
+        assert image.convert('RGB').tobytes() == translated(1).tobytes()
+
+    # 移行済みのファイルは再移行しない
+    assert store.migrate(images) == (0, 0)
+
+
+def test_migrate_to_webp_updates_history_paths(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    translated().save(images / 'old.png')
+    history = main.TranslationHistory(tmp_path / 'history.db')
+    try:
+        history.record('hash-a', 'japanese', 'english', str(images / 'old.png'))
+        store = main.ContentStore(images, image_format='webp')
+        assert store.migrate(images, history)[0] == 1
+
+        assert not (images / 'old.png').exists()
+        assert (images / 'old.webp').exists()
+        assert history.find_by_hash('hash-a', 'japanese', 'english')['output_path'] == str(images / 'old.webp')
+    finally:
+        history.close()
+
+
+def test_migrate_output_images_reports_the_savings(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(main.app_config['history_settings'], 'enabled', False)
+    for name in ('a.png', 'b.png'):
+        translated().save(tmp_path / name, format='PNG', compress_level=0)
+
+    main.migrate_output_images(str(tmp_path))
+
+    output = capsys.readouterr().out
+    assert f"移行: 2件 ({tmp_path})" in output
+    assert "blob 1件" in output and "ファイル名 2件" in output
+    assert len(blobs(main.ContentStore(tmp_path))) == 1
+
+
+@pytest.mark.parametrize('path, owned', [('.store/ab/abc.png', True), ('a.png', False), ('.store', False)])
+def test_owns_only_paths_inside_the_store(tmp_path, path, owned):
+    assert main.ContentStore(tmp_path).owns(tmp_path / path) is owned
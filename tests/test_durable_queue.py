@@ -0,0 +1,147 @@
+"""永続ジョブキュー: 数百件の登録・状態更新のあと開き直して、未完了のジョブだけが再開されることの確認"""
+import functools
+import time
+from types import SimpleNamespace
+
+from PIL import Image
+
+import main
+
+JOB_COUNT = 400
+
+
+def make_job(index):
+    image = Image.new('RGB', (32, 24), (index % 256, index // 256, 128))
+    return main.TranslationJob(image, 'japanese', 'english', source_hash=f'hash-{index}',
+                               mode='image_edit', source='clipboard')
+
+
+def open_store(tmp_path):
+    return main.DurableJobStore(tmp_path / 'jobs.db', tmp_path / 'job_images')
+
+
+def enqueue(store, count=JOB_COUNT):
+    return [store.add(make_job(index)) for index in range(count)]
+
+
+def settle(store, records):
+    """登録順に 完了 / 取り消し / 再試行待ち / 失敗 / 未着手 の状態にする"""
+    expected = {status: [] for status in ('done', 'cancelled', 'retry', 'failed', 'pending')}
+    for index, record in enumerate(records):
+        status = list(expected)[index % 5]
+        if status == 'retry':
+            record['attempts'] += 1
+            record['next_attempt_at'] = time.time() + 600
+        if status != 'pending':
+            store.update(record, status, 'タイムアウト' if status in ('retry', 'failed') else None)
+        expected[status].append(record)
+    return expected
+
+
+def test_unfinished_jobs_survive_a_restart(tmp_path):
+    store = open_store(tmp_path)
+    started = time.perf_counter()
+    records = enqueue(store)
+    expected = settle(store, records)
+    # 登録・更新は書き込みスレッドに渡すだけで、呼び出し側はディスクを待たない
+    assert time.perf_counter() - started < 2.0
+    assert store.flush(timeout=30)
+    store.close()
+
+    reopened = open_store(tmp_path)
+    try:
+        resumed = reopened.resume()
+        unfinished = sorted(expected['retry'] + expected['pending'], key=lambda record: record['created_at'])
+        assert [record['id'] for record in resumed] == [record['id'] for record in unfinished]
+
+        by_id = {record['id']: record for record in resumed}
+        for record in expected['retry']:
+            assert by_id[record['id']]['status'] == 'retry'
+            assert by_id[record['id']]['attempts'] == 1
+            assert by_id[record['id']]['last_error'] == 'タイムアウト'
+            assert by_id[record['id']]['next_attempt_at'] == record['next_attempt_at']
+        assert all(by_id[record['id']]['source_hash'] == record['source_hash'] for record in unfinished)
+
+        # 完了・取り消し済みのジョブの画像は削除され、未完了のジョブの画像は残る
+        remaining_images = {path.name for path in (tmp_path / 'job_images').glob('*.png')}
+        assert remaining_images == {f"{record['id']}.png" for record in unfinished + expected['failed']}
+    finally:
+        reopened.close()
+
+
+def test_unflushed_store_can_be_reopened_after_a_crash(tmp_path):
+    store = open_store(tmp_path)
+    records = enqueue(store, 300)
+    store.update(records[0], 'done')
+    assert store.flush(timeout=30)
+
+    # close() を呼ばずに（異常終了を模して）別の接続で開き直す
+    reopened = open_store(tmp_path)
+    try:
+        assert [record['id'] for record in reopened.resume()] == [record['id'] for record in records[1:]]
+    finally:
+        reopened.close()
+        store.close()
+
+
+def test_jobs_settled_before_the_write_are_never_stored(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        # 書き込みスレッドが取り出す前に登録と完了・取り消しを済ませ、1回の書き込みにまとめさせる
+        with store._ops_ready:
+            records = enqueue(store, 150)
+            for record in records[::2]:
+                store.update(record, 'done')
+            for record in records[1::4]:
+                store.update(record, 'cancelled')
+        assert store.flush(timeout=30)
+
+        kept = [record for index, record in enumerate(records) if index % 4 == 3]
+        assert [record['id'] for record in store.resume()] == [record['id'] for record in kept]
+        assert len(list((tmp_path / 'job_images').glob('*.png'))) == len(kept)
+    finally:
+        store.close()
+
+
+def test_compact_removes_settled_rows_and_expired_failures(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        records = enqueue(store, 200)
+        expected = settle(store, records)
+        store.compact(failed_retention_days=0)
+        assert store.flush(timeout=30)
+
+        with store._lock:
+            statuses = [row['status'] for row in store._conn.execute("SELECT status FROM jobs")]
+        assert sorted(set(statuses)) == ['pending', 'retry']
+        assert len(statuses) == len(expected['retry']) + len(expected['pending'])
+        assert len(list((tmp_path / 'job_images').glob('*.png'))) == len(statuses)
+    finally:
+        store.close()
+
+
+def test_resumed_record_restores_the_job(tmp_path):
+    store = open_store(tmp_path)
+    source = make_job(7)
+    store.add(source)
+    assert store.flush(timeout=30)
+    record = store.resume()[0]
+
+    app = SimpleNamespace(durable_store=store, png_passthrough_enabled=lambda: False,
+                          logger=main.logging.getLogger('ImageTranslator.Test'))
+    load_durable_job = functools.partial(main.ImageTranslatorApp.load_durable_job, app)
+    try:
+        job = load_durable_job(record)
+        assert job.durable is record
+        assert (job.from_language, job.to_language, job.mode, job.source) == (
+            'japanese', 'english', 'image_edit', 'clipboard')
+        assert job.source_hash == 'hash-7'
+        assert job.image.convert('RGB').tobytes() == source.image.tobytes()
+
+        # 画像が消えていれば失敗として記録し、次回以降は再開しない
+        main.Path(record['image_path']).unlink()
+        assert load_durable_job(dict(record)) is None
+        assert store.flush(timeout=30)
+        assert store.resume() == []
+    finally:
+        store.close()
@@ -0,0 +1,138 @@
+"""複数フレーム画像の重複除去・再構成順序と、フレームのジョブの並行実行の確認"""
+import functools
+from io import BytesIO
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw, ImageSequence
+
+import main
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+
+
+def screen(kind, size=(64, 48)):
+    """フレームの種類ごとに異なる図形を描いた画面"""
+    image = Image.new('RGB', size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    if kind == 'a':
+        draw.rectangle((4, 4, 30, 20), fill=(0, 0, 0))
+    elif kind == 'b':
+        draw.ellipse((20, 10, 60, 44), fill=(0, 0, 0))
+    else:
+        draw.line((0, 47, 63, 0), fill=(0, 0, 0), width=6)
+    return image
+
+
+def make_gif(frames, durations):
+    buffer = BytesIO()
+    frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:], duration=durations, loop=0)
+    return buffer.getvalue()
+
+
+def load(raw, near_distance=3):
+    return main.FrameSequence.load(raw, 'test.gif', near_distance, max_frames=100, max_pixels=10 ** 7)
+
+
+def test_duplicate_frames_are_translated_once():
+    near_c = screen('c')
+    near_c.putpixel((10, 10), (0, 0, 0))
+    frames = [screen('a'), screen('b'), screen('a'), screen('c'), near_c, screen('b')]
+    sequence = load(make_gif(frames, [100, 200, 100, 300, 300, 200]))
+
+    assert len(sequence.unique_frames) == 3
+    assert sequence.frame_map == [0, 1, 0, 2, 2, 1]
+    assert sequence.durations == [100, 200, 100, 300, 300, 200]
+
+
+def test_results_arriving_out_of_order_are_reassembled_in_frame_order(tmp_path):
+    frames = [screen('a'), screen('b'), screen('a'), screen('c'), screen('b')]
+    sequence = load(make_gif(frames, [100, 150, 100, 250, 150]))
+    assert sequence.frame_map == [0, 1, 0, 2, 1]
+
+    # 並行実行したフレームは完了順がばらばら（最後の結果でそろう）
+    translated = {index: Image.new('RGB', frame.size, COLORS[index])
+                  for index, frame in enumerate(sequence.unique_frames)}
+    assert not sequence.add_result(2, translated[2], None)
+    assert not sequence.add_result(0, translated[0], None)
+    assert sequence.add_result(1, translated[1], None)
+
+    saved = sequence.save(tmp_path)
+    with Image.open(saved['path']) as image:
+        colors = [frame.convert('RGB').getpixel((0, 0)) for frame in ImageSequence.Iterator(image)]
+        assert image.n_frames == 5
+    assert colors == [COLORS[index] for index in sequence.frame_map]
+
+
+def fake_app(max_concurrent_jobs, max_concurrent_frames):
+    """dispatch_jobs / take_next_jobs が参照する属性だけを持つアプリの代役"""
+    config = {
+        'job_settings': {'max_concurrent_jobs': max_concurrent_jobs},
+        'multi_frame': {'max_concurrent_frames': max_concurrent_frames},
+        'atlas_packing': {'enabled': True},
+    }
+    app = SimpleNamespace(config=config, pending_jobs=[], pending_frame_jobs=[], active_threads=[],
+                          atlas_packer=main.AtlasPacker(), started=[],
+                          logger=main.logging.getLogger('ImageTranslator.Test'),
+                          refill_from_durable_backlog=lambda: None)
+
+    def start_translation_thread(jobs, layout=None):
+        app.started.append((jobs, layout))
+        app.active_threads.append(SimpleNamespace(job=jobs[0] if layout is None else
+                                                  main.TranslationJob(Image.new('RGB', (8, 8)), 'japanese',
+                                                                      'english', source='atlas')))
+
+    app.start_translation_thread = start_translation_thread
+    app.take_next_jobs = functools.partial(main.ImageTranslatorApp.take_next_jobs, app)
+    app.count_active_threads = functools.partial(main.ImageTranslatorApp.count_active_threads, app)
+    return app
+
+
+def small_job(source='clipboard'):
+    return main.TranslationJob(Image.new('RGB', (200, 120)), 'japanese', 'english', mode='image_edit',
+                               source=source)
+
+
+def frame_jobs(count):
+    sequence = SimpleNamespace(cancelled=False)
+    jobs = []
+    for index in range(count):
+        job = small_job(source='frames')
+        job.frame_group = sequence
+        job.frame_index = index
+        job.allow_packing = False
+        jobs.append(job)
+    return sequence, jobs
+
+
+def test_frames_run_concurrently_beside_regular_jobs_and_are_never_packed():
+    app = fake_app(max_concurrent_jobs=1, max_concurrent_frames=3)
+    regular = [small_job(), small_job()]
+    _, frames = frame_jobs(5)
+    app.pending_jobs.extend(regular)
+    app.pending_frame_jobs.extend(frames)
+
+    main.ImageTranslatorApp.dispatch_jobs(app)
+
+    atlas_jobs, layout = app.started[0]
+    assert atlas_jobs == regular and layout is not None
+    started_frames = [jobs[0] for jobs, layout in app.started[1:]]
+    assert started_frames == frames[:3]
+    assert all(layout is None for _, layout in app.started[1:])
+    assert app.pending_frame_jobs == frames[3:]
+
+    # フレームのスレッドが1件終われば次のフレームを開始
+    app.active_threads = [thread for thread in app.active_threads if thread.job is not frames[0]]
+    main.ImageTranslatorApp.dispatch_jobs(app)
+    assert app.started[-1][0] == [frames[3]]
+
+
+def test_frames_of_a_cancelled_sequence_are_not_started():
+    app = fake_app(max_concurrent_jobs=1, max_concurrent_frames=2)
+    sequence, frames = frame_jobs(3)
+    sequence.cancelled = True
+    app.pending_frame_jobs.extend(frames)
+
+    main.ImageTranslatorApp.dispatch_jobs(app)
+
+    assert app.started == []
+    assert app.pending_frame_jobs == []
@@ -0,0 +1,62 @@
+"""GET /jobs/<id>/result の wait パラメータの検証と上限への丸めの確認"""
+import json
+import logging
+import threading
+import time
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import main
+
+SYNC_TIMEOUT_SEC = 0.3
+
+
+@pytest.fixture
+def ipc_server():
+    """認証なし・sync_timeout_sec を短くしたIPCサーバーと、待機中のジョブ1件"""
+    board = main.IpcJobBoard()
+    board.create(1)
+    owner = SimpleNamespace(board=board, logger=logging.getLogger('ImageTranslator.IPC'),
+                            settings={'auth_token': '', 'sync_timeout_sec': SYNC_TIMEOUT_SEC})
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), main.IpcRequestHandler)
+    httpd.daemon_threads = True
+    httpd.owner = owner
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get_result(port, wait):
+    connection = HTTPConnection('127.0.0.1', port, timeout=5)
+    start = time.monotonic()
+    connection.request('GET', f'/jobs/1/result?wait={wait}')
+    response = connection.getresponse()
+    body = json.loads(response.read())
+    connection.close()
+    return response.status, body, time.monotonic() - start
+
+
+@pytest.mark.parametrize('wait', ['abc', 'nan', 'NaN', '1e'])
+def test_invalid_wait_is_rejected(ipc_server, wait):
+    status, body, _ = get_result(ipc_server, wait)
+    assert status == 400
+    assert 'wait' in body['error']
+
+
+@pytest.mark.parametrize('wait', ['-5', '-inf'])
+def test_negative_wait_returns_immediately(ipc_server, wait):
+    status, body, elapsed = get_result(ipc_server, wait)
+    assert status == 202
+    assert body['status'] == 'queued'
+    assert elapsed < SYNC_TIMEOUT_SEC
+
+
+@pytest.mark.parametrize('wait', ['3600', 'inf', '1e308'])
+def test_wait_is_clamped_to_sync_timeout(ipc_server, wait):
+    status, _, elapsed = get_result(ipc_server, wait)
+    assert status == 202
+    assert SYNC_TIMEOUT_SEC <= elapsed < SYNC_TIMEOUT_SEC + 2
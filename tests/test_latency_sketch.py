@@ -0,0 +1,48 @@
+"""応答時間スケッチの分位点が重みの半減後も真の分位点から外れないことの確認"""
+import math
+import random
+
+import main
+
+
+def true_quantile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+def test_quantile_within_relative_accuracy():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(math.log(20), 0.5) for _ in range(1500)]
+    sketch = main.LatencySketch(relative_accuracy=0.02, max_count=2000)
+    for value in values:
+        sketch.add(value)
+    for fraction in (0.5, 0.9, 0.99):
+        assert abs(sketch.quantile(fraction) / true_quantile(values, fraction) - 1) <= 0.03
+
+
+def test_halving_keeps_tail_buckets():
+    rng = random.Random(2)
+    sketch = main.LatencySketch(relative_accuracy=0.02, max_count=2000)
+    values = []
+    for _ in range(2001):
+        values.append(rng.lognormvariate(math.log(20), 0.5))
+        sketch.add(values[-1])
+
+    # 最初の半減の直後も全観測の重みが等しく残り、p99は観測値の分位点と一致する
+    assert sketch.count == len(values) / 2
+    assert abs(sketch.quantile(0.99) / true_quantile(values, 0.99) - 1) <= 0.03
+
+    # 半減を繰り返した定常状態でもp99が分布の真の値より過小にならない
+    for _ in range(20000):
+        sketch.add(rng.lognormvariate(math.log(20), 0.5))
+    expected_p99 = math.exp(math.log(20) + 0.5 * 2.3263)
+    assert sketch.quantile(0.99) / expected_p99 > 0.95
+
+
+def test_fractional_counts_round_trip():
+    sketch = main.LatencySketch(max_count=10)
+    for value in range(1, 40):
+        sketch.add(value * 10.0)
+    restored = main.LatencySketch.from_dict(sketch.to_dict())
+    assert restored.count == sketch.count
+    assert restored.quantile(0.99) == sketch.quantile(0.99)
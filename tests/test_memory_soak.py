@@ -0,0 +1,46 @@
+"""取り込み→翻訳を100サイクル繰り返してもメモリが増え続けないことの確認（scripts/soak.py の短縮版）"""
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+import main
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+import soak  # noqa: E402
+
+CYCLES = 100
+WARMUP_CYCLES = 20
+MAX_RSS_GROWTH_MB = 30.0
+MAX_TRACED_GROWTH_MB = 5.0
+
+
+@pytest.fixture(scope='module')
+def qt_app():
+    return QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+
+def test_capture_translate_cycles_do_not_leak(qt_app):
+    config = soak.soak_config()
+    # マスク生成は状態を持たない画像処理で時間の大半を占めるため、スイート内では省略する
+    config['text_region_mask']['enabled'] = False
+    router = main.BackendRouter.from_config(config)
+    prompts = main.PromptTemplateLibrary.from_config(config)
+    rng = random.Random(0)
+
+    for _ in range(WARMUP_CYCLES):
+        soak.run_cycle(config, router, prompts, rng)
+    tracemalloc.start()
+    try:
+        base_rss, base_traced = soak.sample()
+        for _ in range(CYCLES):
+            soak.run_cycle(config, router, prompts, rng)
+        rss, traced = soak.sample()
+    finally:
+        tracemalloc.stop()
+
+    assert rss - base_rss <= MAX_RSS_GROWTH_MB
+    assert traced - base_traced <= MAX_TRACED_GROWTH_MB
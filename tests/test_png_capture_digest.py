@@ -0,0 +1,51 @@
+"""クリップボードのPNGをそのまま送る経路とQImage経由の経路で履歴・キャッシュのキーが一致することの確認"""
+import random
+from io import BytesIO
+
+from PIL import Image
+from PyQt5.QtGui import QImage
+
+import main
+
+
+def screenshot_png(size=(1536, 1024), seed=0):
+    rng = random.Random(seed)
+    image = Image.new('RGB', size, (245, 245, 245))
+    for _ in range(200):
+        x, y = rng.randrange(size[0] - 40), rng.randrange(size[1] - 12)
+        image.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (x, y, x + 40, y + 12))
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_native_png_digest_matches_decoded_clipboard_path():
+    png = screenshot_png()
+    assert main.passthrough_png_size(png) == (1536, 1024)
+
+    image, digest = main.decode_png_capture(png)
+
+    # QImage経由（clipboard.image() → qimage_to_pil → compute_source_digest）と同じキー
+    decoded_path = main.qimage_to_pil(QImage.fromData(png))
+    assert digest == main.compute_source_digest(decoded_path)
+    assert image.mode == 'RGB' and image.size == (1536, 1024)
+
+
+def test_shared_cache_key_matches_between_paths():
+    png = screenshot_png(seed=1)
+    image, _ = main.decode_png_capture(png)
+    decoded_path = main.qimage_to_pil(QImage.fromData(png))
+    config = main.app_config
+    assert (main.SharedCacheClient.make_key(image, 'japanese', 'english', config)
+            == main.SharedCacheClient.make_key(decoded_path, 'japanese', 'english', config))
+
+
+def test_thread_reuses_the_image_decoded_for_the_digest():
+    png = screenshot_png(seed=2)
+    image, digest = main.decode_png_capture(png)
+    job = main.TranslationJob(image, 'japanese', 'english', source_hash=digest, native_png=png)
+    thread = main.TranslationThread(job, main.app_config)
+
+    # 事前判定・サムネイル用の画素はデコード済みの画像をそのまま使い、送信はPNGのまま
+    assert thread.image is image
+    assert job.size == (1536, 1024)
@@ -0,0 +1,92 @@
+"""assets/prompts のテンプレートの組み立て・サイズ集計と、重みによる版の振り分けの確認"""
+import re
+from pathlib import Path
+
+import pytest
+
+import main
+
+PROMPT_DIR = Path(main.__file__).parent / 'assets' / 'prompts'
+
+
+@pytest.fixture
+def library():
+    return main.PromptTemplateLibrary(PROMPT_DIR, {'optimized': {'1': 0.7, '2': 0.3}})
+
+
+def test_bundled_templates_are_loaded(library):
+    assert {('optimized', 1), ('optimized', 2), ('masked', 1), ('fallback', 1)} <= set(library.templates)
+    assert all('body' in sections for sections in library.templates.values())
+
+
+@pytest.mark.parametrize('name', ['optimized', 'masked', 'fallback'])
+def test_rendered_prompt_fills_every_placeholder(library, name):
+    prompt = library.render(name, 'job-1', 'japanese', 'tagalog', '1536x1024', 'vertical')
+    text = prompt['text']
+
+    assert 'Japanese' in text and 'Tagalog' in text
+    assert not re.search(r'\{\w+\}', text)
+    assert '\n\n\n' not in text and text == text.strip()
+    assert prompt['variant'].startswith(f'{name}.v')
+
+
+def test_optional_parts_follow_size_padding_and_language_pair():
+    library = main.PromptTemplateLibrary(PROMPT_DIR)
+    sections = library.templates[('optimized', 2)]
+
+    landscape = library.render('optimized', 'job-1', 'japanese', 'tagalog', '1536x1024', 'vertical')['text']
+    assert sections['aspect.1536x1024'] in landscape
+    assert sections['padding.vertical'] in landscape
+    assert 'wikang Tsino' in landscape
+
+    # 該当する部品がなければ何も差し込まず、空行も残さない
+    plain = library.render('optimized', 'job-1', 'english', 'japanese', '1024x1024', 'none')['text']
+    assert sections['aspect.1536x1024'] not in plain and sections['padding.vertical'] not in plain
+    assert 'wikang Tsino' not in plain
+    assert len(plain) < len(landscape)
+
+
+def test_size_accounting_matches_the_rendered_text(library):
+    prompt = library.render('masked', 'job-1', 'english', 'japanese')
+    assert prompt['bytes'] == len(prompt['text'].encode('utf-8'))
+    assert prompt['tokens'] == main.PromptTemplateLibrary.estimate_tokens(prompt['text'])
+
+    for job_id in ('job-2', 'job-3'):
+        assert library.render('masked', job_id, 'english', 'japanese') is prompt
+    assert library.usage['masked.v1'] == {
+        'requests': 3, 'bytes': 3 * prompt['bytes'], 'tokens': 3 * prompt['tokens']}
+
+
+def test_token_estimate():
+    estimate = main.PromptTemplateLibrary.estimate_tokens
+    assert estimate('') == 0
+    assert estimate('abcd') == 1
+    assert estimate('abcde') == 2
+    assert estimate('あい') == 2
+    assert estimate('\U0001F600') == 2
+    assert estimate('ab翻訳') == 3
+
+
+def test_weighted_versions_split_jobs_deterministically(library):
+    job_ids = [f'job-{index}' for index in range(2000)]
+    versions = [library.choose_version('optimized', job_id) for job_id in job_ids]
+
+    # 同じジョブは常に同じ版（再試行でも比較対象が入れ替わらない）
+    assert versions == [library.choose_version('optimized', job_id) for job_id in job_ids]
+    assert set(versions) == {1, 2}
+    assert versions.count(1) / len(versions) == pytest.approx(0.7, abs=0.04)
+
+    for job_id in job_ids[:50]:
+        library.render('optimized', job_id, 'japanese', 'english')
+    usage = library.usage
+    assert usage['optimized.v1']['requests'] + usage['optimized.v2']['requests'] == 50
+    assert usage['optimized.v1']['requests'] == versions[:50].count(1)
+
+
+def test_zero_weight_and_missing_weights():
+    library = main.PromptTemplateLibrary(PROMPT_DIR, {'optimized': {'1': 1.0, '2': 0.0, '9': 5.0}})
+    assert {library.choose_version('optimized', f'job-{index}') for index in range(200)} == {1}
+
+    # 重みの設定がない名前は最新版
+    assert main.PromptTemplateLibrary(PROMPT_DIR).choose_version('optimized', 'job-1') == 2
+    assert library.choose_version('masked', 'job-1') == 1
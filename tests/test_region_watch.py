@@ -0,0 +1,106 @@
+"""画面領域の監視: 変化して落ち着いたフレームだけが翻訳に回り、変化のない間は何も出さないことの確認"""
+import copy
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+import main
+
+SETTINGS = copy.deepcopy(main.app_config['region_watch'])
+SETTINGS.update({'interval_ms': 500, 'max_interval_ms': 4000, 'stable_grabs': 2})
+
+
+class ListFrameSource:
+    """指定したフレームを順に返すフレームソース"""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.grabs = 0
+
+    def grab(self):
+        frame = self.frames[min(self.grabs, len(self.frames) - 1)]
+        self.grabs += 1
+        return frame.copy()
+
+
+def screen(lines, size=(640, 360)):
+    image = Image.new('RGB', size, (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    for index in range(lines):
+        top = 20 + index * 40
+        draw.rectangle((20, top, 400 + index * 20, top + 16), fill=(40, 40, 40))
+    return image
+
+
+def poll_all(watcher, count):
+    return [watcher.poll() for _ in range(count)]
+
+
+def test_each_synthetic_scene_is_emitted_once_after_it_settles():
+    change_every, scenes = 6, 5
+    watcher = main.ScreenRegionWatcher(main.SyntheticFrameSource((640, 360), change_every, settle_grabs=2), SETTINGS)
+    frames = poll_all(watcher, change_every * scenes)
+
+    emitted = [index for index, frame in enumerate(frames) if frame is not None]
+    # 描画途中（2回）→ 描き終わり → 落ち着いたことを2回確認してから1回だけ
+    assert emitted == [scene * change_every + 4 for scene in range(scenes)]
+    assert watcher.stats == {'grabs': 30, 'submitted': scenes, 'grab_ms': watcher.stats['grab_ms']}
+
+    # 出したのは描画途中ではなく描き終わった画面
+    reference = main.SyntheticFrameSource((640, 360), change_every, settle_grabs=2)
+    for index in emitted:
+        reference.grabs = index
+        assert frames[index].tobytes() == reference.grab().tobytes()
+
+
+def test_unchanged_screen_emits_nothing_and_backs_off():
+    watcher = main.ScreenRegionWatcher(ListFrameSource([screen(3)]), SETTINGS)
+    frames = poll_all(watcher, 12)
+
+    assert [index for index, frame in enumerate(frames) if frame is not None] == [2]
+    assert watcher.current_interval_ms == SETTINGS['max_interval_ms']
+
+
+def test_small_changes_and_returning_to_the_translated_screen_are_ignored():
+    base = screen(3)
+    cursor = base.copy()
+    cursor.paste((0, 0, 0), (600, 300, 602, 316))  # 点滅するカーソル程度の変化
+    popup = screen(6)
+    watcher = main.ScreenRegionWatcher(
+        ListFrameSource([base] * 3 + [cursor, base] * 3 + [popup] + [base] * 4 + [popup] * 4), SETTINGS)
+    frames = poll_all(watcher, 3 + 6 + 1 + 4 + 4)
+
+    emitted = [index for index, frame in enumerate(frames) if frame is not None]
+    # 最初の画面と、最後に表示が落ち着いたポップアップだけ（一瞬出たポップアップは無視）
+    assert emitted == [2, 16]
+    assert frames[16].tobytes() == popup.tobytes()
+
+
+def test_app_submits_only_emitted_frames_and_reschedules_the_poll():
+    submitted = []
+    timer = SimpleNamespace(intervals=[])
+    timer.start = timer.intervals.append
+    app = SimpleNamespace(region_watcher=None, watch_timer=timer, submit_watch_frame=submitted.append,
+                          logger=main.logging.getLogger('ImageTranslator.Test'))
+    app.region_watcher = main.ScreenRegionWatcher(ListFrameSource([screen(2)] * 3 + [screen(4)] * 3), SETTINGS)
+
+    for _ in range(6):
+        main.ImageTranslatorApp.poll_region_watcher(app)
+
+    assert [frame.tobytes() for frame in submitted] == [screen(2).tobytes(), screen(4).tobytes()]
+    assert timer.intervals == [500, 500, 500, 500, 500, 500]
+
+
+def test_capture_error_backs_off_to_the_maximum_interval():
+    class BrokenSource:
+        def grab(self):
+            raise OSError('画面を取得できません')
+
+    timer = SimpleNamespace(intervals=[])
+    timer.start = timer.intervals.append
+    app = SimpleNamespace(region_watcher=main.ScreenRegionWatcher(BrokenSource(), SETTINGS), watch_timer=timer,
+                          submit_watch_frame=lambda frame: None,
+                          logger=main.logging.getLogger('ImageTranslator.Test'))
+
+    main.ImageTranslatorApp.poll_region_watcher(app)
+    assert timer.intervals == [SETTINGS['max_interval_ms']]
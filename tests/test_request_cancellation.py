@@ -0,0 +1,144 @@
+"""キャンセル時に送受信中のHTTPリクエストが接続ごと切断されることの確認"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import main
+
+
+@pytest.fixture
+def stalled_server():
+    """接続を受け付けるだけで受信も応答もしないサーバー"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(4)
+    accepted = []
+
+    def accept_loop():
+        try:
+            connection, _ = listener.accept()
+        except OSError:
+            return
+        accepted.append(connection)
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}", accepted
+    for connection in accepted:
+        connection.close()
+    listener.close()
+
+
+def make_thread(session=None):
+    job = main.TranslationJob(Image.new('RGB', (64, 64), 'white'), 'japanese', 'english')
+    return main.TranslationThread(job, main.app_config, session=session)
+
+
+def request_threads(thread):
+    return [t for t in threading.enumerate() if t.name == f'Request-{thread.job.job_id}']
+
+
+@pytest.mark.parametrize('body_size', [0, 64 * 1024 * 1024], ids=['awaiting-response', 'uploading'])
+def test_cancel_stops_in_flight_request(stalled_server, body_size):
+    url, _ = stalled_server
+    thread = make_thread()
+    outcome = {}
+
+    def run():
+        try:
+            thread.send_request('POST', url, data=b'x' * body_size, timeout=60)
+        except main.TranslationCancelled:
+            outcome['cancelled'] = time.perf_counter()
+
+    caller = threading.Thread(target=run, daemon=True)
+    caller.start()
+    time.sleep(0.3)
+    workers = request_threads(thread)
+    assert workers, "リクエストの補助スレッドが見つかりません"
+
+    cancel_at = time.perf_counter()
+    thread.cancel()
+    caller.join(1.0)
+    assert 'cancelled' in outcome
+    assert outcome['cancelled'] - cancel_at < 0.3
+
+    # 補助スレッドも応答・タイムアウトを待たずに終了する（接続が実際に切断された）
+    for worker in workers:
+        worker.join(0.5)
+        assert not worker.is_alive()
+    assert time.perf_counter() - cancel_at < 0.8
+
+
+@pytest.fixture
+def keepalive_server():
+    """HTTP/1.1で接続を維持し、delay秒後に応答するサーバー（受け付けた接続数を記録）"""
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            time.sleep(float(self.path.rsplit('=', 1)[-1]) if '=' in self.path else 0)
+            body = b'ok'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", connections
+    server.shutdown()
+    server.server_close()
+
+
+def test_threads_share_the_connection_pool(keepalive_server):
+    url, connections = keepalive_server
+    session = main.create_http_session()
+    for _ in range(3):
+        thread = make_thread(session)
+        assert thread.send_request('GET', f"{url}/", timeout=5).status_code == 200
+        thread.close_session()
+    assert len(connections) == 1
+    session.close()
+
+
+def test_cancel_only_aborts_the_cancelled_threads_request(stalled_server, keepalive_server):
+    stalled_url, _ = stalled_server
+    url, _ = keepalive_server
+    session = main.create_http_session()
+    cancelled_thread, other_thread = make_thread(session), make_thread(session)
+    outcome = {}
+
+    def run_cancelled():
+        try:
+            cancelled_thread.send_request('GET', stalled_url, timeout=60)
+        except main.TranslationCancelled:
+            outcome['cancelled'] = True
+
+    def run_other():
+        outcome['status'] = other_thread.send_request('GET', f"{url}/?delay=0.6", timeout=5).status_code
+
+    callers = [threading.Thread(target=run_cancelled, daemon=True), threading.Thread(target=run_other, daemon=True)]
+    for caller in callers:
+        caller.start()
+    time.sleep(0.3)
+    cancelled_thread.cancel()
+    for caller in callers:
+        caller.join(2.0)
+
+    assert outcome.get('cancelled')
+    assert outcome.get('status') == 200
+    session.close()
@@ -0,0 +1,125 @@
+"""テキストレイヤー方式: 定型JSONを返すローカルのスタブで文字領域の取得とローカル描画を確認"""
+import copy
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image, ImageDraw
+
+import main
+
+BOXES = [
+    {"x": 100, "y": 100, "width": 500, "height": 100, "source_text": "保存しました",
+     "translation": "Saved", "font_size": 60, "color": "#ff0000", "bold": False},
+    {"x": 100, "y": 400, "width": 700, "height": 120, "source_text": "キャンセル",
+     "translation": "Cancel", "font_size": 70, "color": "not-a-color", "bold": True},
+    {"x": 100, "y": 700, "width": 300, "height": 100, "source_text": "ロゴ",
+     "translation": "", "font_size": 60, "color": "#000000", "bold": False},
+]
+CANNED_RESPONSE = {
+    "choices": [{"message": {"role": "assistant", "content": json.dumps({"boxes": BOXES}, ensure_ascii=False)}}],
+    "usage": {"prompt_tokens": 1200, "completion_tokens": 300},
+}
+
+
+@pytest.fixture
+def chat_stub():
+    """チャットAPIの代わりに定型JSONを返し、受け取ったリクエストを記録するサーバー"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            body = json.dumps(CANNED_RESPONSE).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions", received
+    server.shutdown()
+    server.server_close()
+
+
+def screenshot(size=(800, 400)):
+    """各文字領域に黒い「文字」を置いた白地の画面"""
+    image = Image.new('RGB', size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for box in BOXES:
+        left, top = box['x'] * size[0] // 1000, box['y'] * size[1] // 1000
+        right = (box['x'] + box['width']) * size[0] // 1000
+        bottom = (box['y'] + box['height']) * size[1] // 1000
+        draw.rectangle((left + 4, top + 8, right - 4, bottom - 8), fill=(0, 0, 0))
+    return image
+
+
+def region(image, box):
+    width, height = image.size
+    return image.crop((box['x'] * width // 1000, box['y'] * height // 1000,
+                       (box['x'] + box['width']) * width // 1000, (box['y'] + box['height']) * height // 1000))
+
+
+def make_thread(endpoint, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    config = copy.deepcopy(main.app_config)
+    config['text_layer_settings']['endpoint'] = endpoint
+    job = main.TranslationJob(screenshot(), 'japanese', 'english', mode='text_layer')
+    return main.TranslationThread(job, config)
+
+
+def test_parse_response_extracts_boxes_and_usage():
+    translator = main.TextLayerTranslator(main.app_config, 'test-key', 'japanese', 'english')
+    boxes = translator.parse_response(CANNED_RESPONSE)
+    assert [box['translation'] for box in boxes] == ['Saved', 'Cancel', '']
+    assert translator.usage == {'prompt_tokens': 1200, 'completion_tokens': 300}
+    assert translator.estimate_cost() == pytest.approx((1200 * 0.15 + 300 * 0.6) / 1_000_000)
+
+
+def test_stubbed_text_layer_translation_renders_locally(chat_stub, monkeypatch):
+    endpoint, received = chat_stub
+    thread = make_thread(endpoint, monkeypatch)
+    source = thread.image.copy()
+
+    rendered = thread.translate_text_layer(thread.image)
+
+    # リクエスト: 設定のモデルと構造化出力のスキーマ、画像はdata URLで送信
+    assert len(received) == 1
+    request = received[0]
+    assert request['model'] == main.app_config['text_layer_settings']['model']
+    assert request['response_format']['json_schema']['name'] == 'text_layer'
+    assert request['messages'][1]['content'][0]['image_url']['url'].startswith('data:image/png;base64,')
+
+    assert rendered is not None and rendered.size == source.size
+    saved, cancel, untranslated = BOXES
+
+    # 元の黒い文字は背景色で消され、訳文が指定色で描かれる
+    saved_region = region(rendered, saved)
+    colors = {color for _, color in saved_region.getcolors(saved_region.width * saved_region.height)}
+    assert (0, 0, 0) not in colors
+    assert any(r > 200 and g < 80 and b < 80 for r, g, b in colors)
+
+    # 解釈できない色は背景の明るさから黒を選ぶ
+    cancel_region = region(rendered, cancel)
+    assert cancel_region.getextrema()[0][0] < 80
+    assert region(source, cancel).tobytes() != cancel_region.tobytes()
+
+    # 訳文が空の領域と文字領域の外側は元のまま
+    assert region(rendered, untranslated).tobytes() == region(source, untranslated).tobytes()
+    assert rendered.crop((0, 0, 800, 30)).tobytes() == source.crop((0, 0, 800, 30)).tobytes()
+
+    assert thread.job_stats['quality'] == 'text_layer'
+    assert thread.job_stats['cost_estimate'] == pytest.approx((1200 * 0.15 + 300 * 0.6) / 1_000_000)
+
+
+def test_unreachable_endpoint_returns_none(monkeypatch):
+    thread = make_thread('http://127.0.0.1:9/v1/chat/completions', monkeypatch)
+    thread.config['text_layer_settings']['timeout'] = 2
+    assert thread.translate_text_layer(thread.image) is None
@@ -0,0 +1,66 @@
+"""テキスト事前判定: 合成画像セット（scripts/eval_text_prefilter.py）で既定の閾値の適合率・再現率を保証する
+
+threshold・edge_threshold・analysis_max_side を変更してこのテストが落ちる場合は、
+スクリプトで閾値ごとの比較を確認してから下限を見直すこと。
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+import main
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+import eval_text_prefilter as evaluation  # noqa: E402
+
+PER_CATEGORY = 4
+SEED = 0
+MIN_PRECISION = 0.5
+MIN_RECALL = 0.75
+
+
+@pytest.fixture(scope='module')
+def results():
+    """(カテゴリ名, 言語, 文字ありか, スコア, CPU時間ms) のリスト"""
+    prefilter = main.app_config['text_prefilter']
+    classifier = main.TextPresenceClassifier(prefilter['analysis_max_side'], prefilter['edge_threshold'])
+    # フォントの有無で結果が変わらないよう、フォールバックのグリフで描画する
+    renderers = {
+        'japanese': (evaluation.GlyphRenderer(None, cjk=True), evaluation.JAPANESE_LINES),
+        'english': (evaluation.GlyphRenderer(None, cjk=False), evaluation.LATIN_LINES),
+    }
+    rows = []
+    for category, language, has_text, image in evaluation.build_dataset(PER_CATEGORY, SEED, renderers):
+        features = classifier.analyze(image, language)
+        rows.append((category, language, has_text, features['score'], features['cpu_ms']))
+    return rows
+
+
+def detection_rate(results, category):
+    threshold = main.app_config['text_prefilter']['threshold']
+    scores = [score for name, _, _, score, _ in results if name == category]
+    return sum(1 for score in scores if score >= threshold) / len(scores)
+
+
+def test_default_threshold_meets_the_precision_and_recall_floor(results):
+    precision, recall = evaluation.precision_recall(results, main.app_config['text_prefilter']['threshold'])
+    assert precision >= MIN_PRECISION
+    assert recall >= MIN_RECALL
+
+
+@pytest.mark.parametrize('category', ['text/ui', 'text/dark', 'text/caption'])
+def test_ordinary_text_screens_are_never_skipped(results, category):
+    # 文字がある画面を「文字なし」としてスキップすると翻訳されないため、見逃しは許容しない
+    assert detection_rate(results, category) == 1.0
+
+
+@pytest.mark.parametrize('category', ['blank/gradient', 'blank/photo'])
+def test_plain_backgrounds_are_skipped(results, category):
+    assert detection_rate(results, category) == 0.0
+
+
+def test_precision_recall_counts():
+    rows = [('text/ui', 'english', True, 0.5, 0), ('text/label', 'english', True, 0.1, 0),
+            ('blank/ui', 'english', False, 0.3, 0), ('blank/photo', 'english', False, 0.0, 0)]
+    assert evaluation.precision_recall(rows, 0.2) == (0.5, 0.5)
+    assert evaluation.precision_recall(rows, 0.9) == (1.0, 0.0)
@@ -0,0 +1,149 @@
+"""翻訳履歴: 記録と検索、保持期間・件数上限による整理、サムネイルの保存の確認"""
+import sqlite3
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+import main
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = main.TranslationHistory(tmp_path / 'history.db')
+    yield history
+    history.close()
+
+
+def record(history, source_hash, output_path=None, **kwargs):
+    return history.record(source_hash, 'japanese', 'english', str(output_path) if output_path else None, **kwargs)
+
+
+def test_record_and_find_latest_by_hash_and_language_pair(history):
+    first = record(history, 'hash-a', quality='low', latency_ms=800, cost_estimate=0.01, source_size=(1536, 1024),
+                   method='edits', backend='openai', prompt_variant='optimized.v1')
+    latest = record(history, 'hash-a', quality='high', latency_ms=1200)
+    record(history, 'hash-b')
+    history.record('hash-a', 'japanese', 'korean', None)
+
+    found = history.find_by_hash('hash-a', 'japanese', 'english')
+    assert found['id'] == latest and found['quality'] == 'high'
+    assert history.find_by_hash('hash-a', 'english', 'japanese') is None
+    assert history.find_by_hash('hash-c', 'japanese', 'english') is None
+
+    row = history.fetch_page(before_id=latest)[0]
+    assert row['id'] == first
+    assert (row['source_width'], row['source_height']) == (1536, 1024)
+    assert (row['method'], row['backend'], row['prompt_variant']) == ('edits', 'openai', 'optimized.v1')
+    assert history.count() == 4
+
+
+def test_pages_are_returned_newest_first(history):
+    ids = [record(history, f'hash-{index}') for index in range(12)]
+    pages = []
+    before_id = None
+    while True:
+        page = history.fetch_page(before_id, limit=5)
+        if not page:
+            break
+        pages.append([row['id'] for row in page])
+        before_id = page[-1]['id']
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert sum(pages, []) == ids[::-1]
+
+
+def test_thumbnail_is_stored_as_a_small_png(history):
+    source = Image.new('RGB', (1600, 900), (30, 120, 200))
+    thumbnail = history.make_thumbnail(source)
+    row_id = record(history, 'hash-a', thumbnail=thumbnail, source_size=source.size)
+
+    stored = history.fetch_page()[0]
+    assert stored['id'] == row_id and stored['thumbnail'] == thumbnail
+    with Image.open(BytesIO(stored['thumbnail'])) as image:
+        assert image.format == 'PNG'
+        assert image.size == (128, 72)
+        assert image.convert('RGB').getpixel((64, 36)) == (30, 120, 200)
+
+    # しきい値より小さい画像は拡大しない
+    with Image.open(BytesIO(history.make_thumbnail(Image.new('L', (40, 20), 128)))) as image:
+        assert image.size == (40, 20) and image.mode == 'RGB'
+
+
+def test_retention_removes_expired_rows_and_their_outputs(history, tmp_path):
+    outputs = []
+    for index in range(6):
+        path = tmp_path / f'output_{index}.png'
+        path.write_bytes(b'png')
+        outputs.append(path)
+        record(history, f'hash-{index}', path)
+    with history._lock:
+        history._conn.execute("UPDATE history SET created_at = ? WHERE id <= 3", (time.time() - 40 * 86400,))
+        history._conn.commit()
+
+    assert history.apply_retention(retention_days=30, max_entries=0) == (3, 3)
+    assert [path.exists() for path in outputs] == [False] * 3 + [True] * 3
+    assert history.find_by_hash('hash-0', 'japanese', 'english') is None
+    assert history.count() == 3
+    assert history.apply_retention(retention_days=30, max_entries=0) == (0, 0)
+
+
+def test_max_entries_keeps_the_newest_rows_in_batches(history, tmp_path):
+    for index in range(25):
+        path = tmp_path / f'output_{index}.png'
+        path.write_bytes(b'png')
+        record(history, f'hash-{index}', path)
+
+    removed_rows, removed_files = history.apply_retention(retention_days=0, max_entries=10, batch_size=4)
+
+    assert (removed_rows, removed_files) == (15, 15)
+    assert [row['source_hash'] for row in history.fetch_page(limit=100)] == [
+        f'hash-{index}' for index in range(24, 14, -1)]
+    assert sorted(path.name for path in tmp_path.glob('output_*.png')) == sorted(
+        f'output_{index}.png' for index in range(15, 25))
+
+
+def test_retention_leaves_content_store_blobs_and_missing_files(history, tmp_path):
+    shared = tmp_path / 'store' / 'blob.png'
+    shared.parent.mkdir()
+    shared.write_bytes(b'png')
+    history.output_store = SimpleNamespace(owns=lambda path: str(shared) == path)
+    record(history, 'hash-a', shared)
+    record(history, 'hash-b', tmp_path / 'already_deleted.png')
+    record(history, 'hash-c')
+
+    # 出力ストアのblobは共有されうるためGCに任せる
+    assert history.apply_retention(retention_days=0, max_entries=1) == (2, 0)
+    assert shared.exists()
+
+
+def test_old_database_gains_the_migrated_columns(tmp_path):
+    db_path = tmp_path / 'history.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, source_hash TEXT NOT NULL, "
+                 "from_language TEXT NOT NULL, to_language TEXT NOT NULL, quality TEXT, input_fidelity TEXT, "
+                 "method TEXT, latency_ms INTEGER, cost_estimate REAL, source_width INTEGER, "
+                 "source_height INTEGER, thumbnail BLOB, output_path TEXT, created_at REAL NOT NULL)")
+    conn.execute("INSERT INTO history (source_hash, from_language, to_language, created_at) "
+                 "VALUES ('hash-old', 'japanese', 'english', 0)")
+    conn.commit()
+    conn.close()
+
+    history = main.TranslationHistory(db_path)
+    try:
+        record(history, 'hash-new', backend='stub', prompt_variant='masked.v1', policy_reason='small')
+        assert history.find_by_hash('hash-old', 'japanese', 'english')['backend'] is None
+        assert history.find_by_hash('hash-new', 'japanese', 'english')['policy_reason'] == 'small'
+    finally:
+        history.close()
+
+
+def test_tier_outcomes_are_counted(history):
+    for outcome in ('ok', 'fallback', 'ok', 'error'):
+        history.record_tier_outcome('high', outcome)
+    history.record_tier_outcome('low', 'ok')
+
+    outcomes = history.tier_outcomes()
+    assert outcomes['high'] == {'quality': 'high', 'attempts': 4, 'fallbacks': 1, 'errors': 1}
+    assert outcomes['low']['attempts'] == 1